@@ -0,0 +1,221 @@
+"""
+Autotuning of worker processes and OpenCV threads per machine
+
+OpenCV's internal threading competes with process-level parallelism, and
+the best split differs between small laptops and large servers. This tool
+benchmarks the verifier on representative images for combinations of
+worker processes and per-worker OpenCV threads, saves the fastest profile
+for the machine, and batch/service entry points apply it at startup.
+
+Usage:
+    python autotune.py IMAGE [IMAGE ...] [--min-images 48]
+    python autotune.py manifest.csv
+"""
+
+import os
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from manifest import load_manifest
+from verifier import SolarPanelVerifier
+import config
+
+
+def machine_key():
+    """Identifier of this machine used to look up its profile"""
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}"
+
+
+def _load_profiles(profile_path):
+    """All saved profiles keyed by machine"""
+    try:
+        with open(profile_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_profile(profile_path=None):
+    """
+    Saved profile for this machine
+
+    Returns:
+        Profile dictionary, or None if the machine has not been tuned
+    """
+    profile_path = profile_path or config.AUTOTUNE_PROFILE_PATH
+    return _load_profiles(profile_path).get(machine_key())
+
+
+def save_profile(profile, profile_path=None):
+    """Save the profile for this machine, keeping other machines' profiles"""
+    profile_path = profile_path or config.AUTOTUNE_PROFILE_PATH
+    directory = os.path.dirname(profile_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    profiles = _load_profiles(profile_path)
+    profiles[machine_key()] = profile
+    with open(profile_path + '.tmp', 'w') as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(profile_path + '.tmp', profile_path)
+
+
+def apply_saved_profile(profile_path=None):
+    """
+    Apply this machine's OpenCV thread setting, if tuned and enabled
+
+    Call once per process (worker initializers included), since the OpenCV
+    thread count is a per-process setting.
+
+    Returns:
+        The applied profile, or None
+    """
+    if not config.AUTOTUNE_ENABLED:
+        return None
+    profile = load_profile(profile_path)
+    if profile:
+        cv2.setNumThreads(profile['cv_threads'])
+    return profile
+
+
+def default_workers():
+    """Worker count from this machine's profile, or the CPU count"""
+    profile = load_profile() if config.AUTOTUNE_ENABLED else None
+    if profile:
+        return profile['workers']
+    return os.cpu_count() or 1
+
+
+def candidate_settings(cpu_count=None, max_workers=None):
+    """
+    Combinations of (workers, OpenCV threads) worth benchmarking
+
+    Powers of two up to the CPU count plus the CPU count itself, with at
+    most two threads per core in total.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    max_workers = min(max_workers or cpu_count, cpu_count)
+
+    counts = set()
+    value = 1
+    while value <= cpu_count:
+        counts.add(value)
+        value *= 2
+    counts.add(cpu_count)
+
+    settings = []
+    for workers in sorted(c for c in counts if c <= max_workers):
+        for threads in sorted(counts):
+            if workers * threads <= 2 * cpu_count:
+                settings.append((workers, threads))
+    return settings
+
+
+# Per-process verifier, set up by _init_benchmark_worker
+_verifier = None
+
+
+def _init_benchmark_worker(cv_threads):
+    """Set OpenCV threads and create the verifier in a benchmark worker"""
+    global _verifier
+    cv2.setNumThreads(cv_threads)
+    _verifier = SolarPanelVerifier()
+
+
+def _benchmark_case(case):
+    """Run detection and comparison for one case (no rendering or side effects)"""
+    user_image, satellite_image = case
+    _verifier.extract_features(user_image, satellite_image)
+    return True
+
+
+def benchmark(cases, workers, cv_threads):
+    """
+    Measure throughput for one setting
+
+    Args:
+        cases: List of (user image path, satellite image path or None)
+        workers: Worker processes
+        cv_threads: OpenCV threads per worker
+
+    Returns:
+        Images per second
+    """
+    with ProcessPoolExecutor(workers, initializer=_init_benchmark_worker,
+                             initargs=(cv_threads,)) as pool:
+        # Warm up every worker before timing
+        list(pool.map(_benchmark_case, cases[:workers]))
+        start = time.perf_counter()
+        list(pool.map(_benchmark_case, cases))
+        elapsed = time.perf_counter() - start
+    return len(cases) / elapsed
+
+
+def autotune(cases, min_images=None, max_workers=None):
+    """
+    Benchmark all candidate settings and pick the fastest
+
+    Args:
+        cases: List of (user image path, satellite image path or None)
+        min_images: Images per measurement, raised to a few per worker for
+            large worker counts (cases are repeated to reach it)
+        max_workers: Upper bound on worker processes
+
+    Returns:
+        Profile dictionary
+    """
+    min_images = min_images or config.AUTOTUNE_MIN_IMAGES
+
+    measurements = []
+    for workers, cv_threads in candidate_settings(max_workers=max_workers):
+        # Enough images that every worker stays busy for several of them,
+        # or start-up and the last stragglers dominate the timing
+        count = max(min_images, config.AUTOTUNE_IMAGES_PER_WORKER * workers, len(cases))
+        repeated = (cases * (count // len(cases) + 1))[:count]
+        rate = benchmark(repeated, workers, cv_threads)
+        measurements.append({'workers': workers, 'cv_threads': cv_threads,
+                             'images_per_second': round(rate, 2)})
+        print(f"  workers {workers:>3}  cv threads {cv_threads:>3}  {rate:8.2f} images/s")
+
+    best = max(measurements, key=lambda m: m['images_per_second'])
+    return {
+        'workers': best['workers'],
+        'cv_threads': best['cv_threads'],
+        'images_per_second': best['images_per_second'],
+        'cpu_count': os.cpu_count(),
+        'tuned_at': datetime.now().isoformat(),
+        'measurements': measurements,
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Tune worker and OpenCV thread counts for this machine')
+    parser.add_argument('inputs', nargs='+', help='Representative images, or one manifest file')
+    parser.add_argument('--min-images', type=int, default=config.AUTOTUNE_MIN_IMAGES,
+                        help='Images per measurement')
+    parser.add_argument('--max-workers', type=int, default=None, help='Upper bound on workers')
+    parser.add_argument('--profile', default=config.AUTOTUNE_PROFILE_PATH, help='Profile file')
+
+    args = parser.parse_args()
+
+    if len(args.inputs) == 1 and args.inputs[0].endswith(('.csv', '.jsonl', '.ndjson')):
+        cases = [(c['user_image'], c['satellite_image']) for c in load_manifest(args.inputs[0])]
+    else:
+        cases = [(path, None) for path in args.inputs]
+
+    print(f"Benchmarking on {machine_key()}...")
+    profile = autotune(cases, args.min_images, args.max_workers)
+    save_profile(profile, args.profile)
+
+    print(f"Best: {profile['workers']} worker(s) x {profile['cv_threads']} OpenCV thread(s) "
+          f"= {profile['images_per_second']} images/s")
+    print(f"Profile saved to: {args.profile}")
+
+
+if __name__ == '__main__':
+    main()
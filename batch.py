@@ -0,0 +1,223 @@
+"""
+Locality-aware batch verification
+
+Cases that share a satellite image (or, with coordinates, a neighbourhood)
+are grouped and each group runs on one worker, so the satellite image is
+loaded and prepared once and stays hot in that worker's SatelliteCache.
+Groups are dispatched largest first and oversized groups are split, which
+keeps workers evenly loaded.
+
+Usage:
+    python batch.py manifest.csv [--workers N] [--group-by satellite|geohash|none]
+"""
+
+import os
+import json
+import math
+import time
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from autotune import apply_saved_profile, default_workers
+from manifest import load_manifest
+from verifier import SolarPanelVerifier
+import config
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat, lon, precision=None):
+    """
+    Encode coordinates as a geohash string
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        precision: Number of characters (defaults to config.BATCH_GEOHASH_PRECISION)
+    """
+    precision = precision or config.BATCH_GEOHASH_PRECISION
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def locality_key(case, group_by='satellite'):
+    """
+    Grouping key of a case
+
+    Args:
+        case: Manifest case
+        group_by: 'satellite' (satellite file, falling back to geohash),
+            'geohash' (coordinates, falling back to satellite file) or 'none'
+    """
+    satellite = case.get('satellite_image')
+    satellite_key = f"sat:{os.path.abspath(satellite)}" if satellite else None
+    geo_key = None
+    if case.get('lat') is not None and case.get('lon') is not None:
+        geo_key = f"geo:{geohash(case['lat'], case['lon'])}"
+
+    if group_by == 'satellite':
+        key = satellite_key or geo_key
+    elif group_by == 'geohash':
+        key = geo_key or satellite_key
+    else:
+        key = None
+
+    return key or f"case:{case['id']}"
+
+
+def plan_groups(cases, workers, group_by='satellite', max_size=None):
+    """
+    Group cases by locality and balance the groups across workers
+
+    Args:
+        cases: Manifest cases
+        workers: Number of workers
+        group_by: See locality_key
+        max_size: Optional cap on the number of cases per group
+
+    Returns:
+        List of case lists, largest first
+    """
+    grouped = OrderedDict()
+    for case in cases:
+        grouped.setdefault(locality_key(case, group_by), []).append(case)
+
+    # Split groups that alone would exceed one worker's fair share
+    fair_share = max(1, math.ceil(len(cases) / max(1, workers)))
+    max_size = min(fair_share, max_size) if max_size else fair_share
+    groups = []
+    for members in grouped.values():
+        for start in range(0, len(members), max_size):
+            groups.append(members[start:start + max_size])
+
+    groups.sort(key=len, reverse=True)
+    return groups
+
+
+# Per-process verifier, set up by _init_worker
+_verifier = None
+
+
+def _init_worker():
+    """Create the verifier used by a worker process"""
+    global _verifier
+    apply_saved_profile()
+    _verifier = SolarPanelVerifier()
+
+
+def process_group(cases):
+    """
+    Verify a group of cases on the current worker
+
+    Returns:
+        Tuple of (list of (case id, results), satellite cache hits, misses)
+    """
+    cache = _verifier.satellite_cache
+    hits, misses = cache.hits, cache.misses
+    outcomes = []
+    for case in cases:
+        results = _verifier.verify_installation(case['user_image'], case['satellite_image'])
+        outcomes.append((case['id'], results))
+    return outcomes, cache.hits - hits, cache.misses - misses
+
+
+def run_batch(cases, workers=None, group_by='satellite', on_result=None):
+    """
+    Verify all cases with locality-aware scheduling
+
+    Args:
+        cases: Manifest cases
+        workers: Worker processes (defaults to the autotuned count or the
+            CPU count; 1 runs in-process)
+        group_by: See locality_key
+        on_result: Optional callback(case_id, results) called as cases finish
+
+    Returns:
+        Summary dictionary
+    """
+    workers = workers or default_workers()
+    groups = plan_groups(cases, workers, group_by)
+    summary = {'cases': len(cases), 'groups': len(groups), 'workers': workers,
+               'satellite_cache_hits': 0, 'satellite_cache_misses': 0, 'statuses': {}}
+
+    def collect(outcome):
+        outcomes, hits, misses = outcome
+        summary['satellite_cache_hits'] += hits
+        summary['satellite_cache_misses'] += misses
+        for case_id, results in outcomes:
+            status = results['verification_status'] if results['status'] == 'COMPLETED' else 'ERROR'
+            summary['statuses'][status] = summary['statuses'].get(status, 0) + 1
+            if on_result:
+                on_result(case_id, results)
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker()
+        for group in groups:
+            collect(process_group(group))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(process_group, group) for group in groups]
+            for future in as_completed(futures):
+                collect(future.result())
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    summary['images_per_second'] = round(len(cases) / summary['seconds'], 2) if summary['seconds'] else 0
+
+    return summary
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Batch verification of a manifest')
+    parser.add_argument('manifest', help='Path to a manifest (.csv or .jsonl)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--group-by', choices=['satellite', 'geohash', 'none'], default='satellite',
+                        help='How to group cases that share satellite data')
+    parser.add_argument('--output', default=os.path.join(config.OUTPUT_DIR, 'batch_results.jsonl'),
+                        help='Results file (JSON lines)')
+
+    args = parser.parse_args()
+    cases = load_manifest(args.manifest)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    with open(args.output, 'w') as out:
+        def write_result(case_id, results):
+            out.write(json.dumps({'id': case_id, **results}) + '\n')
+
+        summary = run_batch(cases, args.workers, args.group_by, write_result)
+
+    print(f"Verified {summary['cases']} case(s) in {summary['groups']} group(s) "
+          f"on {summary['workers']} worker(s): {summary['seconds']}s "
+          f"({summary['images_per_second']} images/s)")
+    print(f"Satellite cache: {summary['satellite_cache_hits']} hits, "
+          f"{summary['satellite_cache_misses']} misses")
+    for status, count in sorted(summary['statuses'].items()):
+        print(f"  {status}: {count}")
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""
+HSV histogram calibration tool for the solar panel detector
+
+Each labeled image is reduced once to a compact 3D HSV histogram. Summed-volume
+(cumulative) tables built from the histogram answer "how many pixels fall in
+this include-range minus these exclude-ranges" in constant time, so thousands of
+threshold combinations can be scored against a labeled archive without touching
+the images again.
+
+Usage:
+    python calibration.py build manifest.csv [--archive DIR]
+    python calibration.py sweep [--archive DIR] [--grid grid.json] [--top 10]
+"""
+
+import os
+import json
+import argparse
+import itertools
+import cv2
+import numpy as np
+from image_processor import ImageProcessor
+from manifest import load_manifest
+from verifier import SolarPanelVerifier
+import config
+
+
+# Value ranges of OpenCV's 8-bit HSV channels
+HSV_CHANNEL_RANGES = np.array([180, 256, 256])
+
+
+class HSVHistogram:
+    """3D HSV histogram of one image with summed-volume range queries"""
+
+    def __init__(self, counts):
+        """
+        Initialize from histogram counts
+
+        Args:
+            counts: Array of shape (H bins, S bins, V bins)
+        """
+        self.counts = np.asarray(counts, dtype=np.uint32)
+        self.bins = np.array(self.counts.shape)
+        self.total = int(self.counts.sum(dtype=np.int64))
+        self._table = None
+
+    @classmethod
+    def from_image(cls, image, bins=None, preprocess=True):
+        """
+        Compute the histogram of a BGR image
+
+        Args:
+            image: BGR image
+            bins: (H, S, V) bin counts (defaults to config.CALIBRATION_HSV_BINS)
+            preprocess: Apply ImageProcessor.preprocess_image first, as detection does
+        """
+        bins = list(bins or config.CALIBRATION_HSV_BINS)
+        if preprocess:
+            image = ImageProcessor.preprocess_image(image)
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        counts = cv2.calcHist([hsv], [0, 1, 2], None, bins, [0, 180, 0, 256, 0, 256])
+        return cls(counts)
+
+    @classmethod
+    def load(cls, path):
+        """Load a histogram saved with save()"""
+        with np.load(path) as data:
+            return cls(data['counts'])
+
+    def save(self, path):
+        """Save the histogram as a compressed .npz file"""
+        np.savez_compressed(path, counts=self.counts)
+
+    @property
+    def table(self):
+        """Zero-padded summed-volume table of the histogram"""
+        if self._table is None:
+            table = np.zeros(tuple(self.bins + 1), dtype=np.int64)
+            table[1:, 1:, 1:] = self.counts.cumsum(0).cumsum(1).cumsum(2)
+            self._table = table
+        return self._table
+
+    def _to_bins(self, lower, upper):
+        """Convert inclusive HSV value bounds to half-open bin index bounds"""
+        lower = np.asarray(lower, dtype=np.int64)
+        upper = np.minimum(np.asarray(upper, dtype=np.int64), HSV_CHANNEL_RANGES - 1)
+        start = lower * self.bins // HSV_CHANNEL_RANGES
+        stop = upper * self.bins // HSV_CHANNEL_RANGES + 1
+        return start, np.maximum(stop, start)
+
+    def _box_count(self, start, stop):
+        """Number of pixels in the bin box [start, stop) via inclusion-exclusion"""
+        t = self.table
+        a0, a1, a2 = start[..., 0], start[..., 1], start[..., 2]
+        b0, b1, b2 = stop[..., 0], stop[..., 1], stop[..., 2]
+        return (
+            t[b0, b1, b2]
+            - t[a0, b1, b2] - t[b0, a1, b2] - t[b0, b1, a2]
+            + t[a0, a1, b2] + t[a0, b1, a2] + t[b0, a1, a2]
+            - t[a0, a1, a2]
+        )
+
+    def count(self, lower, upper, excludes=()):
+        """
+        Count pixels inside an include range and outside all exclude ranges
+
+        Bounds are inclusive HSV values and may carry leading batch dimensions
+        (shape (..., 3)) to answer many queries at once. Counts are exact when
+        bounds fall on bin edges and otherwise include the whole boundary bins.
+
+        Args:
+            lower: Lower include bound(s)
+            upper: Upper include bound(s)
+            excludes: Sequence of (lower, upper) exclude ranges
+
+        Returns:
+            Pixel count(s)
+        """
+        start, stop = self._to_bins(lower, upper)
+        result = self._box_count(start, stop)
+
+        exclude_bins = [self._to_bins(l, u) for l, u in excludes]
+        for r in range(1, len(exclude_bins) + 1):
+            sign = -1 if r % 2 else 1
+            for combo in itertools.combinations(exclude_bins, r):
+                s, e = start, stop
+                for ex_start, ex_stop in combo:
+                    s = np.maximum(s, ex_start)
+                    e = np.minimum(e, ex_stop)
+                result = result + sign * self._box_count(s, np.maximum(e, s))
+
+        return result
+
+    def coverage(self, lower, upper, excludes=()):
+        """Percentage of pixels selected by count()"""
+        if self.total == 0:
+            return np.zeros(np.shape(lower)[:-1])
+        return self.count(lower, upper, excludes) / self.total * 100
+
+
+class CalibrationArchive:
+    """Directory of per-image histograms plus an index of labels and baseline features"""
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, root=None):
+        """
+        Initialize the archive
+
+        Args:
+            root: Archive directory (defaults to config.CALIBRATION_ARCHIVE_DIR)
+        """
+        self.root = root or config.CALIBRATION_ARCHIVE_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self.index = {}
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+
+    def __contains__(self, case_id):
+        return case_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, case_id, histogram, label, panel_count, similarity):
+        """Store a histogram and its baseline features"""
+        file_name = f"{len(self.index):08d}.npz"
+        histogram.save(os.path.join(self.root, file_name))
+        self.index[case_id] = {
+            'file': file_name,
+            'label': label,
+            'panel_count': panel_count,
+            'similarity': similarity,
+            'bins': histogram.bins.tolist(),
+        }
+
+    def save_index(self):
+        """Write the index to disk"""
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(self.index, f)
+        os.replace(index_path + '.tmp', index_path)
+
+    def labeled_entries(self):
+        """Iterate (case_id, entry) pairs that carry a label"""
+        for case_id, entry in self.index.items():
+            if entry['label'] is not None:
+                yield case_id, entry
+
+    def load_histogram(self, entry):
+        """Load the histogram of an index entry"""
+        return HSVHistogram.load(os.path.join(self.root, entry['file']))
+
+
+def build_archive(cases, archive, bins=None):
+    """
+    Compute histograms and baseline features for manifest cases
+
+    Cases already in the archive are skipped, so an interrupted build can be
+    re-run. Panel count and similarity are measured once with the current
+    settings and held fixed during sweeps.
+
+    Args:
+        cases: Cases from manifest.load_manifest
+        archive: CalibrationArchive to fill
+        bins: Optional (H, S, V) bin counts
+
+    Returns:
+        Number of histograms added
+    """
+    processor = ImageProcessor()
+    added = 0
+
+    for case in cases:
+        if case['id'] in archive:
+            continue
+
+        image = processor.load_image(case['user_image'])
+        if image is None:
+            continue
+
+        processed = processor.preprocess_image(image)
+        histogram = HSVHistogram.from_image(processed, bins, preprocess=False)
+        panels, _ = processor.detect_solar_panels(processed)
+
+        similarity = 0
+        if case['satellite_image'] and os.path.exists(case['satellite_image']):
+            satellite = processor.load_image(case['satellite_image'])
+            if satellite is not None:
+                similarity = round(processor.compare_images(image, satellite), 3)
+
+        archive.add(case['id'], histogram, case['label'], len(panels), similarity)
+        added += 1
+        if added % 100 == 0:
+            archive.save_index()
+            print(f"  {added} histograms computed")
+
+    archive.save_index()
+    return added
+
+
+def default_grid():
+    """Threshold grid centred on the current configuration"""
+    (h_lo, s_lo, v_lo), (h_hi, s_hi, v_hi) = config.SOLAR_PANEL_HSV_RANGE
+    return {
+        'h_lower': [h_lo - 10, h_lo - 4, h_lo, h_lo + 4, h_lo + 10],
+        'h_upper': [h_hi - 10, h_hi, h_hi + 10],
+        's_lower': [s_lo - 16, s_lo - 8, s_lo, s_lo + 8, s_lo + 16],
+        's_upper': [s_hi],
+        'v_lower': [max(0, v_lo - 8), v_lo, v_lo + 8],
+        'v_upper': [v_hi - 24, v_hi - 8, v_hi, v_hi + 8, v_hi + 24],
+        'exclude_ranges': [list(map(list, r)) for r in config.ROOF_EXCLUDE_HSV_RANGES],
+        'confidence_thresholds': [round(t, 2) for t in np.arange(0.30, 0.71, 0.05)],
+    }
+
+
+def sweep(archive, grid=None, top=10):
+    """
+    Score every threshold combination of a grid against the labeled archive
+
+    Coverage comes from the histogram (before morphology and contour
+    filtering); panel count and similarity are the baseline values recorded
+    at build time. A case is predicted APPROVED as decide_batch would decide
+    it: panels were detected and its confidence reaches the threshold.
+
+    Args:
+        archive: CalibrationArchive with labeled entries
+        grid: Dictionary of candidate values (see default_grid)
+        top: Number of best combinations to return
+
+    Returns:
+        List of the best combinations by F1 score
+    """
+    settings = default_grid()
+    settings.update(grid or {})
+
+    combos = list(itertools.product(
+        settings['h_lower'], settings['s_lower'], settings['v_lower'],
+        settings['h_upper'], settings['s_upper'], settings['v_upper']
+    ))
+    bounds = np.array(combos, dtype=np.int64)
+    lower, upper = bounds[:, :3], bounds[:, 3:]
+    excludes = [(np.array(l), np.array(u)) for l, u in settings['exclude_ranges']]
+    thresholds = np.array(settings['confidence_thresholds'], dtype=np.float64)
+
+    shape = (len(combos), len(thresholds))
+    tp = np.zeros(shape, dtype=np.int64)
+    fp = np.zeros(shape, dtype=np.int64)
+    fn = np.zeros(shape, dtype=np.int64)
+    cases = 0
+
+    for _, entry in archive.labeled_entries():
+        histogram = archive.load_histogram(entry)
+        coverage = histogram.coverage(lower, upper, excludes)
+        similarity = np.full(len(combos), entry['similarity'], dtype=np.float64)
+        panel_count = np.full(len(combos), entry['panel_count'])
+        predicted = np.stack([
+            SolarPanelVerifier.decide_batch(coverage, similarity, panel_count, threshold=threshold)[1]
+            == 'APPROVED'
+            for threshold in thresholds
+        ], axis=1)
+        if entry['label']:
+            tp += predicted
+            fn += ~predicted
+        else:
+            fp += predicted
+        cases += 1
+
+    if cases == 0:
+        return []
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    best = np.argsort(f1, axis=None)[::-1][:top]
+    ranked = []
+    for flat in best:
+        c, t = np.unravel_index(flat, shape)
+        ranked.append({
+            'panel_hsv_range': [lower[c].tolist(), upper[c].tolist()],
+            'confidence_threshold': float(thresholds[t]),
+            'precision': round(float(precision[c, t]), 4),
+            'recall': round(float(recall[c, t]), 4),
+            'f1': round(float(f1[c, t]), 4),
+            'true_positives': int(tp[c, t]),
+            'false_positives': int(fp[c, t]),
+            'false_negatives': int(fn[c, t]),
+        })
+
+    return ranked
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='HSV threshold calibration tool')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Compute histograms for a labeled manifest')
+    build_parser.add_argument('manifest', help='Path to a labeled manifest (.csv or .jsonl)')
+    build_parser.add_argument('--archive', default=config.CALIBRATION_ARCHIVE_DIR,
+                              help='Histogram archive directory')
+
+    sweep_parser = subparsers.add_parser('sweep', help='Score threshold combinations')
+    sweep_parser.add_argument('--archive', default=config.CALIBRATION_ARCHIVE_DIR,
+                              help='Histogram archive directory')
+    sweep_parser.add_argument('--grid', help='JSON file overriding default_grid() entries')
+    sweep_parser.add_argument('--top', type=int, default=10, help='Number of results to show')
+    sweep_parser.add_argument('--output', help='Write the ranked results to this JSON file')
+
+    args = parser.parse_args()
+    archive = CalibrationArchive(args.archive)
+
+    if args.command == 'build':
+        cases = load_manifest(args.manifest)
+        added = build_archive(cases, archive)
+        print(f"Added {added} histograms ({len(archive)} in archive)")
+        return
+
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    ranked = sweep(archive, grid, args.top)
+    if not ranked:
+        print("No labeled cases in the archive")
+        return
+
+    print(f"{'H':>9} {'S':>9} {'V':>9} {'thresh':>7} {'prec':>6} {'recall':>6} {'F1':>6}")
+    for row in ranked:
+        (h_lo, s_lo, v_lo), (h_hi, s_hi, v_hi) = row['panel_hsv_range']
+        print(f"{h_lo:>4}-{h_hi:<4} {s_lo:>4}-{s_hi:<4} {v_lo:>4}-{v_hi:<4} "
+              f"{row['confidence_threshold']:>7.2f} {row['precision']:>6.3f} "
+              f"{row['recall']:>6.3f} {row['f1']:>6.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(ranked, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Scripted checks of the perceptual-hash index
+
+Radius queries probe only the chunk neighbourhoods the pigeonhole argument
+allows, so these checks place stored hashes exactly at and just beyond the
+radius, with the differing bits spread over the chunks in every way.
+
+Usage:
+    python check_hash_index.py
+"""
+
+import os
+import itertools
+import numpy as np
+from check_invariants import run_checks
+from hash_index import PerceptualHashIndex, hamming_distance, CHUNKS, CHUNK_BITS
+import config
+
+
+def _flip(value, per_chunk):
+    """Flip the lowest bits of each 16-bit chunk, per_chunk[i] bits in chunk i"""
+    for i, count in enumerate(per_chunk):
+        shift = CHUNK_BITS * (CHUNKS - 1 - i)
+        for bit in range(count):
+            value ^= 1 << (shift + bit)
+    return value
+
+
+def _spreads(distance):
+    """Every way of spreading a number of differing bits over the chunks"""
+    return [spread for spread in itertools.product(range(distance + 1), repeat=CHUNKS)
+            if sum(spread) == distance]
+
+
+def check_radius_boundary(work_dir):
+    """Hashes at exactly the radius match, one bit further never does"""
+    index = PerceptualHashIndex(os.path.join(work_dir, 'hashes.sqlite'))
+    try:
+        # High bit set, so the signed storage mapping is exercised too
+        query = 0xF0E1D2C3B4A59687
+        radius = config.PHASH_MATCH_RADIUS
+        expected = set()
+        for distance in (radius, radius + 1):
+            for spread in _spreads(distance):
+                record = f"{distance}:{spread}"
+                index.add(_flip(query, spread), record)
+                if distance <= radius:
+                    expected.add(record)
+
+        matches = index.query(query)
+        found = {match['record'] for match in matches}
+        assert found == expected, (f"missed {sorted(expected - found)[:5]}, "
+                                   f"beyond radius {sorted(found - expected)[:5]}")
+        assert all(match['distance'] == radius for match in matches)
+
+        # Smaller radii (chunk radius 0 and 1) agree with a brute-force scan
+        rng = np.random.default_rng(5)
+        stored = {}
+        for i in range(300):
+            spread = np.minimum(rng.multinomial(int(rng.integers(0, 10)), [1 / CHUNKS] * CHUNKS),
+                                CHUNK_BITS)
+            value = _flip(query, spread)
+            if i % 7 == 0:
+                # Far away in the first chunk
+                value ^= int(rng.integers(0, 1 << CHUNK_BITS)) << (CHUNK_BITS * (CHUNKS - 1))
+            stored[f"random:{i}"] = value
+            index.add(value, f"random:{i}")
+        for query_radius in range(0, 9):
+            found = {match['record'] for match in index.query(query, query_radius)
+                     if match['record'].startswith('random:')}
+            brute = {record for record, value in stored.items()
+                     if hamming_distance(query, value) <= query_radius}
+            assert found == brute, f"radius {query_radius}: {sorted(found ^ brute)[:5]}"
+    finally:
+        index.close()
+
+
+CHECKS = [
+    check_radius_boundary,
+]
+
+
+def main():
+    """Main entry point"""
+    if not run_checks(CHECKS, 'HASH INDEX CHECKS'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Scripted checks of invariants the verification code relies on
+
+Each check builds its own inputs (synthetic scenes from synthetic_data) in
+a temporary directory and asserts one property, such as verify_batch
+deciding exactly as verify_installation. Run it after changing the modules
+involved.
+
+Usage:
+    python check_invariants.py
+"""
+
+import os
+import tempfile
+import traceback
+import numpy as np
+from calibration import CalibrationArchive, build_archive, sweep
+from feature_store import FeatureStore
+from image_processor import ImageProcessor
+from manifest import load_manifest
+from mask_codec import (PACKBITS, RLE, PackedMask, save_mask, load_mask, load_packed,
+                        stored_coverage, encode_rle, decode_rle, rle_count)
+from rescore import rescore
+from synthetic_data import generate_dataset
+from verifier import SolarPanelVerifier
+from watch_folder import Checkpoint
+import config
+
+
+# Result fields that must not depend on how a verification was run
+DECISION_FIELDS = ('status', 'verification_status', 'solar_detected', 'solar_coverage',
+                   'similarity_score', 'confidence', 'image_size', 'panels')
+
+
+def _synthetic_cases(work_dir, count=12, seed=7):
+    """Manifest cases of a small synthetic dataset"""
+    return load_manifest(generate_dataset(os.path.join(work_dir, 'scenes'), count, seed, workers=1))
+
+
+def _differences(expected, actual, fields=DECISION_FIELDS):
+    """Fields whose values differ between two results dictionaries"""
+    return {field: (expected.get(field), actual.get(field))
+            for field in fields if expected.get(field) != actual.get(field)}
+
+
+def check_batch_matches_single(work_dir):
+    """verify_batch decides every image exactly as verify_installation does"""
+    cases = _synthetic_cases(work_dir)
+    verifier = SolarPanelVerifier()
+    users = [case['user_image'] for case in cases]
+    satellites = [case['satellite_image'] for case in cases]
+
+    batch = verifier.verify_batch(users, satellites)
+    for case, batch_results in zip(cases, batch):
+        single = verifier.verify_installation(case['user_image'], case['satellite_image'], render=False)
+        differences = _differences(single, batch_results)
+        assert not differences, f"{case['id']}: {differences}"
+
+    # A bad file fails its own image only, with the error verify_installation reports
+    corrupt = os.path.join(work_dir, 'corrupt.jpg')
+    with open(corrupt, 'wb') as f:
+        f.write(b'\xff\xd8 not a jpeg')
+    unreadable = os.path.join(work_dir, 'satellite_dir.png')
+    os.makedirs(unreadable)
+    detected = next(i for i, results in enumerate(batch) if results['solar_detected'])
+    bad_users = users + [corrupt, users[detected]]
+    bad_satellites = satellites + [satellites[0], unreadable]
+    bad_batch = verifier.verify_batch(bad_users, bad_satellites)
+    for i, (user, satellite, batch_results) in enumerate(zip(bad_users, bad_satellites, bad_batch)):
+        single = verifier.verify_installation(user, satellite, render=False)
+        differences = _differences(single, batch_results, DECISION_FIELDS + ('message',))
+        assert not differences, f"image {i}: {differences}"
+    assert [results['status'] for results in bad_batch[-2:]] == ['ERROR', 'ERROR'], \
+        [results['message'] for results in bad_batch[-2:]]
+
+    try:
+        verifier.verify_batch(users, satellites[:-1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('verify_batch accepted lists of different lengths')
+
+
+def check_deadline_leaves_results_unchanged(work_dir):
+    """No deadline adds no keys, and an ample deadline degrades and changes nothing"""
+    verifier = SolarPanelVerifier()
+    for case in _synthetic_cases(work_dir, count=8):
+        plain = verifier.verify_installation(case['user_image'], case['satellite_image'], render=False)
+        assert 'degradations' not in plain and 'deadline' not in plain, \
+            f"{case['id']}: deadline keys without a deadline"
+
+        budgeted = verifier.verify_installation(case['user_image'], case['satellite_image'],
+                                                render=False, deadline=3600)
+        assert budgeted['degradations'] == [], f"{case['id']}: degraded with an ample deadline"
+        assert budgeted['deadline']['met'], f"{case['id']}: ample deadline not met"
+        differences = _differences(plain, budgeted)
+        assert not differences, f"{case['id']}: {differences}"
+
+
+def check_mask_round_trip(work_dir):
+    """Packed and run-length masks decode to the detection mask and keep its coverage"""
+    rng = np.random.default_rng(3)
+    masks = [
+        np.zeros((5, 3), dtype=np.uint8),
+        np.full((4, 7), 255, dtype=np.uint8),
+        # Odd sizes exercise the padding bits of the last packed byte
+        np.where(rng.random((37, 53)) < 0.3, 255, 0).astype(np.uint8),
+    ]
+    for case in _synthetic_cases(work_dir, count=4):
+        image = ImageProcessor.load_image(case['user_image'])
+        masks.append(ImageProcessor.detect_solar_panels(ImageProcessor.preprocess_image(image))[1])
+
+    processor = ImageProcessor()
+    for i, mask in enumerate(masks):
+        coverage = processor.calculate_solar_coverage(mask)
+        packed = PackedMask.from_mask(mask)
+        assert np.array_equal(packed.to_mask(), mask), f"mask {i}: packbits round trip differs"
+        assert packed.coverage() == coverage, f"mask {i}: packed coverage differs"
+
+        runs = encode_rle(mask)
+        assert np.array_equal(decode_rle(runs, mask.shape), mask), f"mask {i}: RLE round trip differs"
+        assert rle_count(runs) == np.count_nonzero(mask), f"mask {i}: RLE count differs"
+
+        for encoding in (PACKBITS, RLE):
+            path = os.path.join(work_dir, f"mask_{i}_{encoding}.npz")
+            save_mask(path, mask, encoding)
+            assert np.array_equal(load_mask(path), mask), f"mask {i}: stored {encoding} mask differs"
+            assert np.array_equal(load_packed(path).to_mask(), mask), f"mask {i}: stored {encoding} packed differs"
+            assert stored_coverage(path) == coverage, f"mask {i}: stored {encoding} coverage differs"
+
+        # Masks stored as plain arrays before the codec still load
+        legacy = os.path.join(work_dir, f"mask_{i}_legacy.npz")
+        np.savez_compressed(legacy, mask=mask)
+        assert np.array_equal(load_mask(legacy), mask), f"mask {i}: legacy mask differs"
+        assert stored_coverage(legacy) == coverage, f"mask {i}: legacy coverage differs"
+
+
+def check_sweep_matches_decide(work_dir):
+    """A calibration sweep of the current settings predicts what decide() decides"""
+    archive = CalibrationArchive(os.path.join(work_dir, 'calibration'))
+    build_archive(_synthetic_cases(work_dir, count=16), archive)
+    lower, upper = config.SOLAR_PANEL_HSV_RANGE
+    grid = {'h_lower': [lower[0]], 's_lower': [lower[1]], 'v_lower': [lower[2]],
+            'h_upper': [upper[0]], 's_upper': [upper[1]], 'v_upper': [upper[2]]}
+
+    configured = config.MIN_CONFIDENCE_THRESHOLD
+    # Low thresholds approve panel-coloured scenes where no panel was found,
+    # unless the sweep gates on the panel count as decide() does
+    for threshold in (0.3, configured):
+        [ranked] = sweep(archive, dict(grid, confidence_thresholds=[threshold]), top=1)
+        expected = {'true_positives': 0, 'false_positives': 0, 'false_negatives': 0}
+        config.MIN_CONFIDENCE_THRESHOLD = threshold
+        try:
+            for _, entry in archive.labeled_entries():
+                coverage = archive.load_histogram(entry).coverage(lower, upper,
+                                                                  config.ROOF_EXCLUDE_HSV_RANGES)
+                _, status = SolarPanelVerifier.decide(float(coverage), entry['similarity'],
+                                                      entry['panel_count'])
+                if status == 'APPROVED':
+                    expected['true_positives' if entry['label'] else 'false_positives'] += 1
+                elif entry['label']:
+                    expected['false_negatives'] += 1
+        finally:
+            config.MIN_CONFIDENCE_THRESHOLD = configured
+        differences = _differences(expected, ranked, tuple(expected))
+        assert not differences, f"threshold {threshold}: {differences}"
+
+
+def check_rescore_matches_decide(work_dir):
+    """Stored features re-score to the decisions verification made, with no flips"""
+    store = FeatureStore(os.path.join(work_dir, 'features'))
+    verifier = SolarPanelVerifier(feature_store=store)
+    cases = _synthetic_cases(work_dir)
+    for case in cases:
+        verifier.verify_installation(case['user_image'], case['satellite_image'], render=False)
+    verifier.verify_batch([case['user_image'] for case in cases],
+                          [case['satellite_image'] for case in cases])
+    store.close()
+
+    columns = store.load(['coverage', 'similarity', 'panel_count', 'confidence', 'approved'])
+    assert len(columns['approved']) == 2 * len(cases), f"{len(columns['approved'])} rows stored"
+    for i in range(len(columns['approved'])):
+        confidence, status = SolarPanelVerifier.decide(
+            columns['coverage'][i], columns['similarity'][i], columns['panel_count'][i])
+        assert (status == 'APPROVED') == columns['approved'][i], f"row {i}: {status}"
+        assert np.isclose(confidence, columns['confidence'][i], rtol=0, atol=1e-12), f"row {i}"
+
+    report, flipped, confidence, approved = rescore(store)
+    assert len(flipped) == 0, report['flips']
+    assert np.array_equal(approved, columns['approved'])
+
+
+def check_checkpoint_compaction(work_dir):
+    """Checkpoint lines for files gone from the inbox are dropped, live ones kept"""
+    inbox = os.path.join(work_dir, 'inbox')
+    os.makedirs(inbox)
+    checkpoint_path = os.path.join(work_dir, 'state', 'processed.tsv')
+    checkpoint = Checkpoint(checkpoint_path)
+
+    kept = []
+    for i in range(3):
+        path = os.path.join(inbox, f"kept_{i}.jpg")
+        with open(path, 'wb') as f:
+            f.write(b'x' * (i + 1))
+        key = Checkpoint.key(path, os.stat(path))
+        checkpoint.add(key)
+        kept.append(key)
+
+    archived = [(os.path.join(inbox, f"archived_{i}.jpg"), 1, i)
+                for i in range(config.WATCH_CHECKPOINT_COMPACT_LINES)]
+    for key in archived[:-1]:
+        checkpoint.add(key, gone=True)
+    assert not checkpoint.stale, 'stale before the compaction threshold'
+    checkpoint.add(archived[-1], gone=True)
+    assert checkpoint.stale, 'not stale at the compaction threshold'
+
+    checkpoint.compact()
+    assert not checkpoint.stale, 'still stale after compaction'
+    assert all(key in checkpoint for key in kept), 'compaction dropped a live file'
+    checkpoint.close()
+
+    with open(checkpoint_path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == len(kept), f"{len(lines)} lines left, expected {len(kept)}"
+
+    # A reloaded checkpoint still recognises the live files
+    reloaded = Checkpoint(checkpoint_path)
+    assert all(key in reloaded for key in kept), 'reloaded checkpoint lost a live file'
+    reloaded.close()
+
+
+CHECKS = [
+    check_batch_matches_single,
+    check_deadline_leaves_results_unchanged,
+    check_mask_round_trip,
+    check_sweep_matches_decide,
+    check_rescore_matches_decide,
+    check_checkpoint_compaction,
+]
+
+
+def run_checks(checks=None, title='INVARIANT CHECKS'):
+    """
+    Run checks, each in its own temporary directory
+
+    Args:
+        checks: Check functions taking the directory (defaults to CHECKS);
+            the other check_*.py scripts pass their own
+        title: Heading printed above the results
+
+    Returns:
+        Whether all checks passed
+    """
+    checks = checks or CHECKS
+    print("=" * 70)
+    print(title)
+    print("=" * 70)
+
+    passed = 0
+    for check in checks:
+        with tempfile.TemporaryDirectory() as work_dir:
+            try:
+                check(work_dir)
+                passed += 1
+                print(f"✓ {check.__name__}")
+            except Exception:
+                print(f"✗ {check.__name__}")
+                traceback.print_exc()
+
+    print()
+    print(f"{passed}/{len(checks)} checks passed")
+    return passed == len(checks)
+
+
+def main():
+    """Main entry point"""
+    if not run_checks():
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Scripted checks of the durable job queue
+
+Leases are made a fraction of a second long, so the checks can let one
+expire and have a second worker reclaim the job while the first is still
+running it.
+
+Usage:
+    python check_job_queue.py
+"""
+
+import os
+import time
+from check_invariants import run_checks
+from job_queue import JobQueue
+
+
+LEASE_SECONDS = 0.2
+
+
+def _expire_lease():
+    """Wait until leases taken now have expired"""
+    time.sleep(LEASE_SECONDS * 1.5)
+
+
+def check_expired_lease_reclaimed_first_result_wins(work_dir):
+    """A job whose lease expired is claimed again, and whichever run finishes first is kept"""
+    jobs = JobQueue(os.path.join(work_dir, 'jobs.sqlite'), lease_seconds=LEASE_SECONDS, max_attempts=3)
+    try:
+        jobs.enqueue([{'id': f"job{i}", 'user_image': f"home{i}.jpg"} for i in range(2)])
+
+        stalled = jobs.claim('worker-a', count=2)
+        assert [job['id'] for job in stalled] == ['job0', 'job1']
+        assert not jobs.claim('worker-b'), 'claimed a job under a live lease'
+
+        _expire_lease()
+        reclaimed = jobs.claim('worker-b', count=2)
+        assert [job['id'] for job in reclaimed] == ['job0', 'job1'], reclaimed
+        assert all(job['attempts'] == 2 for job in reclaimed), reclaimed
+        assert all(new['token'] != old['token'] for new, old in zip(reclaimed, stalled))
+
+        # The stalled worker has lost its leases
+        assert not jobs.heartbeat('job0', stalled[0]['token']), 'heartbeat on a lost lease accepted'
+        assert not jobs.fail('job0', stalled[0]['token'], 'late failure'), 'failure on a lost lease accepted'
+        assert jobs.heartbeat('job0', reclaimed[0]['token'])
+
+        # job0: the reclaiming worker finishes first; job1: the stalled one does
+        assert jobs.complete('job0', reclaimed[0]['token'], {'run': 'worker-b'})
+        assert not jobs.complete('job0', stalled[0]['token'], {'run': 'worker-a'})
+        assert jobs.complete('job1', stalled[1]['token'], {'run': 'worker-a'})
+        assert not jobs.complete('job1', reclaimed[1]['token'], {'run': 'worker-b'})
+
+        recorded = {job_id: results['run'] for job_id, results, _ in jobs.results()}
+        assert recorded == {'job0': 'worker-b', 'job1': 'worker-a'}, recorded
+        assert jobs.counts() == {'queued': 0, 'leased': 0, 'done': 2, 'failed': 0}, jobs.counts()
+    finally:
+        jobs.close()
+
+
+def check_expired_final_attempt_fails(work_dir):
+    """A lease expiring on the last allowed attempt fails the job instead of requeueing it"""
+    jobs = JobQueue(os.path.join(work_dir, 'jobs.sqlite'), lease_seconds=LEASE_SECONDS, max_attempts=2)
+    try:
+        jobs.enqueue([{'id': 'job0', 'user_image': 'home0.jpg'}])
+        for attempt in range(2):
+            assert [job['attempts'] for job in jobs.claim(f"worker-{attempt}")] == [attempt + 1]
+            _expire_lease()
+        assert not jobs.claim('worker-late'), 'job claimed beyond max_attempts'
+        [(job_id, results, error)] = list(jobs.results())
+        assert results is None and 'lease expired' in error, error
+    finally:
+        jobs.close()
+
+
+CHECKS = [
+    check_expired_lease_reclaimed_first_result_wins,
+    check_expired_final_attempt_fails,
+]
+
+
+def main():
+    """Main entry point"""
+    if not run_checks(CHECKS, 'JOB QUEUE CHECKS'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
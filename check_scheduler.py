@@ -0,0 +1,92 @@
+"""
+Scripted checks of the priority scheduler
+
+Verifications are replaced by jobs that block until released, so the checks
+control exactly which jobs are running when an interactive job arrives.
+
+Usage:
+    python check_scheduler.py
+"""
+
+import time
+import threading
+from check_invariants import run_checks
+from scheduler import PriorityScheduler
+
+
+class _BlockingVerifier:
+    """Stands in for SolarPanelVerifier; non-interactive images block until released"""
+
+    def __init__(self, release):
+        self.release = release
+
+    def verify_installation(self, user_image_path, satellite_image_path=None, **kwargs):
+        if not user_image_path.startswith('interactive'):
+            self.release.wait()
+        return {'status': 'COMPLETED', 'user_image_path': user_image_path}
+
+
+class _BlockingScheduler(PriorityScheduler):
+    """Scheduler whose threads use _BlockingVerifier"""
+
+    def __init__(self, release, *args, **kwargs):
+        self.release = release
+        super().__init__(*args, **kwargs)
+
+    def _verifier(self):
+        return _BlockingVerifier(self.release)
+
+
+def _wait_until(condition, timeout=5.0):
+    """Poll a condition until it holds or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def check_interactive_preempts_queued_bulk(work_dir):
+    """With normal and bulk work filling the shared threads, an interactive job starts at once"""
+    release = threading.Event()
+    scheduler = _BlockingScheduler(release, workers=2, reserved=1, limits={}, aging_seconds=0.05)
+    try:
+        queued = [scheduler.submit(f"bulk_{i}.jpg", priority='bulk') for i in range(4)]
+        queued += [scheduler.submit(f"normal_{i}.jpg", priority='normal') for i in range(4)]
+
+        def running():
+            metrics = scheduler.metrics()
+            return metrics['normal']['running'] + metrics['bulk']['running']
+
+        assert _wait_until(lambda: running() == 2), 'shared threads did not fill'
+        # Let the queued jobs age past every class boundary; they must still
+        # not take the reserved thread
+        time.sleep(0.2)
+        assert running() == 2, f"{running()} non-interactive jobs on {scheduler.threads_total} threads"
+
+        started = time.monotonic()
+        results = scheduler.submit('interactive.jpg', priority='interactive').result(timeout=2)
+        waited = time.monotonic() - started
+        assert results['status'] == 'COMPLETED', results
+        assert waited < 1.0, f"interactive job waited {waited:.2f}s behind bulk work"
+        assert not any(future.done() for future in queued), 'queued work finished before release'
+    finally:
+        release.set()
+        scheduler.shutdown()
+    assert all(future.result()['status'] == 'COMPLETED' for future in queued)
+
+
+CHECKS = [
+    check_interactive_preempts_queued_bulk,
+]
+
+
+def main():
+    """Main entry point"""
+    if not run_checks(CHECKS, 'SCHEDULER CHECKS'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
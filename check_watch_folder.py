@@ -0,0 +1,75 @@
+"""
+Scripted checks of the watch-folder daemon's inbox scanning
+
+Usage:
+    python check_watch_folder.py
+"""
+
+import os
+import time
+import queue
+from check_invariants import run_checks
+from watch_folder import WatchFolderDaemon
+
+
+def _queued(daemon):
+    """Paths the last scans queued, draining the daemon's event queue"""
+    paths = set()
+    while True:
+        try:
+            paths.add(daemon._events.get_nowait())
+        except queue.Empty:
+            return paths
+
+
+def _write(path):
+    with open(path, 'wb') as f:
+        f.write(b'photo')
+
+
+def check_file_written_during_scan_is_found(work_dir):
+    """A file created in the same mtime tick as a scan is queued by the next scan"""
+    inbox = os.path.join(work_dir, 'inbox')
+    os.makedirs(inbox)
+    daemon = WatchFolderDaemon([inbox], archive_dir='', state_dir=os.path.join(work_dir, 'state'),
+                               workers=1)
+    try:
+        _write(os.path.join(inbox, 'first.jpg'))
+        daemon._scan()
+        assert _queued(daemon) == {os.path.join(inbox, 'first.jpg')}
+        listed = os.stat(inbox).st_mtime_ns
+
+        # Written while the daemon was listing; a coarse timestamp leaves the
+        # directory mtime where the listing saw it
+        late = os.path.join(inbox, 'late.jpg')
+        _write(late)
+        os.utime(inbox, ns=(listed, listed))
+        daemon._scan()
+        assert late in _queued(daemon), 'file written during the scan was missed'
+
+        # Once the mtime is old, an unchanged directory is not listed again
+        old = time.time_ns() - 3600 * 10**9
+        os.utime(inbox, ns=(old, old))
+        daemon._scan()
+        _queued(daemon)
+        _write(os.path.join(inbox, 'unseen.jpg'))
+        os.utime(inbox, ns=(old, old))
+        daemon._scan()
+        assert not _queued(daemon), 'old unchanged directory was listed again'
+    finally:
+        daemon.checkpoint.close()
+
+
+CHECKS = [
+    check_file_written_during_scan_is_found,
+]
+
+
+def main():
+    """Main entry point"""
+    if not run_checks(CHECKS, 'WATCH FOLDER CHECKS'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
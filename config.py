@@ -2,21 +2,132 @@
 Configuration settings for Solar Panel Verification System
 """
 
+import os
+
 # Image processing settings
 MIN_CONFIDENCE_THRESHOLD = 0.45
+CONFIDENCE_WEIGHTS = {'coverage': 0.4, 'similarity': 0.3, 'panels': 0.3}  # Sum to 1
 SOLAR_PANEL_COLOR_RANGE = {
     'blue': (100, 150),
     'hue': (100, 130)
 }
 
+# Solar panel detection settings (HSV ranges as (lower, upper), inclusive)
+SOLAR_PANEL_HSV_RANGE = ((80, 50, 20), (140, 255, 150))
+ROOF_EXCLUDE_HSV_RANGES = [
+    ((0, 40, 30), (25, 255, 180)),
+    ((160, 40, 30), (180, 255, 180)),
+]
+MORPH_KERNEL_SIZE = 7
+MIN_PANEL_AREA_RATIO = 0.002
+
 # Image comparison settings
 STRUCTURAL_SIMILARITY_THRESHOLD = 0.5
 FEATURE_MATCH_THRESHOLD = 50
+SATELLITE_CACHE_MAX_MB = 512  # Prepared satellite images kept per verifier
+SATELLITE_CACHE_LEVELS = 4  # Target sizes kept per satellite image
+CONCURRENT_SATELLITE = True  # Compare with the satellite while detection runs (not in low-memory mode)
 
 # Output settings
 OUTPUT_DIR = 'verification_results'
 TEMP_DIR = 'temp_images'
+SITE_HISTORY_DIR = 'site_history'
+RENDER_OUTPUT_IMAGE = True  # Set False to return geometry only (see render_report)
+SAVE_DETECTION_MASKS = False  # Store each detection mask (mask_codec format) for audit
 
 # API settings (for satellite imagery)
 SATELLITE_API_TIMEOUT = 30
 MAX_IMAGE_SIZE = (2048, 2048)
+
+# Memory settings
+LOW_MEMORY_MODE = False  # Reuse preallocated buffers and work in place
+MEMORY_PROFILING = False  # Attach a per-stage tracemalloc/RSS report to results
+
+# Calibration settings
+CALIBRATION_HSV_BINS = (90, 32, 32)  # H, S, V histogram bins (H spans 0-179)
+CALIBRATION_ARCHIVE_DIR = 'calibration_archive'
+
+# Evaluation settings
+EVALUATION_DIR = 'evaluation_runs'
+FEATURE_CACHE_DIR = 'feature_cache'
+EVALUATION_MAX_GROUP = 8  # Cases per worker task (at most this many finished cases per worker are lost on interrupt)
+
+# Duplicate photo detection (off by default so bulk, load-test and synthetic
+# runs do not fill the index; e.g. os.path.join(OUTPUT_DIR, 'phash_index.sqlite'))
+PHASH_INDEX_PATH = None
+PHASH_INDEX_DEFAULT_PATH = os.path.join(OUTPUT_DIR, 'phash_index.sqlite')  # Used by hash_index.py
+PHASH_MATCH_RADIUS = 6  # Max Hamming distance between 64-bit hashes
+PHASH_INDEX_TIMEOUT = 30  # Seconds to wait for a locked index before giving up
+
+# Batch settings
+BATCH_GEOHASH_PRECISION = 6  # ~1.2 km x 0.6 km cells
+
+# Video ingestion settings
+VIDEO_FRAME_STRIDE = 5  # Decode every n-th frame
+VIDEO_MIN_HASH_DISTANCE = 6  # dHash distance from the last keyframe to keep a frame
+VIDEO_MAX_KEYFRAMES = 60
+VIDEO_DETECT_WORKERS = 2
+VIDEO_QUEUE_SIZE = 4  # Frames buffered between decoding and detection
+VIDEO_MIN_PANEL_FRAME_FRACTION = 0.3  # Keyframes that must show panels
+
+# Autotuning settings
+AUTOTUNE_ENABLED = True  # Apply the saved per-machine profile in batch/service modes
+AUTOTUNE_PROFILE_PATH = os.path.join(os.path.expanduser('~'), '.solar_verifier', 'autotune.json')
+AUTOTUNE_MIN_IMAGES = 48  # Images timed per setting
+AUTOTUNE_IMAGES_PER_WORKER = 4  # Minimum images timed per worker process
+
+# Pipelined executor settings
+PIPELINE_READERS = 2
+PIPELINE_ENCODERS = 1
+PIPELINE_QUEUE_SIZE = 8  # Cases buffered between stages
+
+# Decoded image cache (set IMAGE_CACHE_DIR to enable)
+IMAGE_CACHE_DIR = None
+IMAGE_CACHE_MAX_MB = 2048  # Per process: each counts the arrays present at its start plus its own writes
+
+# Priority scheduler settings
+SCHEDULER_INTERACTIVE_RESERVE = 1  # Threads only interactive jobs may use
+SCHEDULER_CLASS_LIMITS = {'interactive': None, 'normal': None, 'bulk': None}  # None: no extra limit
+SCHEDULER_AGING_SECONDS = 30.0  # Queue time that promotes a job by one class
+
+# Distributed job queue settings (put JOB_QUEUE_PATH on a volume all nodes share)
+JOB_QUEUE_PATH = os.path.join(OUTPUT_DIR, 'job_queue.sqlite')
+JOB_LEASE_SECONDS = 120  # Claim lifetime without a heartbeat
+JOB_MAX_ATTEMPTS = 3
+
+# Adaptive processing resolution (process at the smallest size that resolves the panels)
+ADAPTIVE_RESOLUTION = False
+ADAPTIVE_PROBE_SIZE = 256  # Thumbnail side for the quick panel-scale pass
+ADAPTIVE_MIN_SIZE = 512  # Never process below this longest side
+ADAPTIVE_MIN_PANEL_PIXELS = 48  # Smallest panel side wanted at processing size
+PANEL_MIN_SIDE_METERS = 1.0  # Short side of a typical module, for ground-sample distance
+
+# Thumbnail pre-screen (reject hopeless images before full processing)
+PRESCREEN_ENABLED = False
+PRESCREEN_THUMBNAIL_SIZE = 160  # Longest side of the checked thumbnail
+PRESCREEN_MIN_SIZE = 100  # Smallest acceptable image side in pixels
+PRESCREEN_BRIGHTNESS_RANGE = (15, 240)  # Acceptable mean gray level
+PRESCREEN_MIN_SHARPNESS = 10.0  # Laplacian variance of the thumbnail
+
+# Watch-folder daemon settings
+WATCH_INBOXES = []  # Default inbox directories
+WATCH_ARCHIVE_DIR = 'archive'  # Inputs and results are moved here, by day
+WATCH_STATE_DIR = os.path.join(OUTPUT_DIR, 'watch_state')
+WATCH_SETTLE_SECONDS = 2.0  # Unchanged size/mtime needed before processing
+WATCH_MTIME_RESOLUTION_SECONDS = 2.0  # Coarsest directory mtime step expected (FAT, some network shares)
+WATCH_POLL_SECONDS = 1.0
+WATCH_CHECKPOINT_COMPACT_LINES = 1000  # Lines of files gone from the inbox before the checkpoint is rewritten
+
+# Output viewer settings
+TILE_SIZE = 256  # Tile side of the viewer's image pyramid
+TILE_CACHE_SIZE = 256  # Rendered tiles kept in memory
+
+# Feature store settings (set FEATURE_STORE_DIR to record every verification)
+FEATURE_STORE_DIR = None
+FEATURE_STORE_SEGMENT_ROWS = 10000  # Rows buffered per written segment
+
+# Deadline settings (verify_installation(deadline=seconds))
+DEADLINE_SECONDS_PER_MEGAPIXEL = {'detect': 0.02, 'compare': 0.13, 'render': 0.07}  # Starting estimates, refined per verifier
+DEADLINE_RESERVE = 0.1  # Fraction of the budget kept for scoring and overheads
+DEADLINE_MIN_SIZE = 512  # Smallest processing size a deadline may force
+DEADLINE_APPROX_COMPARE_SIZE = 512  # Longest side of an approximate satellite comparison
@@ -0,0 +1,106 @@
+"""
+Per-request time budgets for verification
+
+Deadline times each stage of one verification against the caller's budget
+and records the degradations applied to stay within it. StageCosts holds
+running estimates of each stage's cost per megapixel, so the verifier can
+tell in advance whether a stage still fits in the remaining time.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+import config
+
+
+class Deadline:
+    """Time budget of one verification with per-stage timings"""
+
+    def __init__(self, seconds=None, reserve=None):
+        """
+        Start the clock
+
+        Args:
+            seconds: Budget in seconds; None means unlimited (stages are
+                still timed but nothing is ever degraded)
+            reserve: Fraction of the budget kept back for scoring and
+                overheads (defaults to config.DEADLINE_RESERVE)
+        """
+        self.seconds = seconds
+        self.reserve = config.DEADLINE_RESERVE if reserve is None else reserve
+        self.start = time.monotonic()
+        self.timings = {}
+        self.degradations = []
+
+    @property
+    def enabled(self):
+        return self.seconds is not None
+
+    def elapsed(self):
+        """Seconds since the verification started"""
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        """Seconds left in the budget (negative when overrun, infinite without a budget)"""
+        if self.seconds is None:
+            return float('inf')
+        return self.seconds - self.elapsed()
+
+    def available(self):
+        """Seconds left for stages, after the reserve"""
+        if self.seconds is None:
+            return float('inf')
+        return self.remaining() - self.reserve * self.seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding a stage's wall time to its timing"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def degrade(self, stage, action, reason, **details):
+        """Record a degradation applied to a stage"""
+        self.degradations.append({'stage': stage, 'action': action, 'reason': reason, **details})
+
+    def report(self):
+        """Budget, elapsed time and per-stage seconds"""
+        elapsed = self.elapsed()
+        return {
+            'seconds': self.seconds,
+            'elapsed_seconds': round(elapsed, 4),
+            'met': self.seconds is None or elapsed <= self.seconds,
+            'stage_seconds': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+        }
+
+
+class StageCosts:
+    """Running estimates of seconds per megapixel for the budgeted stages"""
+
+    # Weight of the newest measurement in the running average
+    SMOOTHING = 0.3
+
+    def __init__(self, initial=None):
+        """
+        Initialize the estimates
+
+        Args:
+            initial: Dictionary of stage name to seconds per megapixel
+                (defaults to config.DEADLINE_SECONDS_PER_MEGAPIXEL)
+        """
+        self.costs = dict(initial or config.DEADLINE_SECONDS_PER_MEGAPIXEL)
+        self._lock = threading.Lock()
+
+    def estimate(self, stage, pixels):
+        """Expected seconds for a stage over a number of pixels"""
+        return self.costs[stage] * pixels / 1e6
+
+    def update(self, stage, pixels, seconds):
+        """Fold a measured stage time into its estimate"""
+        if pixels <= 0:
+            return
+        measured = seconds / (pixels / 1e6)
+        with self._lock:
+            self.costs[stage] += self.SMOOTHING * (measured - self.costs[stage])
@@ -0,0 +1,306 @@
+"""
+Resumable evaluation of the verifier against a labeled manifest
+
+Features for each case are extracted in parallel worker processes and
+appended to a checkpoint file as they finish, so an interrupted run resumes
+where it stopped. Features are also kept in a content-addressed cache, and
+the accuracy report is always recomputed from stored features with the
+current scoring settings, so a scoring change never re-runs detection.
+
+Usage:
+    python evaluate.py manifest.csv [--run-name NAME] [--workers N]
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from autotune import apply_saved_profile, default_workers
+from batch import plan_groups
+from feature_cache import FeatureCache
+from manifest import load_manifest
+from verifier import SolarPanelVerifier
+import config
+
+
+# Per-process state, set up by _init_worker
+_verifier = None
+_cache = None
+
+
+def _init_worker(cache_dir):
+    """Create the verifier and feature cache used by a worker process"""
+    global _verifier, _cache
+    apply_saved_profile()
+    _verifier = SolarPanelVerifier()
+    _cache = FeatureCache(cache_dir) if cache_dir else None
+
+
+def evaluate_case(case):
+    """
+    Extract (or fetch cached) features for one manifest case
+
+    Returns:
+        Checkpoint record with id, label, features and cache flag, or an error
+    """
+    record = {'id': case['id'], 'label': case['label']}
+    try:
+        key = None
+        features = None
+        if _cache is not None:
+            key = FeatureCache.make_key(case['user_image'], case['satellite_image'])
+            features = _cache.get(key)
+
+        record['cached'] = features is not None
+        if features is None:
+            start = time.perf_counter()
+            features = _verifier.extract_features(case['user_image'], case['satellite_image'])
+            if features is None:
+                record['error'] = 'Failed to load user image'
+                return record
+            features['latency_seconds'] = round(time.perf_counter() - start, 4)
+            if _cache is not None:
+                _cache.put(key, features)
+
+        record['features'] = features
+    except Exception as e:
+        record['error'] = str(e)
+
+    return record
+
+
+def evaluate_group(cases):
+    """Evaluate a locality group of cases on the current worker"""
+    return [evaluate_case(case) for case in cases]
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Read completed records from a checkpoint file
+
+    Errored records and a partially written final line are ignored so those
+    cases are retried on resume.
+    """
+    records = {}
+    if not os.path.exists(checkpoint_path):
+        return records
+
+    with open(checkpoint_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'features' in record:
+                records[record['id']] = record
+    return records
+
+
+def build_report(records, elapsed=None, processed=0):
+    """
+    Build the accuracy and latency report from evaluation records
+
+    Args:
+        records: Checkpoint records (cases without features count as errors)
+        elapsed: Wall-clock seconds spent in this run
+        processed: Number of cases processed in this run
+
+    Returns:
+        Report dictionary; latency percentiles cover only the cases whose
+        features were extracted rather than read from the feature cache
+    """
+    tp = fp = tn = fn = unlabeled = 0
+    latencies = []
+    cached = 0
+    errors = []
+
+    for record in records:
+        if 'features' not in record:
+            errors.append({'id': record['id'], 'error': record.get('error')})
+            continue
+
+        features = record['features']
+        if record.get('cached'):
+            # Its latency is that of the run that extracted it
+            cached += 1
+        else:
+            latencies.append(features.get('latency_seconds', 0))
+
+        if record['label'] is None:
+            unlabeled += 1
+            continue
+
+        _, status = SolarPanelVerifier.decide(
+            features['solar_coverage'],
+            features['similarity_score'],
+            features['panel_count']
+        )
+        predicted = status == 'APPROVED'
+        if predicted and record['label']:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif record['label']:
+            fn += 1
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    labeled = tp + fp + tn + fn
+
+    report = {
+        'threshold': config.MIN_CONFIDENCE_THRESHOLD,
+        'cases': len(records),
+        'labeled': labeled,
+        'unlabeled': unlabeled,
+        'errors': len(errors),
+        'confusion_matrix': {
+            'true_positive': tp, 'false_positive': fp,
+            'true_negative': tn, 'false_negative': fn,
+        },
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        'accuracy': round((tp + tn) / labeled, 4) if labeled else 0.0,
+        'cached_features': cached,
+        'error_samples': errors[:20],
+    }
+
+    if latencies:
+        values = np.array(latencies)
+        report['latency_seconds'] = {
+            'cases': len(latencies),
+            'mean': round(float(values.mean()), 4),
+            'p50': round(float(np.percentile(values, 50)), 4),
+            'p90': round(float(np.percentile(values, 90)), 4),
+            'p95': round(float(np.percentile(values, 95)), 4),
+            'p99': round(float(np.percentile(values, 99)), 4),
+            'max': round(float(values.max()), 4),
+        }
+
+    if elapsed:
+        report['run_seconds'] = round(elapsed, 2)
+        report['run_processed'] = processed
+        report['run_images_per_second'] = round(processed / elapsed, 2)
+
+    return report
+
+
+def run_evaluation(cases, run_dir, workers=None, cache_dir=None):
+    """
+    Evaluate manifest cases, resuming from the run directory's checkpoint
+
+    Args:
+        cases: Cases from manifest.load_manifest
+        run_dir: Directory holding progress.jsonl and report.json
+        workers: Worker processes (defaults to the autotuned count or the
+            CPU count; 1 runs in-process)
+        cache_dir: Feature cache directory (None disables the cache)
+
+    Returns:
+        Report dictionary
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    checkpoint_path = os.path.join(run_dir, 'progress.jsonl')
+    done = load_checkpoint(checkpoint_path)
+    pending = [case for case in cases if case['id'] not in done]
+    workers = workers or default_workers()
+
+    print(f"{len(done)} cases already done, {len(pending)} to process with {workers} worker(s)")
+
+    start = time.perf_counter()
+    with open(checkpoint_path, 'a') as checkpoint:
+        def record_results(records):
+            for record in records:
+                checkpoint.write(json.dumps(record) + '\n')
+                done[record['id']] = record
+            checkpoint.flush()
+            processed = len(done) - already_done
+            if processed // 100 > (processed - len(records)) // 100:
+                print(f"  {processed}/{len(pending)} processed")
+
+        # Cases sharing a satellite image run together on one worker, in
+        # small groups so finished cases reach the checkpoint promptly
+        already_done = len(done)
+        groups = plan_groups(pending, workers, max_size=config.EVALUATION_MAX_GROUP)
+        if workers == 1:
+            _init_worker(cache_dir)
+            for group in groups:
+                for case in group:
+                    record_results([evaluate_case(case)])
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(cache_dir,)) as pool:
+                futures = [pool.submit(evaluate_group, group) for group in groups]
+                for future in as_completed(futures):
+                    record_results(future.result())
+    elapsed = time.perf_counter() - start
+
+    records = [done[case['id']] for case in cases if case['id'] in done]
+    records += [{'id': case['id'], 'error': 'not processed'}
+                for case in cases if case['id'] not in done]
+    report = build_report(records, elapsed, len(pending))
+
+    with open(os.path.join(run_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def print_report(report):
+    """Print a report to the console"""
+    matrix = report['confusion_matrix']
+    print("=" * 60)
+    print("EVALUATION REPORT")
+    print("=" * 60)
+    print(f"Cases: {report['cases']} (labeled {report['labeled']}, errors {report['errors']})")
+    print(f"Threshold: {report['threshold']}")
+    print()
+    print("                 Predicted APPROVED  Predicted REJECTED")
+    print(f"Actual solar     {matrix['true_positive']:>18}  {matrix['false_negative']:>18}")
+    print(f"Actual no solar  {matrix['false_positive']:>18}  {matrix['true_negative']:>18}")
+    print()
+    print(f"Precision: {report['precision']:.3f}  Recall: {report['recall']:.3f}  "
+          f"F1: {report['f1']:.3f}  Accuracy: {report['accuracy']:.3f}")
+
+    if 'latency_seconds' in report:
+        lat = report['latency_seconds']
+        print(f"Latency (s): mean {lat['mean']:.3f}  p50 {lat['p50']:.3f}  p95 {lat['p95']:.3f}  "
+              f"p99 {lat['p99']:.3f}  max {lat['max']:.3f}  "
+              f"({lat['cases']} extracted, {report['cached_features']} cached excluded)")
+    elif report['cached_features']:
+        print(f"Latency: not measured, all {report['cached_features']} cases came from the feature cache")
+    if 'run_images_per_second' in report:
+        print(f"This run: {report['run_processed']} images in {report['run_seconds']}s "
+              f"({report['run_images_per_second']} images/s, {report['cached_features']} cached)")
+    print("=" * 60)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Evaluate the verifier on a labeled manifest')
+    parser.add_argument('manifest', help='Path to a labeled manifest (.csv or .jsonl)')
+    parser.add_argument('--run-name', help='Run directory name (defaults to the manifest name)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--cache-dir', default=config.FEATURE_CACHE_DIR, help='Feature cache directory')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the feature cache')
+
+    args = parser.parse_args()
+
+    run_name = args.run_name or os.path.splitext(os.path.basename(args.manifest))[0]
+    run_dir = os.path.join(config.EVALUATION_DIR, run_name)
+    cases = load_manifest(args.manifest)
+
+    report = run_evaluation(
+        cases, run_dir, args.workers,
+        cache_dir=None if args.no_cache else args.cache_dir
+    )
+    print_report(report)
+    print(f"Report saved to: {os.path.join(run_dir, 'report.json')}")
+
+
+if __name__ == '__main__':
+    main()
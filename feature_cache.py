@@ -0,0 +1,94 @@
+"""
+On-disk cache of per-image verification features
+
+Features (coverage, similarity, panel count, ...) are keyed by the content
+hash of the input images and a signature of the detection settings, so
+re-scoring with different confidence weights or thresholds never re-runs
+detection, while changing a detection setting invalidates the cache.
+"""
+
+import os
+import json
+import hashlib
+import config
+
+
+# Bump when the meaning of a cached feature changes
+FEATURE_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-1 digest of a file's contents
+
+    Args:
+        path: File path
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_signature():
+    """Short hash of the configuration values that affect detection features"""
+    settings = {
+        'version': FEATURE_VERSION,
+        'panel_range': config.SOLAR_PANEL_HSV_RANGE,
+        'exclude_ranges': config.ROOF_EXCLUDE_HSV_RANGES,
+        'kernel': config.MORPH_KERNEL_SIZE,
+        'min_area': config.MIN_PANEL_AREA_RATIO,
+    }
+    if config.ADAPTIVE_RESOLUTION:
+        settings['adaptive_resolution'] = True
+    encoded = json.dumps(settings, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+class FeatureCache:
+    """Directory of small JSON feature records sharded by key prefix"""
+
+    def __init__(self, root):
+        """
+        Initialize the cache
+
+        Args:
+            root: Cache directory
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(user_image_path, satellite_image_path=None):
+        """Build the cache key for an image pair under the current settings"""
+        parts = [file_digest(user_image_path)]
+        if satellite_image_path and os.path.exists(satellite_image_path):
+            parts.append(file_digest(satellite_image_path))
+        parts.append(settings_signature())
+        return hashlib.sha1('/'.join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        """Path of the record for a key"""
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    def get(self, key):
+        """Return the cached features for a key, or None"""
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, features):
+        """Store features for a key (atomic, safe across worker processes)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(features, f)
+        os.replace(tmp_path, path)
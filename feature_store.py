@@ -0,0 +1,349 @@
+"""
+Columnar store of verification features for re-scoring the archive
+
+Every completed verification appends one row of raw features (coverage,
+similarity, panel count, per-panel areas and aspect ratios, image size,
+detection settings signature) together with the decision it received.
+Rows are buffered and written as segments of NumPy columns; per-panel
+values are stored flat with per-row offsets. Loading the numeric columns
+of a million rows is a handful of array reads, so rescore.py can apply new
+confidence weights or thresholds to the whole archive without touching an
+image.
+
+Usage:
+    python feature_store.py import results.jsonl [more.jsonl ...] [--store DIR]
+    python feature_store.py compact [--store DIR]
+    python feature_store.py stats [--store DIR]
+"""
+
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from multiprocessing import util
+import numpy as np
+from feature_cache import settings_signature
+import config
+
+
+# Per-row columns and their dtypes
+ROW_COLUMNS = {
+    'timestamp': 'datetime64[s]',
+    'coverage': np.float64,
+    'similarity': np.float64,
+    'panel_count': np.int32,
+    'width': np.int32,
+    'height': np.int32,
+    'confidence': np.float64,
+    'approved': np.bool_,
+}
+
+# Per-panel columns, indexed through 'panel_offsets'
+PANEL_COLUMNS = {
+    'panel_area': np.float32,
+    'panel_aspect': np.float32,
+}
+
+
+def features_from_results(results, record_id=None, raw=None):
+    """
+    Extract one store row from verification results
+
+    Args:
+        results: Dictionary returned by verify_installation
+        record_id: Identifier of the row (defaults to results['id'] or the
+            user image path)
+        raw: Unrounded 'coverage', 'similarity' and 'confidence' of the
+            decision; without them the rounded values in results are
+            stored, and re-scoring can flip decisions near the threshold
+
+    Returns:
+        Row dictionary, or None for results that did not complete
+    """
+    if results.get('status') != 'COMPLETED':
+        return None
+
+    panels = results.get('panels') or []
+    width, height = results.get('image_size') or (0, 0)
+    raw = dict(raw or {})
+    if 'similarity' not in raw and any(degradation.get('action') == 'skipped_comparison'
+                                       for degradation in results.get('degradations') or []):
+        # Not measured (see SolarPanelVerifier._calculate_confidence)
+        raw['similarity'] = float('nan')
+    return {
+        'record': str(record_id or results.get('id') or results.get('user_image_path') or ''),
+        'timestamp': results.get('timestamp') or 'NaT',
+        'coverage': raw.get('coverage', results.get('solar_coverage') or 0),
+        'similarity': raw.get('similarity', results.get('similarity_score') or 0),
+        'panel_count': len(panels),
+        'width': width,
+        'height': height,
+        'confidence': raw.get('confidence', results.get('confidence') or 0),
+        'approved': results.get('verification_status') == 'APPROVED',
+        'settings': results.get('settings_signature') or settings_signature(),
+        'panel_area': [panel['area'] for panel in panels],
+        'panel_aspect': [panel['bbox'][2] / max(1, panel['bbox'][3]) for panel in panels],
+    }
+
+
+def _segment_columns(rows):
+    """Column arrays of a segment built from row dictionaries"""
+    columns = {name: np.array([row[name] for row in rows], dtype=dtype)
+               for name, dtype in ROW_COLUMNS.items()}
+    # UTF-8 bytes take a quarter of the space of NumPy's UTF-32 strings
+    columns['record'] = np.array([row['record'].encode() for row in rows], dtype=bytes)
+
+    # Settings signatures repeat, so store each once plus a small code per row
+    settings, codes = np.unique([row['settings'] for row in rows], return_inverse=True)
+    columns['settings_values'] = settings
+    columns['settings_code'] = codes.astype(np.uint16)
+
+    counts = [len(row['panel_area']) for row in rows]
+    columns['panel_offsets'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    for name, dtype in PANEL_COLUMNS.items():
+        columns[name] = np.array([value for row in rows for value in row[name]], dtype=dtype)
+    return columns
+
+
+def _write_segment(root, rows):
+    """Write rows as a new segment (atomic, unique across processes)"""
+    if not rows:
+        return None
+    name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.npz"
+    path = os.path.join(root, name)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **_segment_columns(rows))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def _flush_buffer(root, buffer, lock):
+    """Write and empty a store's row buffer; holds no reference to the store"""
+    with lock:
+        rows = list(buffer)
+        buffer.clear()
+        return _write_segment(root, rows)
+
+
+class FeatureStore:
+    """Directory of append-only .npz segments of feature columns"""
+
+    def __init__(self, root=None, segment_rows=None):
+        """
+        Initialize the store
+
+        Args:
+            root: Store directory (defaults to config.FEATURE_STORE_DIR)
+            segment_rows: Rows buffered before a segment is written (defaults
+                to config.FEATURE_STORE_SEGMENT_ROWS)
+        """
+        self.root = root or config.FEATURE_STORE_DIR
+        self.segment_rows = segment_rows or config.FEATURE_STORE_SEGMENT_ROWS
+        os.makedirs(self.root, exist_ok=True)
+        self._rows = []
+        self._lock = threading.Lock()
+        # Flushes when the store is closed or collected, or at interpreter
+        # exit, including in pool worker processes, which skip atexit
+        # handlers. The callback is given the buffer rather than the store,
+        # so it does not keep the store alive.
+        self._finalizer = util.Finalize(self, _flush_buffer, args=(self.root, self._rows, self._lock),
+                                        exitpriority=10)
+
+    def segments(self):
+        """Segment file paths, oldest first"""
+        return sorted(os.path.join(self.root, name) for name in os.listdir(self.root)
+                      if name.endswith('.npz'))
+
+    def append(self, results, record_id=None, raw=None):
+        """
+        Buffer the features of a verification
+
+        Args:
+            results: Dictionary returned by verify_installation
+            record_id: Optional row identifier
+            raw: Unrounded features (see features_from_results)
+
+        Returns:
+            Whether a row was added (only completed verifications are stored)
+        """
+        row = features_from_results(results, record_id, raw)
+        if row is None:
+            return False
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self.segment_rows:
+                self._write(self._take())
+        return True
+
+    def _take(self):
+        # Emptied in place: the finalizer holds this list
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def _write(self, rows):
+        """Write rows as a new segment (atomic, unique across processes)"""
+        return _write_segment(self.root, rows)
+
+    def flush(self):
+        """Write buffered rows to a segment"""
+        return _flush_buffer(self.root, self._rows, self._lock)
+
+    def close(self):
+        """Flush buffered rows; nothing more is written at exit"""
+        return self._finalizer()
+
+    def load(self, columns=None, paths=None):
+        """
+        Load columns of every stored row
+
+        Args:
+            columns: Names to load (defaults to every row column plus
+                'settings'); include 'panel_offsets' or a per-panel column to
+                get the flattened per-panel data
+            paths: Segments to read (defaults to all)
+
+        Returns:
+            Dictionary of concatenated arrays; 'settings' holds each row's
+            settings signature and 'record' UTF-8 encoded identifiers
+        """
+        columns = list(columns or list(ROW_COLUMNS) + ['settings'])
+        paths = self.segments() if paths is None else paths
+        parts = {name: [] for name in columns}
+        settings_index = {}
+        panel_base = 0
+
+        for path in paths:
+            with np.load(path) as segment:
+                for name in columns:
+                    if name == 'settings':
+                        # Re-map segment codes onto one store-wide dictionary
+                        lookup = np.array([settings_index.setdefault(value, len(settings_index))
+                                           for value in segment['settings_values']], dtype=np.uint16)
+                        parts[name].append(lookup[segment['settings_code']])
+                    elif name == 'panel_offsets':
+                        offsets = segment['panel_offsets']
+                        parts[name].append(offsets[1:] + panel_base)
+                    else:
+                        parts[name].append(segment[name])
+                panel_base += int(segment['panel_offsets'][-1])
+
+        loaded = {}
+        for name in columns:
+            if name == 'panel_offsets':
+                loaded[name] = np.concatenate([np.zeros(1, dtype=np.int64)] + parts[name])
+            elif parts[name]:
+                loaded[name] = np.concatenate(parts[name])
+            elif name == 'settings':
+                loaded[name] = np.zeros(0, dtype=np.uint16)
+            else:
+                dtype = {**ROW_COLUMNS, **PANEL_COLUMNS}.get(name, bytes)
+                loaded[name] = np.zeros(0, dtype=dtype)
+
+        if 'settings' in loaded:
+            values = np.array(sorted(settings_index, key=settings_index.get), dtype=str)
+            loaded['settings'] = values[loaded['settings']] if len(values) else np.zeros(0, dtype=str)
+        return loaded
+
+    def records(self, indices):
+        """
+        Identifiers of rows by store-wide index
+
+        Only the segments holding the requested rows are read, so looking up
+        a few rows of a large store stays cheap.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        found = np.empty(len(indices), dtype=object)
+        start = 0
+        for path in self.segments():
+            with np.load(path) as segment:
+                size = len(segment['coverage'])
+                inside = (indices >= start) & (indices < start + size)
+                if inside.any():
+                    found[inside] = [record.decode() for record in
+                                     segment['record'][indices[inside] - start]]
+                start += size
+        return found
+
+    def compact(self):
+        """
+        Merge all segments into one
+
+        Returns:
+            Number of rows in the merged segment
+        """
+        self.flush()
+        paths = self.segments()
+        if len(paths) < 2:
+            return len(self.load(['coverage'])['coverage'])
+
+        # Segments written meanwhile by other processes are left alone
+        merged = self.load(list(ROW_COLUMNS) + ['record', 'settings', 'panel_offsets']
+                           + list(PANEL_COLUMNS), paths)
+        settings, codes = np.unique(merged.pop('settings'), return_inverse=True)
+        merged['settings_values'] = settings
+        merged['settings_code'] = codes.astype(np.uint16)
+
+        path = os.path.join(self.root, f"{time.time_ns():020d}-compact-{uuid.uuid4().hex[:8]}.npz")
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **merged)
+        os.replace(path + '.tmp', path)
+        for old in paths:
+            os.remove(old)
+        return len(merged['coverage'])
+
+    def import_results(self, results_path):
+        """
+        Add the completed verifications of a results file
+
+        Args:
+            results_path: JSON Lines file (batch, pipeline or job queue
+                output) or a single results JSON
+
+        Returns:
+            Number of rows added
+        """
+        added = 0
+        with open(results_path) as f:
+            if results_path.endswith('.jsonl'):
+                entries = (json.loads(line) for line in f if line.strip())
+            else:
+                entries = [json.load(f)]
+            for results in entries:
+                added += self.append(results)
+        self.flush()
+        return added
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Verification feature store maintenance')
+    parser.add_argument('command', choices=['import', 'compact', 'stats'])
+    parser.add_argument('results', nargs='*', help='Results files to import')
+    parser.add_argument('--store', default=None, help='Store directory')
+
+    args = parser.parse_args()
+    store = FeatureStore(args.store or config.FEATURE_STORE_DIR or 'feature_store')
+
+    if args.command == 'import':
+        if not args.results:
+            parser.error('import needs results files')
+        for path in args.results:
+            try:
+                print(f"{path}: {store.import_results(path)} record(s)")
+            except (OSError, ValueError) as e:
+                print(f"Error importing {path}: {e}")
+    elif args.command == 'compact':
+        print(f"Compacted {store.compact()} record(s) into one segment")
+
+    columns = store.load(['approved', 'settings'])
+    size = sum(os.path.getsize(path) for path in store.segments())
+    print(f"{len(columns['approved'])} record(s) in {len(store.segments())} segment(s), "
+          f"{size / 1e6:.1f} MB, {int(columns['approved'].sum())} approved, "
+          f"{len(np.unique(columns['settings']))} settings version(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -35,7 +35,7 @@ class SolarPanelGUI:
                 return None
             
             img = Image.open(image_path)
-            img.thumbnail(size, Image.Resampling.LANCZOS)
+            img.thumbnail(size, Image.LANCZOS)
             
             # Convert to bytes for PySimpleGUI
             bio = io.BytesIO()
@@ -157,7 +157,10 @@ class SolarPanelGUI:
                         window['-OUTPUT-'].print(f"Solar Detected: {'Yes' if results['solar_detected'] else 'No'}")
                         window['-OUTPUT-'].print(f"Solar Coverage: {results['solar_coverage']:.2f}%")
                         window['-OUTPUT-'].print(f"Confidence Level: {results['confidence']:.1%}")
-                        window['-OUTPUT-'].print(f"Similarity Score: {results['similarity_score']:.3f}")
+                        if results['similarity_score'] is None:
+                            window['-OUTPUT-'].print("Similarity Score: not measured (comparison skipped)")
+                        else:
+                            window['-OUTPUT-'].print(f"Similarity Score: {results['similarity_score']:.3f}")
                         window['-OUTPUT-'].print(f"\nMessage: {results['message']}")
                         
                         if results['output_image_path']:
@@ -10,6 +10,7 @@ import os
 from PIL import Image, ImageTk
 import threading
 from verifier import SolarPanelVerifier
+from tile_viewer import TileViewer
 import config
 
 
@@ -132,6 +133,12 @@ class SolarPanelVerificationGUI:
                  font=('Arial', 11, 'bold'),
                  padx=20, pady=10).pack(side=tk.LEFT, padx=5)
         
+        tk.Button(buttons_frame, text="🔍 View Output",
+                 command=self.view_output,
+                 bg='#FF8C00', fg='white',
+                 font=('Arial', 10),
+                 padx=15, pady=10).pack(side=tk.LEFT, padx=5)
+        
         tk.Button(buttons_frame, text="🔄 Clear",
                  command=self.clear_all,
                  bg='#4169E1', fg='white',
@@ -216,7 +223,7 @@ class SolarPanelVerificationGUI:
         try:
             image = Image.open(image_path)
             # Resize image to fit preview
-            image.thumbnail((300, 300), Image.Resampling.LANCZOS)
+            image.thumbnail((300, 300), Image.LANCZOS)
             photo = ImageTk.PhotoImage(image)
             
             label_widget.config(image=photo, text="")
@@ -254,7 +261,10 @@ class SolarPanelVerificationGUI:
                 self.output_text.insert(tk.END, f"Solar Detected: {'Yes' if results['solar_detected'] else 'No'}\n")
                 self.output_text.insert(tk.END, f"Solar Coverage: {results['solar_coverage']:.2f}%\n")
                 self.output_text.insert(tk.END, f"Confidence Level: {results['confidence']:.1%}\n")
-                self.output_text.insert(tk.END, f"Similarity Score: {results['similarity_score']:.3f}\n")
+                if results['similarity_score'] is None:
+                    self.output_text.insert(tk.END, "Similarity Score: not measured (comparison skipped)\n")
+                else:
+                    self.output_text.insert(tk.END, f"Similarity Score: {results['similarity_score']:.3f}\n")
                 self.output_text.insert(tk.END, f"\nMessage: {results['message']}\n")
                 
                 if results['output_image_path']:
@@ -269,6 +279,19 @@ class SolarPanelVerificationGUI:
             self.output_text.insert(tk.END, f"\n❌ Error: {str(e)}\n")
             self.output_text.see(tk.END)
 
+    def view_output(self):
+        """Open the annotated output (or the user image) in the zoomable viewer"""
+        if not self.current_results or self.current_results['status'] != 'COMPLETED':
+            messagebox.showerror("Error", "Please verify an installation first")
+            return
+        
+        image_path = self.current_results['output_image_path'] or self.current_results['user_image_path']
+        try:
+            TileViewer(self.root, image_path, self.current_results.get('panels'),
+                       title=f"Output - {os.path.basename(image_path)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open viewer: {str(e)}")
+
     def clear_all(self):
         """Clear all data"""
         self.current_user_image = None
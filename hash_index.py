@@ -0,0 +1,188 @@
+"""
+Persistent perceptual-hash index for spotting reused photos
+
+Hashes are stored in SQLite together with their four 16-bit chunks, each
+indexed. By the pigeonhole principle two 64-bit hashes within Hamming
+distance r share at least one chunk within distance r // 4, so a radius
+query only probes a few index entries per chunk (multi-index hashing)
+instead of scanning the archive.
+
+Usage:
+    python hash_index.py add IMAGE [IMAGE ...]
+    python hash_index.py query IMAGE [--radius N]
+"""
+
+import os
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from itertools import combinations
+from image_processor import ImageProcessor
+import config
+
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def hamming_distance(hash1, hash2):
+    """Number of differing bits between two hashes"""
+    return bin(hash1 ^ hash2).count('1')
+
+
+def split_hash(value):
+    """Split a 64-bit hash into its 16-bit chunks (most significant first)"""
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - i))) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def _to_signed(value):
+    """Map an unsigned 64-bit hash onto SQLite's signed INTEGER range"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    """Inverse of _to_signed"""
+    return value + (1 << 64) if value < 0 else value
+
+
+def _chunk_neighbours(chunk, radius):
+    """All chunk values within the given Hamming radius of a chunk"""
+    values = [chunk]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+class PerceptualHashIndex:
+    """SQLite-backed index of submission hashes with Hamming-radius lookups"""
+
+    def __init__(self, db_path=None):
+        """
+        Open (or create) the index
+
+        Args:
+            db_path: SQLite file (defaults to config.PHASH_INDEX_PATH, or
+                config.PHASH_INDEX_DEFAULT_PATH when that is unset)
+        """
+        self.db_path = db_path or config.PHASH_INDEX_PATH or config.PHASH_INDEX_DEFAULT_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, timeout=config.PHASH_INDEX_TIMEOUT,
+                                          check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS hashes ('
+                'id INTEGER PRIMARY KEY, hash INTEGER NOT NULL, '
+                'c0 INTEGER, c1 INTEGER, c2 INTEGER, c3 INTEGER, '
+                'record TEXT, submitted TEXT, UNIQUE(hash, record))'
+            )
+            for i in range(CHUNKS):
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS hashes_c{i} ON hashes (c{i})'
+                )
+
+    def add(self, value, record):
+        """
+        Add a submission hash
+
+        Args:
+            value: 64-bit hash
+            record: Identifier of the submission (e.g. image path or application id)
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO hashes (hash, c0, c1, c2, c3, record, submitted) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [_to_signed(value), *split_hash(value), record, datetime.now().isoformat()]
+            )
+
+    def query(self, value, radius=None):
+        """
+        Find stored hashes within a Hamming radius
+
+        Args:
+            value: 64-bit hash
+            radius: Max Hamming distance (defaults to config.PHASH_MATCH_RADIUS)
+
+        Returns:
+            List of match dictionaries sorted by distance
+        """
+        radius = config.PHASH_MATCH_RADIUS if radius is None else radius
+        chunk_radius = radius // CHUNKS
+
+        clauses = []
+        params = []
+        for i, chunk in enumerate(split_hash(value)):
+            neighbours = _chunk_neighbours(chunk, chunk_radius)
+            clauses.append(f"SELECT id, hash, record, submitted FROM hashes "
+                           f"WHERE c{i} IN ({','.join('?' * len(neighbours))})")
+            params.extend(neighbours)
+
+        with self._lock:
+            rows = self.connection.execute(' UNION '.join(clauses), params).fetchall()
+
+        matches = []
+        for _, stored, record, submitted in rows:
+            distance = hamming_distance(value, _to_unsigned(stored))
+            if distance <= radius:
+                matches.append({
+                    'record': record,
+                    'distance': distance,
+                    'submitted': submitted,
+                    'hash': f"{_to_unsigned(stored):016x}",
+                })
+
+        matches.sort(key=lambda m: m['distance'])
+        return matches
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Perceptual-hash index of past submissions')
+    parser.add_argument('command', choices=['add', 'query'])
+    parser.add_argument('images', nargs='+', help='Image paths')
+    parser.add_argument('--index', default=config.PHASH_INDEX_PATH or config.PHASH_INDEX_DEFAULT_PATH,
+                        help='Index database path')
+    parser.add_argument('--radius', type=int, default=config.PHASH_MATCH_RADIUS,
+                        help='Max Hamming distance for matches')
+
+    args = parser.parse_args()
+    index = PerceptualHashIndex(args.index)
+
+    for image_path in args.images:
+        image = ImageProcessor.load_image(image_path)
+        if image is None:
+            continue
+        value = ImageProcessor.perceptual_hash(image)
+
+        if args.command == 'add':
+            index.add(value, image_path)
+        else:
+            matches = index.query(value, args.radius)
+            print(f"{image_path} ({value:016x}): {len(matches)} match(es)")
+            for match in matches:
+                print(f"  distance {match['distance']:>2}  {match['record']}  ({match['submitted']})")
+
+    if args.command == 'add':
+        print(f"Index now holds {len(index)} hashes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Memory-mapped cache of decoded and preprocessed images
+
+Decoded BGR arrays are stored as .npy files keyed by the source file's
+content hash (and, for preprocessed images, the preprocessing parameters).
+Later runs map them read-only instead of decoding the JPEG again, and
+worker processes mapping the same file share its pages through the OS page
+cache. The cache is capped in size and evicts least recently used entries.
+The cap is enforced per process: each process counts the arrays present
+when it started plus those it writes, so processes sharing a directory
+together can exceed it until the next one starts.
+
+Usage:
+    python image_cache.py warm manifest.csv
+    python image_cache.py stats
+    python image_cache.py clear
+"""
+
+import os
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+from feature_cache import file_digest
+from image_processor import ImageProcessor, DEFAULT_MAX_DIM
+from manifest import load_manifest
+import config
+
+
+# Bump when preprocess_image changes in a way its parameters do not capture
+PREPROCESS_VERSION = 1
+
+
+class DecodedImageCache:
+    """Size-capped directory of .npy image arrays opened as read-only memmaps"""
+
+    def __init__(self, root=None, max_bytes=None):
+        """
+        Initialize the cache
+
+        Args:
+            root: Cache directory (defaults to config.IMAGE_CACHE_DIR)
+            max_bytes: Size cap of this process's view of the directory
+                (defaults to config.IMAGE_CACHE_MAX_MB)
+        """
+        self.root = root or config.IMAGE_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = config.IMAGE_CACHE_MAX_MB * 1024 * 1024
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+        # path -> (size, mtime, content hash), least recently used first
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        # Cached array sizes, least recently used first. The directory is
+        # walked only here; afterwards stores and hits keep the index and
+        # the running total current, so eviction never lists the cache.
+        # Arrays written by other processes are counted from their next start.
+        self._index = OrderedDict(
+            (path, size) for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2])
+        )
+        self._size = sum(self._index.values())
+
+    def _entries(self):
+        """(path, size, last use) of every cached array"""
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.npy'):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _digest(self, image_path):
+        """Content hash of a file, memoised by path, size and modification time"""
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+            if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._digests.move_to_end(path)
+                return known[2]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._digests.move_to_end(path)
+            # Every image with cached arrays has at least one, so beyond one
+            # hash per array (plus the image about to be stored) the memo
+            # only holds images that are no longer cached
+            while len(self._digests) > len(self._index) + 1:
+                self._digests.popitem(last=False)
+        return digest
+
+    def _path(self, image_path, kind, params=None):
+        """Cache file path for an image, array kind and parameters"""
+        parts = [self._digest(image_path), kind, json.dumps(params or {}, sort_keys=True)]
+        key = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        return os.path.join(self.root, key[:2], key + '.npy')
+
+    def _open(self, cache_path):
+        """Map a cached array read-only and mark it recently used, or return None"""
+        try:
+            array = np.load(cache_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        with self._lock:
+            if cache_path in self._index:
+                self._index.move_to_end(cache_path)
+        return array
+
+    def _store(self, cache_path, array):
+        """Write an array atomically and return it mapped read-only"""
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, cache_path)
+
+        size = os.path.getsize(cache_path)
+        with self._lock:
+            self._size += size - self._index.pop(cache_path, 0)
+            self._index[cache_path] = size
+            over_cap = self._size > self.max_bytes
+        if over_cap:
+            self.evict()
+
+        mapped = self._open(cache_path)
+        return mapped if mapped is not None else array
+
+    def load_image(self, image_path):
+        """
+        Decoded BGR image, from the cache or decoded and stored on a miss
+
+        Returns:
+            Read-only array, or None if the image cannot be loaded
+        """
+        cache_path = self._path(image_path, 'decoded')
+        array = self._open(cache_path)
+        if array is not None:
+            return array
+
+        image = ImageProcessor.load_image(image_path)
+        if image is None:
+            return None
+        return self._store(cache_path, image)
+
+    def load_preprocessed(self, image_path, image=None, max_dim=None):
+        """
+        Preprocessed BGR image, from the cache or computed and stored on a miss
+
+        Args:
+            image_path: Source image path (the cache key)
+            image: Decoded image, if already loaded
+            max_dim: Processing size passed to preprocess_image
+
+        Returns:
+            Read-only array, or None if the image cannot be loaded
+        """
+        max_dim = max_dim or DEFAULT_MAX_DIM
+        params = {'version': PREPROCESS_VERSION, 'max_dim': max_dim}
+        cache_path = self._path(image_path, 'preprocessed', params)
+        array = self._open(cache_path)
+        if array is not None:
+            return array
+
+        if image is None:
+            image = self.load_image(image_path)
+            if image is None:
+                return None
+        return self._store(cache_path, ImageProcessor.preprocess_image(image, max_dim=max_dim))
+
+    def warm(self, image_paths):
+        """
+        Decode and preprocess images ahead of use
+
+        Returns:
+            Number of images now cached
+        """
+        warmed = 0
+        for image_path in image_paths:
+            if image_path and os.path.exists(image_path):
+                image = self.load_image(image_path)
+                if image is not None and self.load_preprocessed(image_path, image) is not None:
+                    warmed += 1
+        return warmed
+
+    def evict(self):
+        """Delete least recently used arrays until the cache is under its cap"""
+        while True:
+            with self._lock:
+                if not self._index or self._size <= self.max_bytes:
+                    return
+                path, size = self._index.popitem(last=False)
+                self._size -= size
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed, e.g. by another process
+                pass
+
+    def stats(self):
+        """Number of cached arrays and their total size in bytes"""
+        entries = list(self._entries())
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes}
+
+    def clear(self):
+        """Delete every cached array"""
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._index.clear()
+            self._size = 0
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Decoded image cache maintenance')
+    parser.add_argument('command', choices=['warm', 'stats', 'clear'])
+    parser.add_argument('manifest', nargs='?', help='Manifest to warm the cache for')
+    parser.add_argument('--cache-dir', default=None, help='Cache directory')
+
+    args = parser.parse_args()
+    cache = DecodedImageCache(args.cache_dir or config.IMAGE_CACHE_DIR or 'image_cache')
+
+    if args.command == 'warm':
+        if not args.manifest:
+            parser.error('warm needs a manifest')
+        paths = set()
+        for case in load_manifest(args.manifest):
+            paths.add(case['user_image'])
+            if case['satellite_image']:
+                paths.add(case['satellite_image'])
+        print(f"Cached {cache.warm(sorted(paths))} of {len(paths)} image(s)")
+    elif args.command == 'clear':
+        cache.clear()
+        print("Cache cleared")
+
+    stats = cache.stats()
+    print(f"{stats['entries']} array(s), {stats['bytes'] / 1e6:.1f} MB "
+          f"(cap {stats['max_bytes'] / 1e6:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
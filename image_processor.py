@@ -10,6 +10,10 @@ from skimage import exposure
 import config
 
 
+# Longest side images are processed at by default
+DEFAULT_MAX_DIM = 2048
+
+
 class ImageProcessor:
     """Handles image processing and solar panel detection"""
 
@@ -26,14 +30,65 @@ class ImageProcessor:
             return None
 
     @staticmethod
-    def preprocess_image(image):
-        """Preprocess image for analysis"""
+    def perceptual_hash(image):
+        """
+        Compute a 64-bit DCT perceptual hash (pHash) of an image
+
+        The hash survives resizing and recompression, so near-identical
+        photos have a small Hamming distance.
+
+        Returns:
+            Hash as a Python int
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
+        coefficients = cv2.dct(np.float32(small))[:8, :8].flatten()
+        bits = coefficients > np.median(coefficients[1:])
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    @staticmethod
+    def difference_hash(image):
+        """
+        Compute a 64-bit difference hash (dHash) of an image
+
+        Cheaper than perceptual_hash; suited to near-duplicate frame checks.
+
+        Returns:
+            Hash as a Python int
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    @staticmethod
+    def preprocess_image(image, buffers=None, max_dim=None):
+        """
+        Preprocess image for analysis
+
+        Args:
+            image: BGR image
+            buffers: Optional DetectionBuffers; when given, the result is
+                written into the preallocated buffers instead of new arrays
+            max_dim: Longest side to process at (defaults to DEFAULT_MAX_DIM)
+
+        Returns:
+            Preprocessed BGR image
+        """
+        max_dim = max_dim or DEFAULT_MAX_DIM
+
         # Resize if too large
         height, width = image.shape[:2]
-        if width > 2048 or height > 2048:
-            scale = min(2048 / width, 2048 / height)
+        new_width, new_height = width, height
+        if width > max_dim or height > max_dim:
+            scale = min(max_dim / width, max_dim / height)
             new_width = int(width * scale)
             new_height = int(height * scale)
+
+        if buffers is not None:
+            return ImageProcessor._preprocess_in_place(image, (new_width, new_height), buffers)
+
+        if (new_width, new_height) != (width, height):
             image = cv2.resize(image, (new_width, new_height))
         
         # Convert to HSV for better color detection
@@ -45,49 +100,60 @@ class ImageProcessor:
         return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
 
     @staticmethod
-    def detect_solar_panels(image):
+    def _preprocess_in_place(image, size, buffers):
+        """Low-memory variant of preprocess_image using preallocated buffers"""
+        width, height = size
+        buffers.ensure((height, width))
+
+        if image.shape[:2] != (height, width):
+            cv2.resize(image, (width, height), dst=buffers.bgr)
+            cv2.cvtColor(buffers.bgr, cv2.COLOR_BGR2HSV, dst=buffers.hsv)
+        else:
+            cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=buffers.hsv)
+
+        # Equalize the V channel through the single-channel scratch buffer
+        cv2.extractChannel(buffers.hsv, 2, dst=buffers.scratch)
+        cv2.equalizeHist(buffers.scratch, dst=buffers.scratch)
+        cv2.insertChannel(buffers.scratch, buffers.hsv, 2)
+
+        cv2.cvtColor(buffers.hsv, cv2.COLOR_HSV2BGR, dst=buffers.bgr)
+        return buffers.bgr
+
+    @staticmethod
+    def detect_solar_panels(image, buffers=None, kernel_size=None):
         """
         Detect solar panels in the image
         Solar panels typically have dark blue/black colors and rectangular shape
+
+        Args:
+            image: Preprocessed BGR image
+            buffers: Optional DetectionBuffers; when given, HSV conversion and
+                mask logic run in place and the returned mask is a buffer that
+                is overwritten by the next call
+            kernel_size: Morphology kernel size (defaults to
+                config.MORPH_KERNEL_SIZE; see scaled_kernel_size)
+
+        Returns:
+            Tuple of (panel contours, binary mask)
         """
-        # Convert to HSV
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        
-        # Solar panels are very dark with blue hue (not brown/red)
-        # Define range for dark blue color (solar panel specific)
-        lower_blue1 = np.array([80, 50, 20])      # Blue range lower
-        upper_blue1 = np.array([140, 255, 150])   # Blue range upper
-        
-        # Create mask for dark blue colors
-        mask1 = cv2.inRange(hsv, lower_blue1, upper_blue1)
-        
-        # Exclude brown/red colors (roof material)
-        lower_brown = np.array([0, 40, 30])
-        upper_brown = np.array([25, 255, 180])
-        mask_brown = cv2.inRange(hsv, lower_brown, upper_brown)
-        
-        lower_brown2 = np.array([160, 40, 30])
-        upper_brown2 = np.array([180, 255, 180])
-        mask_brown2 = cv2.inRange(hsv, lower_brown2, upper_brown2)
-        
-        # Combine brown masks
-        mask_brown_combined = cv2.bitwise_or(mask_brown, mask_brown2)
-        
-        # Remove brown regions from blue mask
-        mask = cv2.bitwise_and(mask1, cv2.bitwise_not(mask_brown_combined))
-        
-        # Apply morphological operations to improve mask
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        
+        kernel_size = kernel_size or config.MORPH_KERNEL_SIZE
+        if buffers is not None:
+            mask = ImageProcessor._panel_mask_in_place(image, buffers, kernel_size)
+        else:
+            mask = ImageProcessor._panel_mask(image, kernel_size)
+
+        return ImageProcessor._find_panels(mask), mask
+
+    @staticmethod
+    def _find_panels(mask):
+        """Panel-shaped contours of a cleaned-up panel mask"""
         # Find contours
         contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         
         # Filter contours by area and shape (solar panels should be rectangular)
         solar_panels = []
-        image_area = image.shape[0] * image.shape[1]
-        min_area = image_area * 0.002  # At least 0.2% of image
+        image_area = mask.shape[0] * mask.shape[1]
+        min_area = image_area * config.MIN_PANEL_AREA_RATIO  # At least 0.2% of image
         
         for contour in contours:
             area = cv2.contourArea(contour)
@@ -112,7 +178,238 @@ class ImageProcessor:
                         if 0.2 < aspect_ratio < 5.0:
                             solar_panels.append(contour)
         
-        return solar_panels, mask
+        return solar_panels
+
+    @staticmethod
+    def _panel_mask(image, kernel_size):
+        """Build the cleaned-up solar panel color mask for an image"""
+        # Convert to HSV
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        
+        # Solar panels are very dark with blue hue (not brown/red)
+        # Create mask for dark blue colors (solar panel specific)
+        lower_blue, upper_blue = config.SOLAR_PANEL_HSV_RANGE
+        mask1 = cv2.inRange(hsv, np.array(lower_blue), np.array(upper_blue))
+        
+        # Exclude brown/red colors (roof material)
+        mask_brown_combined = None
+        for lower_brown, upper_brown in config.ROOF_EXCLUDE_HSV_RANGES:
+            mask_brown = cv2.inRange(hsv, np.array(lower_brown), np.array(upper_brown))
+            if mask_brown_combined is None:
+                mask_brown_combined = mask_brown
+            else:
+                mask_brown_combined = cv2.bitwise_or(mask_brown_combined, mask_brown)
+        
+        # Remove brown regions from blue mask
+        if mask_brown_combined is None:
+            mask = mask1
+        else:
+            mask = cv2.bitwise_and(mask1, cv2.bitwise_not(mask_brown_combined))
+        
+        # Apply morphological operations to improve mask
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        return mask
+
+    @staticmethod
+    def _panel_mask_in_place(image, buffers, kernel_size):
+        """Low-memory variant of _panel_mask writing into preallocated buffers"""
+        buffers.ensure(image.shape[:2])
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=buffers.hsv)
+
+        lower_blue, upper_blue = config.SOLAR_PANEL_HSV_RANGE
+        mask = cv2.inRange(hsv, np.array(lower_blue), np.array(upper_blue), dst=buffers.mask)
+
+        # mask & ~(brown1 | brown2) == mask & ~brown1 & ~brown2
+        for lower_brown, upper_brown in config.ROOF_EXCLUDE_HSV_RANGES:
+            cv2.inRange(hsv, np.array(lower_brown), np.array(upper_brown), dst=buffers.scratch)
+            cv2.bitwise_not(buffers.scratch, dst=buffers.scratch)
+            cv2.bitwise_and(mask, buffers.scratch, dst=mask)
+
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+        cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, dst=mask)
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=mask)
+        return mask
+
+    @staticmethod
+    def _bucket_by_shape(images):
+        """Indices of same-shaped images, keyed by shape"""
+        buckets = {}
+        for index, image in enumerate(images):
+            buckets.setdefault(image.shape, []).append(index)
+        return buckets
+
+    @staticmethod
+    def preprocess_batch(images):
+        """
+        Preprocess many images, vectorized across images of the same size
+
+        Same-sized images are stacked into one tall array so both colour
+        conversions run as single calls over the stack. Results are
+        identical to preprocess_image.
+
+        Args:
+            images: List of BGR images
+
+        Returns:
+            List of preprocessed BGR images (views into per-shape stacks)
+        """
+        resized = []
+        for image in images:
+            height, width = image.shape[:2]
+            if width > DEFAULT_MAX_DIM or height > DEFAULT_MAX_DIM:
+                scale = min(DEFAULT_MAX_DIM / width, DEFAULT_MAX_DIM / height)
+                image = cv2.resize(image, (int(width * scale), int(height * scale)))
+            resized.append(image)
+
+        processed = [None] * len(images)
+        for (height, width, _), indices in ImageProcessor._bucket_by_shape(resized).items():
+            count = len(indices)
+            stack = np.stack([resized[i] for i in indices]).reshape(count * height, width, 3)
+            hsv = cv2.cvtColor(stack, cv2.COLOR_BGR2HSV, dst=stack)
+
+            # Histograms are per image, so V is equalized image by image
+            # (in place, on row bands of the extracted channel)
+            value = cv2.extractChannel(hsv, 2)
+            for position in range(count):
+                band = value[position * height:(position + 1) * height]
+                cv2.equalizeHist(band, dst=band)
+            cv2.insertChannel(value, hsv, 2)
+
+            bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=hsv).reshape(count, height, width, 3)
+            for position, index in enumerate(indices):
+                processed[index] = bgr[position]
+        return processed
+
+    @staticmethod
+    def detect_solar_panels_batch(images, kernel_size=None):
+        """
+        Detect solar panels in many preprocessed images
+
+        Same-sized images are stacked into one tall array, separated by gap
+        rows at least half a kernel high, so colour conversion, range masking
+        and morphology each run as one call over the whole stack (and can be
+        split across OpenCV's threads). Before every morphology step the gap
+        rows are set to the value OpenCV assumes outside an image border (0
+        for dilation, 255 for erosion), so no image bleeds into its
+        neighbours. Only contour extraction runs per image. Results are
+        identical to detect_solar_panels.
+
+        Args:
+            images: List of preprocessed BGR images
+            kernel_size: Morphology kernel size (defaults to config.MORPH_KERNEL_SIZE)
+
+        Returns:
+            List of (panel contours, binary mask) tuples
+        """
+        kernel_size = kernel_size or config.MORPH_KERNEL_SIZE
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+        gap = kernel_size // 2
+        detections = [None] * len(images)
+
+        for (height, width, _), indices in ImageProcessor._bucket_by_shape(images).items():
+            count = len(indices)
+            slots = np.zeros((count, height + gap, width, 3), dtype=np.uint8)
+            for position, index in enumerate(indices):
+                slots[position, :height] = images[index]
+            stack = slots.reshape(count * (height + gap), width, 3)
+            hsv = cv2.cvtColor(stack, cv2.COLOR_BGR2HSV, dst=stack)
+
+            lower_blue, upper_blue = config.SOLAR_PANEL_HSV_RANGE
+            masks = cv2.inRange(hsv, np.array(lower_blue), np.array(upper_blue))
+            scratch = np.empty_like(masks)
+            for lower_brown, upper_brown in config.ROOF_EXCLUDE_HSV_RANGES:
+                cv2.inRange(hsv, np.array(lower_brown), np.array(upper_brown), dst=scratch)
+                cv2.bitwise_not(scratch, dst=scratch)
+                cv2.bitwise_and(masks, scratch, dst=masks)
+
+            # Closing then opening, one operation at a time
+            gaps = masks.reshape(count, height + gap, width)[:, height:]
+            for operation in (cv2.dilate, cv2.erode, cv2.erode, cv2.dilate):
+                gaps[:] = 0 if operation is cv2.dilate else 255
+                operation(masks, kernel, dst=masks)
+
+            masks = masks.reshape(count, height + gap, width)
+            for position, index in enumerate(indices):
+                mask = masks[position, :height]
+                detections[index] = (ImageProcessor._find_panels(mask), mask)
+
+        return detections
+
+    @staticmethod
+    def calculate_solar_coverage_batch(masks):
+        """Coverage percentage of each mask, counted per shape stack"""
+        coverage = np.zeros(len(masks))
+        for shape, indices in ImageProcessor._bucket_by_shape(masks).items():
+            stack = np.stack([masks[i] for i in indices]).reshape(len(indices), -1)
+            coverage[indices] = np.count_nonzero(stack, axis=1) / stack.shape[1] * 100
+        return coverage
+
+    @staticmethod
+    def scaled_kernel_size(processed_shape, image_shape):
+        """
+        Morphology kernel for an image processed below the default size
+
+        config.MORPH_KERNEL_SIZE is tuned for the default processing size, so
+        the kernel shrinks in proportion to the processing resolution (odd,
+        at least 3). The minimum panel area is a fraction of the image and
+        needs no scaling.
+
+        Args:
+            processed_shape: Shape of the preprocessed image
+            image_shape: Shape of the original image
+        """
+        reference = min(DEFAULT_MAX_DIM, max(image_shape[:2]))
+        ratio = max(processed_shape[:2]) / reference
+        if ratio >= 1:
+            return config.MORPH_KERNEL_SIZE
+        size = int(round(config.MORPH_KERNEL_SIZE * ratio))
+        if size % 2 == 0:
+            size += 1
+        return max(3, size)
+
+    @staticmethod
+    def estimate_processing_size(image, ground_sample_distance=None):
+        """
+        Smallest processing size that still resolves the panels in an image
+
+        With a known ground-sample distance the size follows from the
+        physical panel size. Otherwise a quick detection pass on a small
+        thumbnail measures the smallest panel; if it finds none, the default
+        size is kept so small panels are not missed.
+
+        Args:
+            image: BGR image
+            ground_sample_distance: Metres per pixel of the original image
+
+        Returns:
+            Longest side to process at
+        """
+        longest = max(image.shape[:2])
+        default = min(DEFAULT_MAX_DIM, longest)
+
+        if ground_sample_distance:
+            panel_pixels = config.PANEL_MIN_SIDE_METERS / ground_sample_distance
+        else:
+            probe_dim = config.ADAPTIVE_PROBE_SIZE
+            if longest <= probe_dim:
+                return default
+            scale = probe_dim / longest
+            probe = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            probe = ImageProcessor.preprocess_image(probe)
+            kernel_size = ImageProcessor.scaled_kernel_size(probe.shape, image.shape)
+            panels, _ = ImageProcessor.detect_solar_panels(probe, kernel_size=kernel_size)
+            if not panels:
+                return default
+            smallest = min(min(cv2.minAreaRect(panel)[1]) for panel in panels)
+            if smallest <= 0:
+                return default
+            panel_pixels = smallest / scale
+
+        # Scale so the smallest panel spans ADAPTIVE_MIN_PANEL_PIXELS
+        needed = longest * config.ADAPTIVE_MIN_PANEL_PIXELS / panel_pixels
+        return int(min(default, max(config.ADAPTIVE_MIN_SIZE, needed)))
 
     @staticmethod
     def calculate_solar_coverage(mask):
@@ -145,9 +442,37 @@ class ImageProcessor:
         return max(0, min(1, (similarity_score + 1) / 2))  # Normalize to 0-1
 
     @staticmethod
-    def draw_solar_panels(image, solar_panels):
-        """Draw detected solar panels on image"""
-        output_image = image.copy()
+    def scale_contours(contours, scale_x, scale_y):
+        """Map contours found on a resized image back to original image coordinates"""
+        if scale_x == 1 and scale_y == 1:
+            return contours
+        factors = np.array([scale_x, scale_y])
+        return [np.round(contour * factors).astype(np.int32) for contour in contours]
+
+    @staticmethod
+    def panel_geometry(solar_panels):
+        """
+        Compact geometry of detected panels
+
+        Returns:
+            List of dictionaries with 'bbox' [x, y, w, h], simplified
+            'polygon' [[x, y], ...] and 'area' in pixels
+        """
+        geometry = []
+        for panel in solar_panels:
+            perimeter = cv2.arcLength(panel, True)
+            polygon = cv2.approxPolyDP(panel, 0.02 * perimeter, True).reshape(-1, 2)
+            geometry.append({
+                'bbox': [int(v) for v in cv2.boundingRect(panel)],
+                'polygon': polygon.tolist(),
+                'area': round(float(cv2.contourArea(panel)), 1),
+            })
+        return geometry
+
+    @staticmethod
+    def draw_solar_panels(image, solar_panels, in_place=False):
+        """Draw detected solar panels on image (on a copy unless in_place)"""
+        output_image = image if in_place else image.copy()
         
         for i, panel in enumerate(solar_panels):
             # Draw contour
@@ -158,3 +483,38 @@ class ImageProcessor:
             cv2.rectangle(output_image, (x, y), (x + w, y + h), (0, 0, 255), 2)
         
         return output_image
+
+
+class DetectionBuffers:
+    """Preallocated arrays reused across images by the low-memory pipeline"""
+
+    def __init__(self):
+        """Initialize with no allocated buffers"""
+        self.shape = None
+        self.bgr = None
+        self.hsv = None
+        self.mask = None
+        self.scratch = None
+
+    def ensure(self, shape):
+        """Make sure the buffers match the given (height, width), reallocating if not"""
+        shape = tuple(shape[:2])
+        if self.shape == shape:
+            return
+        height, width = shape
+        self.bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self.hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self.mask = np.empty((height, width), dtype=np.uint8)
+        self.scratch = np.empty((height, width), dtype=np.uint8)
+        self.shape = shape
+
+    def release(self):
+        """Drop all buffers"""
+        self.__init__()
+
+    @property
+    def nbytes(self):
+        """Total size of the allocated buffers in bytes"""
+        if self.shape is None:
+            return 0
+        return sum(a.nbytes for a in (self.bgr, self.hsv, self.mask, self.scratch))
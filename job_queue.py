@@ -0,0 +1,400 @@
+"""
+Durable job queue for spreading verification across machines
+
+Jobs live in one SQLite file that every node can reach on a shared volume;
+no queue service is needed. Workers claim jobs under a time-limited lease
+and extend it with heartbeats while they run. Leases that expire (a worker
+crashed or lost the volume) are put back in the queue by the next claim,
+up to JOB_MAX_ATTEMPTS tries. Results are recorded once per job id, so a
+job finished twice after a lease expiry keeps its first result.
+
+The database uses SQLite's default rollback journal rather than WAL, which
+does not work across machines sharing a network filesystem.
+
+Usage:
+    python job_queue.py enqueue manifest.csv [--db PATH]
+    python job_queue.py worker [--db PATH] [--workers N] [--follow]
+    python job_queue.py status [--db PATH]
+    python job_queue.py results OUTPUT.jsonl [--db PATH]
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+from autotune import apply_saved_profile, default_workers
+from manifest import load_manifest
+from verifier import SolarPanelVerifier
+import config
+
+
+# Seconds an idle worker waits before polling the queue again
+POLL_SECONDS = 2.0
+
+
+class JobQueue:
+    """SQLite-backed queue of verification jobs with leased claiming"""
+
+    def __init__(self, db_path=None, lease_seconds=None, max_attempts=None):
+        """
+        Open (or create) the queue
+
+        Args:
+            db_path: SQLite file (defaults to config.JOB_QUEUE_PATH)
+            lease_seconds: How long a claim lasts without a heartbeat
+                (defaults to config.JOB_LEASE_SECONDS)
+            max_attempts: Claims before a job is marked failed (defaults to
+                config.JOB_MAX_ATTEMPTS)
+        """
+        self.db_path = db_path or config.JOB_QUEUE_PATH
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'seq INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, '
+            'user_image TEXT NOT NULL, satellite_image TEXT, '
+            "state TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+            'lease_owner TEXT, lease_token TEXT, lease_expires REAL, '
+            'enqueued TEXT, finished TEXT, result TEXT, error TEXT)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, seq)')
+
+    def _transaction(self, work):
+        """Run work(connection) in a write transaction and return its result"""
+        with self._lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(self.connection)
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.connection.execute('COMMIT')
+            return result
+
+    def enqueue(self, cases):
+        """
+        Add manifest cases; ids already in the queue are left untouched
+
+        Returns:
+            Number of new jobs
+        """
+        now = datetime.now().isoformat()
+        rows = [(case['id'], case['user_image'], case.get('satellite_image'), now) for case in cases]
+
+        def work(connection):
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO jobs (id, user_image, satellite_image, enqueued) '
+                'VALUES (?, ?, ?, ?)', rows
+            )
+            return connection.total_changes - before
+
+        return self._transaction(work)
+
+    def _requeue_expired(self, connection):
+        """Return jobs with expired leases to the queue (or fail them)"""
+        now = time.time()
+        connection.execute(
+            "UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_token = NULL, "
+            "error = 'lease expired on final attempt', finished = ? "
+            "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (datetime.now().isoformat(), now, self.max_attempts)
+        )
+        cursor = connection.execute(
+            "UPDATE jobs SET state = 'queued', lease_owner = NULL, lease_token = NULL "
+            "WHERE state = 'leased' AND lease_expires < ?", (now,)
+        )
+        return cursor.rowcount
+
+    def requeue_expired(self):
+        """
+        Return jobs whose leases expired to the queue
+
+        Returns:
+            Number of requeued jobs
+        """
+        return self._transaction(self._requeue_expired)
+
+    def claim(self, owner, count=1):
+        """
+        Lease up to count queued jobs
+
+        Args:
+            owner: Worker identifier recorded with the lease
+
+        Returns:
+            List of job dictionaries with id, user_image, satellite_image,
+            attempts and the lease token needed to report back
+        """
+        def work(connection):
+            self._requeue_expired(connection)
+            rows = connection.execute(
+                "SELECT seq, id, user_image, satellite_image, attempts FROM jobs "
+                "WHERE state = 'queued' ORDER BY seq LIMIT ?", (count,)
+            ).fetchall()
+
+            jobs = []
+            expires = time.time() + self.lease_seconds
+            for seq, job_id, user_image, satellite_image, attempts in rows:
+                token = uuid.uuid4().hex
+                connection.execute(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_token = ?, lease_expires = ? WHERE seq = ?",
+                    (owner, token, expires, seq)
+                )
+                jobs.append({'id': job_id, 'user_image': user_image,
+                             'satellite_image': satellite_image,
+                             'attempts': attempts + 1, 'token': token})
+            return jobs
+
+        return self._transaction(work)
+
+    def heartbeat(self, job_id, token):
+        """
+        Extend a lease
+
+        Returns:
+            False if the lease was lost (expired and claimed elsewhere, or
+            the job already finished)
+        """
+        def work(connection):
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, job_id, token)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(work)
+
+    def complete(self, job_id, token, results):
+        """
+        Record a job's results
+
+        The first result recorded for a job wins, so a job that ran twice
+        after a lease expiry is not recorded twice. The token is not
+        required to match: a worker whose lease expired still finished the
+        job and its result is as good as any other.
+
+        Returns:
+            Whether this call recorded the result
+        """
+        payload = json.dumps(results, default=str)
+
+        def work(connection):
+            cursor = connection.execute(
+                "UPDATE jobs SET state = 'done', result = ?, error = NULL, finished = ?, "
+                "lease_owner = NULL, lease_token = NULL "
+                "WHERE id = ? AND state NOT IN ('done', 'failed')",
+                (payload, datetime.now().isoformat(), job_id)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(work)
+
+    def fail(self, job_id, token, error):
+        """
+        Report a failed attempt; the job is retried until JOB_MAX_ATTEMPTS
+
+        Returns:
+            Whether the report was accepted (the lease was still held)
+        """
+        def work(connection):
+            cursor = connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, finished = CASE WHEN attempts >= ? THEN ? ELSE NULL END, "
+                "lease_owner = NULL, lease_token = NULL "
+                "WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (self.max_attempts, str(error), self.max_attempts,
+                 datetime.now().isoformat(), job_id, token)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(work)
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def results(self):
+        """
+        Recorded results in enqueue order
+
+        Yields:
+            Tuples of (job id, results dictionary or None, error or None)
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, result, error FROM jobs WHERE state IN ('done', 'failed') ORDER BY seq"
+            ).fetchall()
+        for job_id, result, error in rows:
+            yield job_id, json.loads(result) if result else None, error
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+
+
+class _Heartbeat:
+    """Background thread extending the leases a worker holds"""
+
+    def __init__(self, job_queue):
+        self.job_queue = job_queue
+        self.leases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def hold(self, job_id, token):
+        with self._lock:
+            self.leases[job_id] = token
+
+    def release(self, job_id):
+        with self._lock:
+            self.leases.pop(job_id, None)
+
+    def _run(self):
+        while not self._stop.wait(self.job_queue.lease_seconds / 3):
+            with self._lock:
+                leases = list(self.leases.items())
+            for job_id, token in leases:
+                try:
+                    if not self.job_queue.heartbeat(job_id, token):
+                        print(f"Lost lease on job {job_id}")
+                        self.release(job_id)
+                except sqlite3.Error as e:
+                    print(f"Heartbeat failed for job {job_id}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(db_path=None, owner=None, follow=False):
+    """
+    Claim and verify jobs until the queue is drained
+
+    Args:
+        db_path: Queue database (defaults to config.JOB_QUEUE_PATH)
+        owner: Worker identifier (defaults to host name and process id)
+        follow: Keep polling for new jobs instead of exiting when none are
+            queued or leased
+
+    Returns:
+        Number of jobs this worker completed
+    """
+    apply_saved_profile()
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    job_queue = JobQueue(db_path)
+    verifier = SolarPanelVerifier()
+    heartbeat = _Heartbeat(job_queue)
+    completed = 0
+
+    try:
+        while True:
+            jobs = job_queue.claim(owner)
+            if not jobs:
+                counts = job_queue.counts()
+                if not follow and counts['queued'] == 0 and counts['leased'] == 0:
+                    return completed
+                # Leased jobs may still expire and come back
+                time.sleep(POLL_SECONDS)
+                continue
+
+            job = jobs[0]
+            heartbeat.hold(job['id'], job['token'])
+            try:
+                results = verifier.verify_installation(job['user_image'], job['satellite_image'])
+            except Exception as e:
+                heartbeat.release(job['id'])
+                job_queue.fail(job['id'], job['token'], e)
+                print(f"Job {job['id']} failed (attempt {job['attempts']}): {e}")
+                continue
+
+            heartbeat.release(job['id'])
+            if results['status'] == 'ERROR':
+                job_queue.fail(job['id'], job['token'], results['message'])
+            elif job_queue.complete(job['id'], job['token'], results):
+                completed += 1
+    finally:
+        heartbeat.stop()
+        job_queue.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Durable verification job queue')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Add manifest cases to the queue')
+    enqueue_parser.add_argument('manifest', help='Path to a manifest (.csv or .jsonl)')
+
+    worker_parser = subparsers.add_parser('worker', help='Process jobs on this machine')
+    worker_parser.add_argument('--workers', type=int, default=None,
+                               help='Worker processes (defaults to the autotuned count)')
+    worker_parser.add_argument('--follow', action='store_true',
+                               help='Keep waiting for new jobs when the queue is empty')
+
+    subparsers.add_parser('status', help='Show job counts')
+    subparsers.add_parser('requeue', help='Requeue jobs with expired leases')
+
+    results_parser = subparsers.add_parser('results', help='Export recorded results')
+    results_parser.add_argument('output', help='Results file (JSON lines)')
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('--db', default=config.JOB_QUEUE_PATH, help='Queue database')
+
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        added = JobQueue(args.db).enqueue(load_manifest(args.manifest))
+        print(f"Enqueued {added} new job(s)")
+
+    elif args.command == 'worker':
+        workers = args.workers or default_workers()
+        if workers == 1:
+            completed = run_worker(args.db, follow=args.follow)
+            print(f"Completed {completed} job(s)")
+        else:
+            processes = [multiprocessing.Process(target=run_worker, args=(args.db, None, args.follow))
+                         for _ in range(workers)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+
+    elif args.command == 'requeue':
+        print(f"Requeued {JobQueue(args.db).requeue_expired()} job(s)")
+
+    elif args.command == 'results':
+        with open(args.output, 'w') as out:
+            for job_id, results, error in JobQueue(args.db).results():
+                out.write(json.dumps({'id': job_id, **(results or {}), 'error': error}) + '\n')
+        print(f"Results saved to: {args.output}")
+
+    if args.command != 'results':
+        for state, count in JobQueue(args.db).counts().items():
+            print(f"  {state}: {count}")
+
+
+if __name__ == '__main__':
+    main()
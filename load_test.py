@@ -0,0 +1,445 @@
+"""
+Concurrent load testing of the verifier with tail-latency reporting
+
+Drives verify_installation in-process (one verifier per thread), through a
+pool of worker processes, or through an HTTP endpoint, in one of two modes:
+
+    closed  N virtual users each send a request as soon as their previous
+            one finishes (finds the throughput ceiling)
+    open    requests arrive at a fixed mean rate (Poisson arrivals) whether
+            or not earlier ones have finished (shows queueing under load)
+
+Open-loop latency is measured from each request's scheduled arrival, so a
+saturated system shows its queueing delay instead of hiding it. Throughput,
+latency percentiles, error rate and resident memory over time are written
+as JSON plus an HTML page with inline SVG charts.
+
+The HTTP target POSTs {"user_image": ..., "satellite_image": ...} as JSON
+and expects the verification results back as JSON.
+
+Usage:
+    python load_test.py manifest.csv --mode closed --concurrency 8 --duration 60
+    python load_test.py manifest.csv --mode open --rate 5 --target pool
+    python load_test.py manifest.csv --target http://localhost:8000/verify
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from manifest import load_manifest
+from profiling import get_rss_bytes
+from verifier import SolarPanelVerifier
+import config
+
+
+# Individual latencies kept in the report (evenly thinned beyond this)
+MAX_LATENCY_POINTS = 5000
+
+
+def _process_rss(pid):
+    """Resident set size of another process in bytes, or 0 if unknown"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class InProcessTarget:
+    """Calls verify_installation on a verifier owned by the calling thread"""
+
+    name = 'inprocess'
+
+    def __init__(self, render=True):
+        self.render = render
+        self._local = threading.local()
+
+    def call(self, case):
+        verifier = getattr(self._local, 'verifier', None)
+        if verifier is None:
+            verifier = self._local.verifier = SolarPanelVerifier()
+        return verifier.verify_installation(case['user_image'], case.get('satellite_image'),
+                                            render=self.render)
+
+    def worker_pids(self):
+        return []
+
+    def close(self):
+        pass
+
+
+# Per-process verifier of the pool target, set up by _init_pool_worker
+_verifier = None
+
+
+def _init_pool_worker():
+    """Create the verifier used by a pool worker"""
+    global _verifier
+    _verifier = SolarPanelVerifier()
+
+
+def _pool_verify(case, render):
+    """Verify one case in a pool worker; returns the worker's pid and the results"""
+    return os.getpid(), _verifier.verify_installation(case['user_image'], case.get('satellite_image'),
+                                                      render=render)
+
+
+class PoolTarget:
+    """Sends each request to a pool of worker processes"""
+
+    name = 'pool'
+
+    def __init__(self, workers, render=True):
+        self.workers = workers
+        self.render = render
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_pool_worker)
+        # Worker pids, learned from the requests they answer
+        self._pids = set()
+
+    def call(self, case):
+        pid, results = self.pool.submit(_pool_verify, case, self.render).result()
+        if len(self._pids) < self.workers:
+            self._pids.add(pid)
+        return results
+
+    def worker_pids(self):
+        return list(self._pids)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class HttpTarget:
+    """POSTs each request to a verification endpoint"""
+
+    def __init__(self, url, timeout=300):
+        self.name = url
+        self.url = url
+        self.timeout = timeout
+
+    def call(self, case):
+        body = json.dumps({'user_image': case['user_image'],
+                           'satellite_image': case.get('satellite_image')}).encode()
+        request = urllib.request.Request(self.url, data=body,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def worker_pids(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class _Recorder:
+    """Thread-safe log of request outcomes and memory samples"""
+
+    def __init__(self, target):
+        self.target = target
+        self.started = time.perf_counter()
+        self.requests = []  # (start offset, latency, ok)
+        self.samples = []  # (offset, completed, rss bytes, in flight)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def run(self, case, scheduled=None):
+        """Issue one request; latency counts from its scheduled time if given"""
+        start = scheduled if scheduled is not None else time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            results = self.target.call(case)
+            ok = results.get('status') != 'ERROR'
+        except Exception:
+            ok = False
+        finished = time.perf_counter()
+        with self._lock:
+            self.in_flight -= 1
+            self.requests.append((start - self.started, finished - start, ok))
+
+    def sample(self):
+        """Record memory and progress"""
+        rss = (get_rss_bytes() or 0) + sum(_process_rss(pid) for pid in self.target.worker_pids())
+        with self._lock:
+            self.samples.append((time.perf_counter() - self.started, len(self.requests),
+                                 rss, self.in_flight))
+
+
+def _sampler(recorder, stop, interval):
+    """Sample memory until stopped"""
+    recorder.sample()
+    while not stop.wait(interval):
+        recorder.sample()
+    recorder.sample()
+
+
+def run_closed_loop(recorder, cases, concurrency, duration, max_requests=None):
+    """N users each issue their next request as soon as the previous one returns"""
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    issued = [0]
+
+    def user(offset):
+        index = offset
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            recorder.run(cases[index % len(cases)])
+            index += concurrency
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(recorder, cases, rate, duration, max_in_flight, seed=0):
+    """Requests arrive as a Poisson process at the given mean rate"""
+    rng = random.Random(seed)
+    with ThreadPoolExecutor(max_in_flight) as executor:
+        start = time.perf_counter()
+        arrival = start
+        index = 0
+        while True:
+            arrival += rng.expovariate(rate)
+            if arrival - start >= duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(recorder.run, cases[index % len(cases)], arrival)
+            index += 1
+
+
+def build_report(recorder, settings, interval):
+    """
+    Summarize a run
+
+    Returns:
+        Report dictionary with overall figures and a per-interval timeline
+    """
+    requests = np.array(recorder.requests, dtype=np.float64).reshape(-1, 3)
+    latencies = requests[:, 1]
+    ok = requests[:, 2].astype(bool)
+    elapsed = max((s[0] for s in recorder.samples), default=0) or 1e-9
+
+    def percentiles(values):
+        if len(values) == 0:
+            return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'p50': round(float(p50), 4), 'p95': round(float(p95), 4),
+                'p99': round(float(p99), 4), 'max': round(float(values.max()), 4),
+                'mean': round(float(values.mean()), 4)}
+
+    timeline = []
+    finish_times = requests[:, 0] + requests[:, 1]
+    previous_time, previous_done = 0.0, 0
+    for offset, done, rss, in_flight in recorder.samples:
+        window = (finish_times > previous_time) & (finish_times <= offset)
+        span = offset - previous_time
+        timeline.append({
+            't': round(offset, 2),
+            'completed': done,
+            'throughput': round((done - previous_done) / span, 2) if span > 0 else 0,
+            'p95': percentiles(latencies[window])['p95'],
+            'rss_mb': round(rss / 1e6, 1),
+            'in_flight': in_flight,
+        })
+        previous_time, previous_done = offset, done
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'settings': settings,
+        'requests': int(len(requests)),
+        'errors': int((~ok).sum()),
+        'error_rate': round(float((~ok).mean()), 4) if len(requests) else 0,
+        'seconds': round(elapsed, 2),
+        'throughput': round(len(requests) / elapsed, 2),
+        'latency': percentiles(latencies),
+        'latency_ok': percentiles(latencies[ok]),
+        'peak_rss_mb': max((t['rss_mb'] for t in timeline), default=0),
+        'sample_interval': interval,
+        'timeline': timeline,
+        'latency_points': [[round(float(s), 3), round(float(l), 4), bool(o)]
+                           for s, l, o in requests[::max(1, -(-len(requests) // MAX_LATENCY_POINTS))]],
+    }
+
+
+def _svg_chart(title, series, width=720, height=220, unit=''):
+    """
+    Line/scatter chart as inline SVG
+
+    Args:
+        series: List of (label, colour, [(x, y), ...], 'line' or 'dots')
+    """
+    points = [p for _, _, data, _ in series for p in data if p[1] is not None]
+    if not points:
+        return f'<h3>{title}</h3><p>No data</p>'
+    max_x = max(p[0] for p in points) or 1
+    max_y = max(p[1] for p in points) or 1
+    left, bottom = 50, 25
+
+    def sx(x):
+        return left + x / max_x * (width - left - 10)
+
+    def sy(y):
+        return height - bottom - y / max_y * (height - bottom - 10)
+
+    parts = [f'<h3>{title}</h3>',
+             f'<svg width="{width}" height="{height}" style="background:#fafafa;border:1px solid #ddd">',
+             f'<line x1="{left}" y1="{sy(0)}" x2="{width - 10}" y2="{sy(0)}" stroke="#999"/>',
+             f'<line x1="{left}" y1="10" x2="{left}" y2="{sy(0)}" stroke="#999"/>',
+             f'<text x="{left - 5}" y="15" font-size="11" text-anchor="end">{max_y:.3g}{unit}</text>',
+             f'<text x="{left - 5}" y="{sy(0)}" font-size="11" text-anchor="end">0</text>',
+             f'<text x="{width - 10}" y="{height - 5}" font-size="11" text-anchor="end">{max_x:.0f}s</text>']
+    for index, (label, colour, data, style) in enumerate(series):
+        data = [p for p in data if p[1] is not None]
+        if style == 'dots':
+            parts += [f'<circle cx="{sx(x):.1f}" cy="{sy(y):.1f}" r="1.5" fill="{colour}"/>'
+                      for x, y in data]
+        else:
+            path = ' '.join(f'{sx(x):.1f},{sy(y):.1f}' for x, y in data)
+            parts.append(f'<polyline points="{path}" fill="none" stroke="{colour}" stroke-width="2"/>')
+        parts.append(f'<text x="{left + 10 + 140 * index}" y="{height - 5}" font-size="11" '
+                     f'fill="{colour}">{label}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def render_html(report):
+    """HTML page with summary table and latency, throughput and memory charts"""
+    latency = report['latency']
+    rows = ''.join(f'<tr><td>{k}</td><td>{v}</td></tr>' for k, v in [
+        *report['settings'].items(),
+        ('requests', report['requests']), ('errors', report['errors']),
+        ('error rate', f"{report['error_rate']:.2%}"), ('throughput', f"{report['throughput']} req/s"),
+        *((f'latency {k}', f'{v}s') for k, v in latency.items()),
+        ('peak RSS', f"{report['peak_rss_mb']} MB"),
+    ])
+    timeline = report['timeline']
+    ok_points = [(s, l) for s, l, ok in report['latency_points'] if ok]
+    error_points = [(s, l) for s, l, ok in report['latency_points'] if not ok]
+
+    charts = [
+        _svg_chart('Latency by start time', [('ok', '#1f77b4', ok_points, 'dots'),
+                                             ('error', '#d62728', error_points, 'dots'),
+                                             ('p95', '#ff7f0e', [(t['t'], t['p95']) for t in timeline], 'line')],
+                   unit='s'),
+        _svg_chart('Throughput', [('requests/s', '#2ca02c', [(t['t'], t['throughput']) for t in timeline], 'line')]),
+        _svg_chart('Resident memory', [('RSS MB', '#9467bd', [(t['t'], t['rss_mb']) for t in timeline], 'line')],
+                   unit=' MB'),
+    ]
+    return ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Load test report</title>'
+            '<style>body{font-family:sans-serif;margin:20px}td{padding:2px 12px}</style></head><body>\n'
+            f"<h2>Load test {report['timestamp']}</h2>\n<table>{rows}</table>\n"
+            + '\n'.join(charts) + '\n</body></html>\n')
+
+
+def run_load_test(cases, target, mode='closed', concurrency=4, rate=1.0, duration=60,
+                  max_requests=None, interval=1.0):
+    """
+    Run a load test
+
+    Args:
+        cases: Manifest cases, cycled through in order
+        target: InProcessTarget, PoolTarget or HttpTarget
+        mode: 'closed' or 'open'
+        concurrency: Virtual users (closed) or maximum requests in flight (open)
+        rate: Mean arrivals per second (open)
+        duration: Seconds to generate load for
+        max_requests: Optional cap on requests (closed)
+        interval: Seconds between memory/throughput samples
+
+    Returns:
+        Report dictionary
+    """
+    recorder = _Recorder(target)
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sampler, args=(recorder, stop, interval), daemon=True)
+    sampler.start()
+    try:
+        if mode == 'closed':
+            run_closed_loop(recorder, cases, concurrency, duration, max_requests)
+        else:
+            run_open_loop(recorder, cases, rate, duration, concurrency)
+    finally:
+        stop.set()
+        sampler.join()
+
+    settings = {'mode': mode, 'target': target.name, 'duration': duration, 'cases': len(cases)}
+    if mode == 'closed':
+        settings['concurrency'] = concurrency
+    else:
+        settings.update({'rate': rate, 'max_in_flight': concurrency})
+    return build_report(recorder, settings, interval)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Load test the verifier')
+    parser.add_argument('manifest', help='Manifest of cases to replay (.csv or .jsonl)')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--target', default='inprocess',
+                        help="'inprocess', 'pool' or an http:// URL")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Virtual users (closed) or max in flight (open)')
+    parser.add_argument('--rate', type=float, default=1.0, help='Arrivals per second (open)')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load')
+    parser.add_argument('--max-requests', type=int, default=None, help='Request cap (closed)')
+    parser.add_argument('--workers', type=int, default=None, help='Pool workers (pool target)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Sampling interval in seconds')
+    parser.add_argument('--no-render', action='store_true', help='Skip report PNGs')
+    parser.add_argument('--output', default=os.path.join(config.OUTPUT_DIR, 'load_test.json'),
+                        help='Report file (.json; an .html chart is written next to it)')
+
+    args = parser.parse_args()
+    cases = load_manifest(args.manifest)
+
+    if args.target.startswith(('http://', 'https://')):
+        target = HttpTarget(args.target)
+    elif args.target == 'pool':
+        target = PoolTarget(args.workers or os.cpu_count() or 1, render=not args.no_render)
+    else:
+        target = InProcessTarget(render=not args.no_render)
+
+    try:
+        report = run_load_test(cases, target, args.mode, args.concurrency, args.rate,
+                               args.duration, args.max_requests, args.interval)
+    finally:
+        target.close()
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    html_path = os.path.splitext(args.output)[0] + '.html'
+    with open(html_path, 'w') as f:
+        f.write(render_html(report))
+
+    latency = report['latency']
+    print(f"{report['requests']} request(s) in {report['seconds']}s: {report['throughput']} req/s, "
+          f"error rate {report['error_rate']:.2%}")
+    print(f"Latency p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s")
+    print(f"Peak RSS {report['peak_rss_mb']} MB")
+    print(f"Report saved to: {args.output} and {html_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,16 +6,23 @@ import os
 import json
 import argparse
 from verifier import SolarPanelVerifier
+from overlay import save_overlay
+from video_ingest import is_video_file, verify_video
 from pathlib import Path
 
 
-def verify_solar_installation(user_image_path, satellite_image_path=None):
+def verify_solar_installation(user_image_path, satellite_image_path=None,
+                              render=None, overlay_path=None, deadline=None):
     """
     Main function to verify solar panel installation
     
     Args:
         user_image_path: Path to user's home image
         satellite_image_path: Optional path to satellite image
+        render: Whether to rasterize the annotated report PNG (defaults to
+            config.RENDER_OUTPUT_IMAGE)
+        overlay_path: Optional .svg or .json file for the vector overlay
+        deadline: Optional time budget in seconds (images only)
     
     Returns:
         Verification results as dictionary
@@ -41,7 +48,11 @@ def verify_solar_installation(user_image_path, satellite_image_path=None):
     verifier = SolarPanelVerifier()
 
     # Perform verification
-    results = verifier.verify_installation(user_image_path, satellite_image_path)
+    if is_video_file(user_image_path):
+        results = verify_video(user_image_path, satellite_image_path, verifier, render=render)
+    else:
+        results = verifier.verify_installation(user_image_path, satellite_image_path, render,
+                                               deadline=deadline)
 
     # Display results
     print("=" * 60)
@@ -52,16 +63,39 @@ def verify_solar_installation(user_image_path, satellite_image_path=None):
     print(f"Verification Result: {results['verification_status']}")
     print(f"Solar Panels Detected: {results['solar_detected']}")
     print(f"Solar Coverage: {results['solar_coverage']:.2f}%")
-    print(f"Similarity Score: {results['similarity_score']:.3f}")
+    if results['similarity_score'] is None:
+        print("Similarity Score: not measured (comparison skipped)")
+    else:
+        print(f"Similarity Score: {results['similarity_score']:.3f}")
     print(f"Confidence Level: {results['confidence']:.1%}")
     print()
     print(f"Message: {results['message']}")
     print()
 
+    if results.get('duplicate_check') == 'unavailable':
+        print("WARNING: Duplicate photo check unavailable (hash index could not be read)")
+        print()
+
+    if results.get('duplicate_matches'):
+        print(f"WARNING: Photo resembles {len(results['duplicate_matches'])} earlier submission(s):")
+        for match in results['duplicate_matches'][:5]:
+            print(f"  {match['record']} (distance {match['distance']}, {match['submitted']})")
+        print()
+
+    if results.get('degradations'):
+        print("Degraded to meet the deadline:")
+        for degradation in results['degradations']:
+            print(f"  {degradation['stage']}: {degradation['action']} ({degradation['reason']})")
+        print()
+
     if results['output_image_path']:
         print(f"Output Image: {results['output_image_path']}")
         print()
 
+    if overlay_path and results['status'] == 'COMPLETED':
+        print(f"Overlay: {save_overlay(results, overlay_path)}")
+        print()
+
     # Save results to JSON
     results_path = os.path.join('verification_results', 'latest_results.json')
     with open(results_path, 'w') as f:
@@ -83,18 +117,37 @@ def main():
     )
     parser.add_argument(
         'user_image',
-        help='Path to user-uploaded home image'
+        help='Path to user-uploaded home image (or rooftop video)'
     )
     parser.add_argument(
         '--satellite-image',
         help='Path to satellite image (optional)',
         default=None
     )
+    parser.add_argument(
+        '--no-render',
+        help='Skip the annotated report PNG',
+        action='store_true'
+    )
+    parser.add_argument(
+        '--overlay',
+        help='Write a vector overlay of detected panels (.svg or .json)',
+        default=None
+    )
+    parser.add_argument(
+        '--deadline',
+        help='Time budget in seconds; stages are degraded to meet it',
+        type=float,
+        default=None
+    )
 
     args = parser.parse_args()
 
     # Verify installation
-    results = verify_solar_installation(args.user_image, args.satellite_image)
+    results = verify_solar_installation(
+        args.user_image, args.satellite_image,
+        render=False if args.no_render else None, overlay_path=args.overlay, deadline=args.deadline
+    )
 
     # Exit with appropriate code
     if results and results['verification_status'] == 'APPROVED':
@@ -0,0 +1,89 @@
+"""
+Reading labeled manifests of verification cases
+
+A manifest is a CSV file (or JSON-lines file with the same keys) with one
+case per row:
+
+    id,user_image,satellite_image,label,lat,lon
+
+Only ``user_image`` is required. ``label`` accepts APPROVED/REJECTED,
+1/0, true/false or yes/no. Relative image paths are resolved against the
+manifest's directory.
+"""
+
+import os
+import csv
+import json
+
+
+POSITIVE_LABELS = {'approved', '1', 'true', 'yes', 'y', 'solar'}
+NEGATIVE_LABELS = {'rejected', '0', 'false', 'no', 'n', 'none'}
+
+
+def parse_label(value):
+    """
+    Parse a manifest label
+
+    Returns:
+        True for an installation, False for none, None if unlabeled
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in POSITIVE_LABELS:
+        return True
+    if text in NEGATIVE_LABELS:
+        return False
+    if text == '':
+        return None
+    raise ValueError(f"Unrecognised label: {value!r}")
+
+
+def _parse_float(value):
+    """Parse an optional float column"""
+    if value is None or str(value).strip() == '':
+        return None
+    return float(value)
+
+
+def load_manifest(manifest_path):
+    """
+    Load a manifest file
+
+    Args:
+        manifest_path: Path to a .csv or .jsonl manifest
+
+    Returns:
+        List of case dictionaries with keys id, user_image, satellite_image,
+        label, lat and lon
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    if manifest_path.endswith(('.jsonl', '.ndjson')):
+        with open(manifest_path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(manifest_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+    def resolve(path):
+        if not path:
+            return None
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    cases = []
+    for index, row in enumerate(rows):
+        if not row.get('user_image'):
+            raise ValueError(f"Manifest row {index + 1} has no user_image")
+        cases.append({
+            'id': str(row.get('id') or index),
+            'user_image': resolve(row['user_image']),
+            'satellite_image': resolve(row.get('satellite_image')),
+            'label': parse_label(row.get('label')),
+            'lat': _parse_float(row.get('lat')),
+            'lon': _parse_float(row.get('lon')),
+        })
+
+    return cases
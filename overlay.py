@@ -0,0 +1,78 @@
+"""
+Lightweight vector overlays of verification results
+
+Clients that only need panel outlines can draw these over the original
+image themselves instead of downloading a rasterized report PNG.
+"""
+
+import json
+from xml.sax.saxutils import escape
+
+
+def overlay_dict(results):
+    """
+    Compact JSON-serializable overlay of verification results
+
+    Args:
+        results: Dictionary returned by SolarPanelVerifier.verify_installation
+
+    Returns:
+        Dictionary with image size, decision summary and panel geometry
+    """
+    return {
+        'image_size': results.get('image_size'),
+        'verification_status': results['verification_status'],
+        'confidence': float(results['confidence']),
+        'solar_coverage': float(results['solar_coverage']),
+        'panels': results.get('panels', []),
+    }
+
+
+def overlay_svg(results):
+    """
+    SVG overlay with panel outlines (green) and bounding boxes (red)
+
+    The SVG uses the image's pixel coordinates, so it can be layered directly
+    over the original image.
+
+    Args:
+        results: Dictionary returned by SolarPanelVerifier.verify_installation
+
+    Returns:
+        SVG document as a string
+    """
+    width, height = results.get('image_size') or (0, 0)
+    title = escape(f"{results['verification_status']} ({float(results['confidence']):.1%})")
+
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">',
+        f'<title>{title}</title>',
+        '<g fill="none" stroke-width="2">',
+    ]
+    for panel in results.get('panels', []):
+        points = ' '.join(f'{x},{y}' for x, y in panel['polygon'])
+        x, y, w, h = panel['bbox']
+        lines.append(f'<polygon points="{points}" stroke="#00ff00"/>')
+        lines.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" stroke="#ff0000"/>')
+    lines.append('</g>')
+    lines.append('</svg>')
+
+    return '\n'.join(lines) + '\n'
+
+
+def save_overlay(results, output_path):
+    """
+    Write an overlay file; the format follows the extension (.svg or .json)
+
+    Returns:
+        The output path
+    """
+    if output_path.lower().endswith('.svg'):
+        content = overlay_svg(results)
+    else:
+        content = json.dumps(overlay_dict(results))
+
+    with open(output_path, 'w') as f:
+        f.write(content)
+    return output_path
@@ -0,0 +1,210 @@
+"""
+Three-stage pipelined verification within one process
+
+Reading and decoding, detection and scoring, and report encoding run in
+separate thread pools connected by bounded queues. OpenCV releases the GIL
+during decoding, image processing and PNG encoding, so disk or network I/O
+for one image overlaps with computation on others, and the bounded queues
+keep at most a few decoded images in flight.
+
+Usage:
+    python pipeline.py manifest.csv [--readers 2] [--computers N] [--encoders 1]
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from autotune import apply_saved_profile
+from manifest import load_manifest
+from satellite_cache import SatelliteCache
+from verifier import SolarPanelVerifier
+import config
+
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+class PipelinedExecutor:
+    """Runs verification cases through overlapped decode/compute/encode stages"""
+
+    def __init__(self, readers=None, computers=None, encoders=None, queue_size=None, render=True):
+        """
+        Initialize the executor
+
+        Args:
+            readers: Threads reading and decoding images (default config.PIPELINE_READERS)
+            computers: Threads running detection and scoring (default: CPU count)
+            encoders: Threads rendering and writing report PNGs (default config.PIPELINE_ENCODERS)
+            queue_size: Capacity of each queue between stages (default config.PIPELINE_QUEUE_SIZE)
+            render: Whether to produce report PNGs at all
+        """
+        self.readers = readers or config.PIPELINE_READERS
+        self.computers = computers or os.cpu_count() or 1
+        self.encoders = encoders or config.PIPELINE_ENCODERS
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+        self.render = render
+        # One satellite cache shared by all stages so satellites decoded by
+        # the readers are hits for the compute threads
+        self.satellite_cache = SatelliteCache()
+
+    def _new_verifier(self):
+        """Verifier for one worker thread, sharing the satellite cache"""
+        verifier = SolarPanelVerifier()
+        verifier.satellite_cache = self.satellite_cache
+        return verifier
+
+    @staticmethod
+    def _error_results(case, error):
+        """Results of a case whose stage raised, passed on in place of the real ones"""
+        results = SolarPanelVerifier._new_results(case.get('user_image'), case.get('satellite_image'))
+        results['status'] = 'ERROR'
+        results['message'] = str(error)
+        return results
+
+    # Each stage catches errors per item, so one bad case cannot stop a stage
+    # thread and leave the bounded queues (and run()) blocked for good
+
+    def _read_stage(self, cases_queue, decoded_queue):
+        """Read and decode user and satellite images"""
+        verifier = self._new_verifier()
+        while True:
+            case = cases_queue.get()
+            if case is _DONE:
+                return
+            try:
+                image = verifier._load(case['user_image'])
+                satellite = case.get('satellite_image')
+                if image is not None and satellite and os.path.exists(satellite):
+                    self.satellite_cache.get(satellite)
+                decoded_queue.put((case, image, None))
+            except Exception as e:
+                decoded_queue.put((case, None, self._error_results(case, e)))
+
+    def _compute_stage(self, decoded_queue, encode_queue):
+        """Detect panels and score each decoded case"""
+        verifier = self._new_verifier()
+        while True:
+            item = decoded_queue.get()
+            if item is _DONE:
+                return
+            case, image, results = item
+            if results is None:
+                try:
+                    results = verifier.verify_installation(case['user_image'], case.get('satellite_image'),
+                                                           render=False, user_image=image)
+                except Exception as e:
+                    results = self._error_results(case, e)
+            encode_queue.put((case, image, results))
+
+    def _encode_stage(self, encode_queue, on_result):
+        """Render report PNGs and hand results to the callback"""
+        verifier = self._new_verifier()
+        while True:
+            item = encode_queue.get()
+            if item is _DONE:
+                return
+            case, image, results = item
+            if self.render and image is not None and results['status'] == 'COMPLETED' \
+                    and results['solar_detected']:
+                try:
+                    verifier.render_report(results, image)
+                except Exception as e:
+                    results['message'] += f" (report rendering failed: {e})"
+            try:
+                on_result(case['id'], results)
+            except Exception as e:
+                print(f"Error handling result of {case['id']}: {e}")
+
+    def run(self, cases, on_result):
+        """
+        Verify cases, calling on_result(case_id, results) as each one finishes
+
+        Results arrive in completion order. The callback runs on encoder
+        threads and is serialized by the executor.
+
+        Returns:
+            Summary dictionary with counts and throughput
+        """
+        cases_queue = queue.Queue(maxsize=self.queue_size)
+        decoded_queue = queue.Queue(maxsize=self.queue_size)
+        encode_queue = queue.Queue(maxsize=self.queue_size)
+        lock = threading.Lock()
+        statuses = {}
+
+        def deliver(case_id, results):
+            status = results['verification_status'] if results['status'] == 'COMPLETED' else 'ERROR'
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                on_result(case_id, results)
+
+        def start(count, target, *args):
+            threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(count)]
+            for thread in threads:
+                thread.start()
+            return threads
+
+        started = time.perf_counter()
+        readers = start(self.readers, self._read_stage, cases_queue, decoded_queue)
+        computers = start(self.computers, self._compute_stage, decoded_queue, encode_queue)
+        encoders = start(self.encoders, self._encode_stage, encode_queue, deliver)
+
+        for case in cases:
+            cases_queue.put(case)
+
+        # Shut the stages down in order once each upstream stage has drained
+        for stage_threads, next_queue, next_count in (
+            (readers, cases_queue, self.readers),
+            (computers, decoded_queue, self.computers),
+            (encoders, encode_queue, self.encoders),
+        ):
+            for _ in range(next_count):
+                next_queue.put(_DONE)
+            for thread in stage_threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - started
+        return {
+            'cases': len(cases),
+            'seconds': round(elapsed, 2),
+            'images_per_second': round(len(cases) / elapsed, 2) if elapsed else 0,
+            'statuses': statuses,
+        }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Pipelined verification of a manifest in one process')
+    parser.add_argument('manifest', help='Path to a manifest (.csv or .jsonl)')
+    parser.add_argument('--readers', type=int, default=None, help='Read/decode threads')
+    parser.add_argument('--computers', type=int, default=None, help='Detection/scoring threads')
+    parser.add_argument('--encoders', type=int, default=None, help='Report encoding threads')
+    parser.add_argument('--no-render', action='store_true', help='Skip report PNGs')
+    parser.add_argument('--output', default=os.path.join(config.OUTPUT_DIR, 'pipeline_results.jsonl'),
+                        help='Results file (JSON lines)')
+
+    args = parser.parse_args()
+    apply_saved_profile()
+    cases = load_manifest(args.manifest)
+    executor = PipelinedExecutor(args.readers, args.computers, args.encoders,
+                                 render=not args.no_render)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    with open(args.output, 'w') as out:
+        def write_result(case_id, results):
+            out.write(json.dumps({'id': case_id, **results}) + '\n')
+
+        summary = executor.run(cases, write_result)
+
+    print(f"Verified {summary['cases']} case(s) in {summary['seconds']}s "
+          f"({summary['images_per_second']} images/s)")
+    for status, count in sorted(summary['statuses'].items()):
+        print(f"  {status}: {count}")
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Fast pre-screen that rejects hopeless images before the full pipeline
+
+A small thumbnail is decoded (JPEG files are decoded at 1/8 scale by
+libjpeg itself) and checked for size, exposure, blur and the presence of
+any panel-coloured pixels. Images failing a check are rejected with a
+reason code without full-resolution preprocessing, morphology, contour
+analysis or satellite comparison.
+"""
+
+import cv2
+import numpy as np
+from image_processor import ImageProcessor
+import config
+
+
+# Reason codes
+TOO_SMALL = 'TOO_SMALL'
+UNDEREXPOSED = 'UNDEREXPOSED'
+OVEREXPOSED = 'OVEREXPOSED'
+BLURRY = 'BLURRY'
+NO_PANEL_COLOR = 'NO_PANEL_COLOR'
+
+REASON_MESSAGES = {
+    TOO_SMALL: 'Image is too small to verify',
+    UNDEREXPOSED: 'Image is too dark to verify',
+    OVEREXPOSED: 'Image is too bright to verify',
+    BLURRY: 'Image is too blurred to verify',
+    NO_PANEL_COLOR: 'No solar-panel colours found in the image',
+}
+
+# JPEG decoders downscale by 1/2, 1/4 or 1/8 while decoding
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                  8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def _fit(image):
+    """Downscale an image so its longest side is at most PRESCREEN_THUMBNAIL_SIZE"""
+    scale = config.PRESCREEN_THUMBNAIL_SIZE / max(image.shape[:2])
+    if scale >= 1:
+        return image
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def load_thumbnail(image_path):
+    """
+    Decode a small version of an image
+
+    Returns:
+        Tuple of (thumbnail, approximate original (width, height)), or
+        (None, None) if the image cannot be read
+    """
+    for factor in (8, 4, 2):
+        thumbnail = cv2.imread(image_path, _REDUCED_FLAGS[factor])
+        if thumbnail is None:
+            return None, None
+        # Small images are decoded at a finer scale to keep the checks reliable
+        if max(thumbnail.shape[:2]) >= config.PRESCREEN_THUMBNAIL_SIZE:
+            height, width = thumbnail.shape[:2]
+            return _fit(thumbnail), (width * factor, height * factor)
+
+    image = cv2.imread(image_path)
+    if image is None:
+        return None, None
+    return thumbnail_of(image)
+
+
+def thumbnail_of(image):
+    """Thumbnail and (width, height) of an already decoded image"""
+    height, width = image.shape[:2]
+    return _fit(image), (width, height)
+
+
+def prescreen(thumbnail, original_size):
+    """
+    Check whether an image could possibly pass verification
+
+    Args:
+        thumbnail: Small BGR version of the image
+        original_size: (width, height) of the full image
+
+    Returns:
+        Dictionary with 'passed', 'reason' (reason code or None) and the
+        measured 'brightness', 'sharpness' and 'panel_fraction'
+    """
+    gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+    brightness = float(gray.mean())
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    # Same colour test as detection, on an equalized thumbnail
+    hsv = cv2.cvtColor(ImageProcessor.preprocess_image(thumbnail), cv2.COLOR_BGR2HSV)
+    lower, upper = config.SOLAR_PANEL_HSV_RANGE
+    mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+    for lower, upper in config.ROOF_EXCLUDE_HSV_RANGES:
+        mask &= ~cv2.inRange(hsv, np.array(lower), np.array(upper))
+    panel_fraction = np.count_nonzero(mask) / mask.size
+
+    if min(original_size) < config.PRESCREEN_MIN_SIZE:
+        reason = TOO_SMALL
+    elif brightness < config.PRESCREEN_BRIGHTNESS_RANGE[0]:
+        reason = UNDEREXPOSED
+    elif brightness > config.PRESCREEN_BRIGHTNESS_RANGE[1]:
+        reason = OVEREXPOSED
+    elif sharpness < config.PRESCREEN_MIN_SHARPNESS:
+        reason = BLURRY
+    # Half the minimum panel area leaves margin for thumbnail resampling
+    elif panel_fraction < config.MIN_PANEL_AREA_RATIO / 2:
+        reason = NO_PANEL_COLOR
+    else:
+        reason = None
+
+    return {
+        'passed': reason is None,
+        'reason': reason,
+        'brightness': round(brightness, 1),
+        'sharpness': round(sharpness, 1),
+        'panel_fraction': round(float(panel_fraction), 4),
+    }
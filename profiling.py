@@ -0,0 +1,101 @@
+"""
+Per-stage memory profiling for the verification pipeline
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def get_rss_bytes():
+    """
+    Get the resident set size of the current process
+
+    Returns:
+        RSS in bytes, or None if it cannot be determined on this platform
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    return None
+
+
+class MemoryProfiler:
+    """Records tracemalloc and RSS figures for each named pipeline stage"""
+
+    def __init__(self, enabled=True):
+        """
+        Initialize the profiler
+
+        Args:
+            enabled: When False, stages run without being measured
+        """
+        self.enabled = enabled
+        self.stages = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager measuring one stage of the pipeline"""
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        rss_before = get_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current_after, peak = tracemalloc.get_traced_memory()
+            rss_after = get_rss_bytes()
+            self.stages.append({
+                'stage': name,
+                'seconds': round(elapsed, 4),
+                'traced_current_mb': round(current_after / 1e6, 3),
+                'traced_delta_mb': round((current_after - current_before) / 1e6, 3),
+                'traced_peak_mb': round(peak / 1e6, 3),
+                'rss_mb': round(rss_after / 1e6, 3) if rss_after is not None else None,
+                'rss_delta_mb': (
+                    round((rss_after - rss_before) / 1e6, 3)
+                    if rss_after is not None and rss_before is not None else None
+                ),
+            })
+
+    def report(self):
+        """
+        Build the memory report and stop tracing if this profiler started it
+
+        Returns:
+            Dictionary with per-stage figures and the overall traced peak
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        return {
+            'stages': self.stages,
+            'peak_traced_mb': max((s['traced_peak_mb'] for s in self.stages), default=0),
+            'peak_rss_mb': max(
+                (s['rss_mb'] for s in self.stages if s['rss_mb'] is not None),
+                default=None
+            ),
+        }
@@ -0,0 +1,165 @@
+"""
+Re-score the feature store with new confidence weights or threshold
+
+Confidence and APPROVED/REJECTED are recomputed for every stored
+verification in one vectorized pass over the feature columns, and compared
+with the decisions the verifications received at the time. No image is
+read, so the impact of a policy change on the whole archive is known in
+seconds.
+
+Usage:
+    python rescore.py [--weights 0.5 0.2 0.3] [--threshold 0.5] [--store DIR]
+                      [--report report.json] [--flips flips.csv]
+"""
+
+import csv
+import json
+import time
+import argparse
+import numpy as np
+from feature_store import FeatureStore
+from feature_cache import settings_signature
+from verifier import SolarPanelVerifier
+import config
+
+
+def rescore(store, weights=None, threshold=None, settings=None, sample=20):
+    """
+    Recompute decisions for every stored verification
+
+    Args:
+        store: FeatureStore to read
+        weights: Confidence weights (defaults to config.CONFIDENCE_WEIGHTS)
+        threshold: Approval threshold (defaults to config.MIN_CONFIDENCE_THRESHOLD)
+        settings: Only re-score rows recorded under this detection settings
+            signature (None re-scores all)
+        sample: Number of flipped records listed in the report, largest
+            confidence change first
+
+    Returns:
+        Tuple of (report dictionary, store-wide indices of flipped rows,
+        new confidences of all rows, new approvals of all rows)
+    """
+    weights = weights or config.CONFIDENCE_WEIGHTS
+    threshold = config.MIN_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    columns = store.load(['coverage', 'similarity', 'panel_count', 'confidence', 'approved', 'settings'])
+
+    confidence, status = SolarPanelVerifier.decide_batch(
+        columns['coverage'], columns['similarity'], columns['panel_count'], weights, threshold
+    )
+    approved = status == 'APPROVED'
+    selected = np.ones(len(approved), dtype=bool)
+    if settings is not None:
+        selected = columns['settings'] == settings
+
+    before = columns['approved']
+    newly_approved = selected & approved & ~before
+    newly_rejected = selected & before & ~approved
+    flipped = np.flatnonzero(newly_approved | newly_rejected)
+    delta = (confidence - columns['confidence'])[selected]
+
+    by_settings = {}
+    signatures, codes = np.unique(columns['settings'][selected], return_inverse=True)
+    for i, signature in enumerate(signatures):
+        rows = codes == i
+        by_settings[str(signature)] = {
+            'records': int(rows.sum()),
+            'newly_approved': int(newly_approved[selected][rows].sum()),
+            'newly_rejected': int(newly_rejected[selected][rows].sum()),
+        }
+
+    # Largest confidence changes first; only the sampled rows' ids are read
+    order = np.argsort(-np.abs(confidence[flipped] - columns['confidence'][flipped]), kind='stable')
+    shown = flipped[order[:sample]]
+    records = store.records(shown)
+
+    total = int(selected.sum())
+    report = {
+        'records': total,
+        'weights': weights,
+        'threshold': threshold,
+        'approved_before': int(before[selected].sum()),
+        'approved_after': int(approved[selected].sum()),
+        'newly_approved': int(newly_approved.sum()),
+        'newly_rejected': int(newly_rejected.sum()),
+        'flip_rate': round(len(flipped) / total, 6) if total else 0,
+        'confidence_change': {
+            'mean': round(float(delta.mean()), 6) if total else 0,
+            'max_abs': round(float(np.abs(delta).max()), 6) if total else 0,
+        },
+        'by_settings': by_settings,
+        'flips': [
+            {
+                'record': str(record),
+                'before': 'APPROVED' if before[i] else 'REJECTED',
+                'after': 'APPROVED' if approved[i] else 'REJECTED',
+                'confidence_before': round(float(columns['confidence'][i]), 3),
+                'confidence_after': round(float(confidence[i]), 3),
+            }
+            for record, i in zip(records, shown)
+        ],
+    }
+    return report, flipped, confidence, approved
+
+
+def write_flips(store, path, flipped, confidence, approved):
+    """Write every flipped record to a CSV file"""
+    columns = store.load(['confidence'])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['record', 'before', 'after', 'confidence_before', 'confidence_after'])
+        for record, i in zip(store.records(flipped), flipped):
+            writer.writerow([
+                record,
+                'REJECTED' if approved[i] else 'APPROVED',
+                'APPROVED' if approved[i] else 'REJECTED',
+                round(float(columns['confidence'][i]), 3),
+                round(float(confidence[i]), 3),
+            ])
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Re-score stored verifications with new scoring settings')
+    parser.add_argument('--store', default=None, help='Feature store directory')
+    parser.add_argument('--weights', type=float, nargs=3, default=None,
+                        metavar=('COVERAGE', 'SIMILARITY', 'PANELS'), help='Confidence weights')
+    parser.add_argument('--threshold', type=float, default=None, help='Approval threshold')
+    parser.add_argument('--current-settings', action='store_true',
+                        help='Only re-score rows recorded with the current detection settings')
+    parser.add_argument('--sample', type=int, default=20, help='Flipped records listed in the report')
+    parser.add_argument('--report', default=None, help='Write the JSON report here')
+    parser.add_argument('--flips', default=None, help='Write every flipped record to this CSV')
+
+    args = parser.parse_args()
+    store = FeatureStore(args.store or config.FEATURE_STORE_DIR or 'feature_store')
+    weights = None
+    if args.weights:
+        weights = dict(zip(('coverage', 'similarity', 'panels'), args.weights))
+
+    start = time.perf_counter()
+    report, flipped, confidence, approved = rescore(
+        store, weights, args.threshold,
+        settings_signature() if args.current_settings else None, args.sample
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"Re-scored {report['records']} record(s) in {elapsed:.2f}s "
+          f"(weights {report['weights']}, threshold {report['threshold']})")
+    print(f"  Approved: {report['approved_before']} -> {report['approved_after']}")
+    print(f"  Flipped: {report['newly_approved']} to APPROVED, "
+          f"{report['newly_rejected']} to REJECTED ({report['flip_rate']:.2%})")
+    for flip in report['flips']:
+        print(f"  {flip['before']} -> {flip['after']} "
+              f"({flip['confidence_before']:.3f} -> {flip['confidence_after']:.3f}): {flip['record']}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.flips:
+        write_flips(store, args.flips, flipped, confidence, approved)
+        print(f"  {len(flipped)} flip(s) written to {args.flips}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Reusable satellite-side data for image comparison
+
+compare_images resizes and grayscales both inputs and computes SSIM from
+local means and variances of each. When one satellite image is compared with
+several user photos, its share of that work (resized grayscale image, local
+mean and variance) only needs computing once per target size. PreparedSatellite
+holds those arrays and SatelliteCache keeps prepared satellites keyed by file
+content hash. Both are safe to share between threads.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from scipy.ndimage import uniform_filter
+from feature_cache import file_digest
+from image_processor import ImageProcessor
+import config
+
+
+# structural_similarity defaults used by compare_images
+SSIM_WIN_SIZE = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+SSIM_DATA_RANGE = 255
+
+
+def ssim_statistics(gray):
+    """
+    Compute the per-image terms of SSIM for a uint8 grayscale image
+
+    Returns:
+        Tuple of (image as float64, local mean, local sample variance)
+    """
+    values = gray.astype(np.float64)
+    cov_norm = SSIM_WIN_SIZE ** 2 / (SSIM_WIN_SIZE ** 2 - 1)
+    mean = uniform_filter(values, size=SSIM_WIN_SIZE)
+    variance = cov_norm * (uniform_filter(values * values, size=SSIM_WIN_SIZE) - mean * mean)
+    return values, mean, variance
+
+
+def ssim_from_statistics(stats_x, stats_y):
+    """
+    Mean SSIM of two images from their ssim_statistics
+
+    Matches skimage.metrics.structural_similarity with default arguments.
+    """
+    x, ux, vx = stats_x
+    y, uy, vy = stats_y
+    cov_norm = SSIM_WIN_SIZE ** 2 / (SSIM_WIN_SIZE ** 2 - 1)
+    vxy = cov_norm * (uniform_filter(x * y, size=SSIM_WIN_SIZE) - ux * uy)
+
+    c1 = (SSIM_K1 * SSIM_DATA_RANGE) ** 2
+    c2 = (SSIM_K2 * SSIM_DATA_RANGE) ** 2
+    a1, a2, b1, b2 = (
+        2 * ux * uy + c1,
+        2 * vxy + c2,
+        ux ** 2 + uy ** 2 + c1,
+        vx + vy + c2,
+    )
+    s = (a1 * a2) / (b1 * b2)
+
+    pad = (SSIM_WIN_SIZE - 1) // 2
+    return s[pad:-pad, pad:-pad].mean(dtype=np.float64)
+
+
+class PreparedSatellite:
+    """A decoded satellite image with its comparison statistics cached per size"""
+
+    def __init__(self, image, digest=None, max_levels=None):
+        """
+        Initialize from a decoded image
+
+        Args:
+            image: BGR satellite image
+            digest: Content hash of the source file, if known
+            max_levels: Number of target sizes to keep statistics for
+        """
+        self.image = image
+        self.digest = digest
+        self.max_levels = max_levels or config.SATELLITE_CACHE_LEVELS
+        self._levels = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        """(height, width) of the satellite image"""
+        return self.image.shape[:2]
+
+    @property
+    def nbytes(self):
+        """Memory held by the image and cached statistics"""
+        return self.image.nbytes + sum(
+            sum(a.nbytes for a in stats) for stats in self._levels.values()
+        )
+
+    def level(self, size):
+        """
+        Statistics of the satellite resized to a (width, height) target size
+
+        Resizing and grayscale conversion follow compare_images exactly.
+        """
+        with self._lock:
+            stats = self._levels.get(size)
+            if stats is not None:
+                self._levels.move_to_end(size)
+                return stats
+
+            resized = cv2.resize(self.image, size)
+            gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+            stats = ssim_statistics(gray)
+
+            self._levels[size] = stats
+            while len(self._levels) > self.max_levels:
+                self._levels.popitem(last=False)
+            return stats
+
+    def compare(self, image, max_side=None):
+        """
+        Equivalent of ImageProcessor.compare_images(image, satellite)
+
+        Only the user-side resize, grayscale and statistics are computed.
+
+        Args:
+            image: BGR user image
+            max_side: Compare at most at this longest side, for a faster
+                approximate score (None compares exactly as compare_images)
+
+        Returns:
+            Similarity score between 0 and 1
+        """
+        height = min(image.shape[0], self.shape[0])
+        width = min(image.shape[1], self.shape[1])
+        if max_side and max(width, height) > max_side:
+            scale = max_side / max(width, height)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+
+        resized = cv2.resize(image, (width, height))
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+
+        similarity_score = ssim_from_statistics(ssim_statistics(gray), self.level((width, height)))
+        return max(0, min(1, (similarity_score + 1) / 2))  # Normalize to 0-1
+
+
+class SatelliteCache:
+    """LRU cache of PreparedSatellite objects keyed by file content hash"""
+
+    def __init__(self, max_bytes=None, loader=None):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Memory cap (defaults to config.SATELLITE_CACHE_MAX_MB);
+                0 disables caching
+            loader: Function decoding an image path on a miss (defaults to
+                ImageProcessor.load_image)
+        """
+        if max_bytes is None:
+            max_bytes = config.SATELLITE_CACHE_MAX_MB * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.loader = loader or ImageProcessor.load_image
+        self._items = OrderedDict()
+        self._digests = {}
+        # Futures of satellites being decoded, so each is decoded once
+        self._loading = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, path):
+        """Content hash of a file, memoised by path, size and modification time"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def get(self, path):
+        """
+        Get the prepared satellite for a file, loading it on a miss
+
+        The file is hashed and decoded outside the cache lock, so lookups of
+        other satellites are not held up. Threads asking for a satellite that
+        is already being decoded wait for that decode instead of repeating it.
+
+        Returns:
+            PreparedSatellite, or None if the image cannot be loaded
+        """
+        digest = self._digest(path)
+        with self._lock:
+            prepared = self._items.get(digest)
+            if prepared is not None:
+                self._items.move_to_end(digest)
+                self.hits += 1
+                return prepared
+
+            loading = self._loading.get(digest)
+            owner = loading is None
+            if owner:
+                loading = self._loading[digest] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            return loading.result()
+
+        try:
+            image = self.loader(path)
+            prepared = None if image is None else PreparedSatellite(image, digest)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[digest]
+            loading.set_exception(e)
+            raise
+
+        with self._lock:
+            if prepared is not None and self.max_bytes > 0:
+                self._items[digest] = prepared
+            del self._loading[digest]
+            self._forget_digests()
+        loading.set_result(prepared)
+        return prepared
+
+    def compare(self, path, image, max_side=None):
+        """
+        Compare a user image with the satellite image at path
+
+        Args:
+            path: Satellite image path
+            image: BGR user image
+            max_side: Optional size cap for an approximate comparison
+
+        Returns:
+            Similarity score between 0 and 1, or None if the satellite
+            image cannot be loaded
+        """
+        prepared = self.get(path)
+        if prepared is None:
+            return None
+        similarity = prepared.compare(image, max_side)
+        self.trim()
+        return similarity
+
+    def trim(self):
+        """Evict least recently used satellites until under the memory cap"""
+        with self._lock:
+            total = sum(p.nbytes for p in self._items.values())
+            while self._items and total > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                total -= evicted.nbytes
+            self._forget_digests()
+
+    def _forget_digests(self):
+        """Drop memoised hashes of paths whose satellite is no longer cached"""
+        if len(self._digests) > len(self._items):
+            self._digests = {path: known for path, known in self._digests.items()
+                             if known[2] in self._items}
+
+    def clear(self):
+        """Drop all cached satellites"""
+        with self._lock:
+            self._items.clear()
+            self._digests.clear()
@@ -0,0 +1,294 @@
+"""
+Priority-aware scheduling of verification jobs
+
+Jobs are submitted with a priority class (interactive, normal or bulk) and
+run on a shared pool of threads, each with its own SolarPanelVerifier
+(OpenCV releases the GIL, and all verifiers share one satellite cache).
+Normal and bulk jobs are limited to a subset of the threads, so some are
+always free for interactive work however long the backlog is. Waiting jobs
+age: every SCHEDULER_AGING_SECONDS spent in the queue moves a job up one
+class when choosing what to run next, so bulk work is never starved by a
+steady stream of normal jobs.
+
+Usage:
+    python scheduler.py manifest.csv [--interactive IMAGE ...] [--interval 2]
+"""
+
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from autotune import apply_saved_profile, default_workers
+from manifest import load_manifest
+from satellite_cache import SatelliteCache
+from verifier import SolarPanelVerifier
+import config
+
+
+PRIORITY_CLASSES = ('interactive', 'normal', 'bulk')
+
+# Wait times kept per class for the metrics
+_WAIT_SAMPLES = 1000
+
+
+class _Job:
+    """A queued verification request"""
+
+    def __init__(self, priority, args, kwargs):
+        self.priority = priority
+        self.rank = PRIORITY_CLASSES.index(priority)
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+
+class _ClassStats:
+    """Counters and recent wait times of one priority class"""
+
+    def __init__(self):
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.waits = deque(maxlen=_WAIT_SAMPLES)
+        self.run_seconds = 0.0
+
+    def summary(self, queued):
+        """Metrics dictionary for this class"""
+        waits = sorted(self.waits)
+
+        def percentile(fraction):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 3)
+
+        finished = self.completed + self.failed
+        return {
+            'queued': queued,
+            'running': self.running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'wait_mean': round(sum(waits) / len(waits), 3) if waits else 0.0,
+            'wait_p50': percentile(0.5),
+            'wait_p95': percentile(0.95),
+            'wait_max': round(waits[-1], 3) if waits else 0.0,
+            'run_mean': round(self.run_seconds / finished, 3) if finished else 0.0,
+        }
+
+
+class PriorityScheduler:
+    """Thread pool running verification jobs by priority class"""
+
+    def __init__(self, workers=None, reserved=None, limits=None, aging_seconds=None):
+        """
+        Initialize the scheduler and start its threads
+
+        Args:
+            workers: Threads shared by all classes (defaults to the autotuned
+                worker count or the CPU count)
+            reserved: Extra threads only interactive jobs may use (defaults
+                to config.SCHEDULER_INTERACTIVE_RESERVE)
+            limits: Maximum concurrent jobs per class; classes not listed may
+                use all threads (defaults to config.SCHEDULER_CLASS_LIMITS)
+            aging_seconds: Queue time that promotes a job by one class
+                (defaults to config.SCHEDULER_AGING_SECONDS)
+        """
+        workers = workers or default_workers()
+        reserved = config.SCHEDULER_INTERACTIVE_RESERVE if reserved is None else reserved
+        limits = config.SCHEDULER_CLASS_LIMITS if limits is None else limits
+
+        self.threads_total = workers + reserved
+        # Normal and bulk jobs together never take more than the shared
+        # threads, so the reserved ones stay free for interactive work
+        self.shared_limit = workers
+        self.limits = {}
+        for priority in PRIORITY_CLASSES:
+            cap = workers + reserved if priority == 'interactive' else workers
+            limit = limits.get(priority)
+            self.limits[priority] = min(cap, limit) if limit else cap
+        self.aging_seconds = aging_seconds or config.SCHEDULER_AGING_SECONDS
+
+        self.satellite_cache = SatelliteCache()
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._stats = {priority: _ClassStats() for priority in PRIORITY_CLASSES}
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+
+        self._threads = [threading.Thread(target=self._worker, daemon=True)
+                         for _ in range(self.threads_total)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, user_image_path, satellite_image_path=None, priority='normal', **kwargs):
+        """
+        Queue a verification
+
+        Args:
+            user_image_path: Path to user-uploaded home image
+            satellite_image_path: Path to satellite image (optional)
+            priority: 'interactive', 'normal' or 'bulk'
+            kwargs: Passed on to SolarPanelVerifier.verify_installation
+
+        Returns:
+            Future resolving to the verification results
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority!r}")
+
+        job = _Job(priority, (user_image_path, satellite_image_path), kwargs)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Scheduler has been shut down')
+            self._queues[priority].append(job)
+            self._condition.notify_all()
+        return job.future
+
+    def _verifier(self):
+        """This thread's verifier, sharing the satellite cache"""
+        verifier = getattr(self._local, 'verifier', None)
+        if verifier is None:
+            verifier = SolarPanelVerifier()
+            verifier.satellite_cache = self.satellite_cache
+            self._local.verifier = verifier
+        return verifier
+
+    def _next_job(self):
+        """
+        Pop the most urgent job whose class is under its limit
+
+        Only queue heads are compared, since jobs within a class run in
+        submission order. Aging changes the order of jobs, not their class:
+        an aged bulk job still cannot take a reserved thread. Must be called
+        with the condition held.
+        """
+        now = time.monotonic()
+        shared_full = sum(self._stats[priority].running for priority in PRIORITY_CLASSES
+                          if priority != 'interactive') >= self.shared_limit
+        best = None
+        best_score = None
+        for priority, jobs in self._queues.items():
+            if not jobs or self._stats[priority].running >= self.limits[priority]:
+                continue
+            if priority != 'interactive' and shared_full:
+                continue
+            head = jobs[0]
+            score = head.rank - (now - head.submitted) / self.aging_seconds
+            if best is None or score < best_score:
+                best, best_score = head, score
+
+        if best is not None:
+            self._queues[best.priority].popleft()
+        return best
+
+    def _worker(self):
+        """Run jobs until the scheduler shuts down and the queues are empty"""
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._closed and not any(self._queues.values()):
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+
+                stats = self._stats[job.priority]
+                stats.running += 1
+                stats.waits.append(time.monotonic() - job.submitted)
+
+            if not job.future.set_running_or_notify_cancel():
+                with self._condition:
+                    stats.running -= 1
+                    self._condition.notify_all()
+                continue
+
+            started = time.monotonic()
+            try:
+                results = self._verifier().verify_installation(*job.args, **job.kwargs)
+                job.future.set_result(results)
+                failed = False
+            except Exception as e:
+                job.future.set_exception(e)
+                failed = True
+
+            with self._condition:
+                stats.running -= 1
+                stats.run_seconds += time.monotonic() - started
+                if failed:
+                    stats.failed += 1
+                else:
+                    stats.completed += 1
+                # A freed slot may unblock a job of another class
+                self._condition.notify_all()
+
+    def metrics(self):
+        """
+        Queue depth, running jobs and wait/run times per priority class
+
+        Returns:
+            Dictionary keyed by priority class, plus 'threads', 'shared_limit'
+            and 'limits'
+        """
+        with self._condition:
+            metrics = {priority: self._stats[priority].summary(len(self._queues[priority]))
+                       for priority in PRIORITY_CLASSES}
+        metrics['threads'] = self.threads_total
+        metrics['shared_limit'] = self.shared_limit
+        metrics['limits'] = dict(self.limits)
+        return metrics
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; queued jobs still run"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Run a manifest as bulk work while timing interactive verifications')
+    parser.add_argument('manifest', help='Path to a manifest (.csv or .jsonl) run as bulk jobs')
+    parser.add_argument('--interactive', nargs='*', default=[],
+                        help='Images submitted as interactive jobs during the backlog')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Seconds between interactive submissions')
+    parser.add_argument('--workers', type=int, default=None, help='Shared worker threads')
+
+    args = parser.parse_args()
+    apply_saved_profile()
+    cases = load_manifest(args.manifest)
+
+    with PriorityScheduler(args.workers) as scheduler:
+        bulk = [scheduler.submit(case['user_image'], case['satellite_image'], 'bulk', render=False)
+                for case in cases]
+
+        latencies = []
+        for image_path in args.interactive:
+            time.sleep(args.interval)
+            started = time.monotonic()
+            results = scheduler.submit(image_path, priority='interactive').result()
+            latencies.append(time.monotonic() - started)
+            print(f"Interactive {image_path}: {results['verification_status']} "
+                  f"in {latencies[-1]:.2f}s")
+
+        for future in bulk:
+            future.result()
+        metrics = scheduler.metrics()
+
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == '__main__':
+    main()
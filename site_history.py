@@ -0,0 +1,246 @@
+"""
+Per-site satellite history with incremental change detection
+
+Each satellite capture of a site is run through detection once; its mask
+(bit-packed or run-length encoded, see mask_codec) and features are stored
+under the site's directory. A new capture is only
+compared with the stored latest state, so re-checking a site costs one
+detection, and before/after checks around a subsidy claim read stored
+masks without touching the images again.
+
+Usage:
+    python site_history.py add SITE_ID IMAGE [--captured-at 2024-05-01]
+    python site_history.py check SITE_ID --claim-date 2024-03-15
+    python site_history.py show SITE_ID
+"""
+
+import os
+import re
+import json
+import argparse
+from datetime import datetime
+import cv2
+import numpy as np
+from feature_cache import file_digest
+from image_processor import ImageProcessor
+from mask_codec import save_mask, load_mask
+import config
+
+
+def compare_masks(previous, current):
+    """
+    Incremental difference between two detection masks
+
+    The previous mask is resized to the current one if their sizes differ.
+
+    Args:
+        previous: Earlier mask (or None for a site's first capture)
+        current: New mask
+
+    Returns:
+        Dictionary with coverage before/after and the newly appeared and
+        removed panel regions (bounding boxes in current mask pixels)
+    """
+    current_on = current > 0
+    if previous is None:
+        previous_on = np.zeros_like(current_on)
+    else:
+        if previous.shape != current.shape:
+            previous = cv2.resize(previous, (current.shape[1], current.shape[0]),
+                                  interpolation=cv2.INTER_NEAREST)
+        previous_on = previous > 0
+
+    min_area = current.size * config.MIN_PANEL_AREA_RATIO
+
+    def regions(changed):
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed.astype(np.uint8), connectivity=8)
+        found = []
+        for x, y, w, h, area in stats[1:count]:
+            if area >= min_area:
+                found.append({'bbox': [int(x), int(y), int(w), int(h)], 'area': int(area)})
+        return found
+
+    coverage_before = np.count_nonzero(previous_on) / current.size * 100
+    coverage_after = np.count_nonzero(current_on) / current.size * 100
+    appeared = regions(current_on & ~previous_on)
+    removed = regions(previous_on & ~current_on)
+
+    return {
+        'coverage_before': round(coverage_before, 2),
+        'coverage_after': round(coverage_after, 2),
+        'coverage_change': round(coverage_after - coverage_before, 2),
+        'new_panel_regions': appeared,
+        'removed_panel_regions': removed,
+        'panels_appeared': len(appeared) > 0,
+    }
+
+
+class SiteHistory:
+    """Stored detection masks and features for one site's satellite captures"""
+
+    INDEX_FILE = 'history.json'
+
+    def __init__(self, site_id, root=None):
+        """
+        Open a site's history
+
+        Args:
+            site_id: Site identifier (e.g. application or meter number)
+            root: Directory holding all sites (defaults to config.SITE_HISTORY_DIR)
+        """
+        self.site_id = site_id
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', site_id)
+        self.site_dir = os.path.join(root or config.SITE_HISTORY_DIR, safe_id)
+        os.makedirs(self.site_dir, exist_ok=True)
+        self.processor = ImageProcessor()
+
+        self.captures = []
+        index_path = os.path.join(self.site_dir, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.captures = json.load(f)
+
+    def _save_index(self):
+        """Write the capture index"""
+        index_path = os.path.join(self.site_dir, self.INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(self.captures, f, indent=2)
+        os.replace(index_path + '.tmp', index_path)
+
+    def latest(self, before=None):
+        """
+        Most recent stored capture
+
+        Args:
+            before: Optional ISO timestamp; only captures strictly earlier count
+
+        Returns:
+            Capture entry, or None
+        """
+        candidates = [c for c in self.captures if before is None or c['captured_at'] < before]
+        return max(candidates, key=lambda c: c['captured_at'], default=None)
+
+    def load_mask(self, capture):
+        """Load the stored detection mask of a capture"""
+        return load_mask(os.path.join(self.site_dir, capture['mask_file']))
+
+    def add_capture(self, image_path, captured_at=None):
+        """
+        Detect panels in a new capture and diff it against the latest state
+
+        Adding the same image file again returns its stored entry.
+
+        Args:
+            image_path: Satellite image of the site
+            captured_at: ISO date/time of the capture (defaults to now)
+
+        Returns:
+            Capture entry including its 'change' against the previous capture,
+            or None if the image cannot be loaded
+        """
+        digest = file_digest(image_path)
+        for capture in self.captures:
+            if capture['digest'] == digest:
+                return capture
+
+        image = self.processor.load_image(image_path)
+        if image is None:
+            return None
+
+        processed = self.processor.preprocess_image(image)
+        panels, mask = self.processor.detect_solar_panels(processed)
+
+        captured_at = captured_at or datetime.now().isoformat()
+        previous = self.latest(before=captured_at)
+        previous_mask = self.load_mask(previous) if previous else None
+
+        mask_file = f"mask_{len(self.captures):04d}.npz"
+        save_mask(os.path.join(self.site_dir, mask_file), mask)
+
+        capture = {
+            'captured_at': captured_at,
+            'image_path': os.path.abspath(image_path),
+            'digest': digest,
+            'mask_file': mask_file,
+            'mask_shape': list(mask.shape),
+            'panel_count': len(panels),
+            'solar_coverage': round(float(self.processor.calculate_solar_coverage(mask)), 2),
+            'panels': [list(map(int, cv2.boundingRect(p))) for p in panels],
+            'previous_capture': previous['captured_at'] if previous else None,
+            'change': compare_masks(previous_mask, mask),
+        }
+        self.captures.append(capture)
+        self._save_index()
+        return capture
+
+    def check_installation(self, claim_date):
+        """
+        Compare the site's state before and after a claim date from stored masks
+
+        Args:
+            claim_date: ISO date of the subsidy claim
+
+        Returns:
+            Dictionary with the captures used and their difference, or None
+            if there is no capture after the claim date
+        """
+        after = self.latest()
+        if after is None or after['captured_at'] < claim_date:
+            return None
+
+        before = self.latest(before=claim_date)
+        change = compare_masks(self.load_mask(before) if before else None, self.load_mask(after))
+        return {
+            'site_id': self.site_id,
+            'claim_date': claim_date,
+            'before_capture': before['captured_at'] if before else None,
+            'after_capture': after['captured_at'],
+            'change': change,
+        }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Satellite history of a site')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='Add a satellite capture')
+    add_parser.add_argument('site_id')
+    add_parser.add_argument('image', help='Satellite image path')
+    add_parser.add_argument('--captured-at', help='Capture date/time (ISO format)')
+
+    check_parser = subparsers.add_parser('check', help='Compare before and after a claim date')
+    check_parser.add_argument('site_id')
+    check_parser.add_argument('--claim-date', required=True, help='Claim date (ISO format)')
+
+    show_parser = subparsers.add_parser('show', help='List stored captures')
+    show_parser.add_argument('site_id')
+
+    args = parser.parse_args()
+    history = SiteHistory(args.site_id)
+
+    if args.command == 'add':
+        capture = history.add_capture(args.image, args.captured_at)
+        if capture is None:
+            print(f"ERROR: Could not load {args.image}")
+            return
+        change = capture['change']
+        print(f"Capture {capture['captured_at']}: {capture['panel_count']} panel(s), "
+              f"coverage {capture['solar_coverage']:.2f}%")
+        print(f"Change vs previous: {change['coverage_change']:+.2f}% coverage, "
+              f"{len(change['new_panel_regions'])} new region(s), "
+              f"{len(change['removed_panel_regions'])} removed")
+    elif args.command == 'check':
+        result = history.check_installation(args.claim_date)
+        if result is None:
+            print("No capture after the claim date")
+            return
+        print(json.dumps(result, indent=2))
+    else:
+        for capture in sorted(history.captures, key=lambda c: c['captured_at']):
+            print(f"{capture['captured_at']}  panels {capture['panel_count']:>3}  "
+                  f"coverage {capture['solar_coverage']:6.2f}%  {capture['image_path']}")
+
+
+if __name__ == '__main__':
+    main()
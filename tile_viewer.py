@@ -0,0 +1,255 @@
+"""
+Tiled zoom/pan viewer for large annotated outputs
+
+The image is decoded once and downscaled levels of a tile pyramid are built
+only when a zoom level first needs them. Only tiles that intersect the
+window are cut, scaled and turned into PhotoImages, and those are kept in
+an LRU cache so panning back and forth does not redo the work. Panel
+polygons from the verification results are drawn as canvas items on top,
+so they stay sharp at any zoom.
+
+Controls: mouse wheel zooms around the cursor, dragging pans, 'f' fits the
+image to the window and '1' shows it at full resolution.
+
+Usage:
+    python tile_viewer.py IMAGE [--results results.json]
+"""
+
+import math
+import json
+import argparse
+from collections import OrderedDict
+import tkinter as tk
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+import config
+
+
+class TilePyramid:
+    """Image levels halving in size, built on first use, cut into square tiles"""
+
+    def __init__(self, image, tile_size=None):
+        """
+        Initialize the pyramid
+
+        Args:
+            image: RGB array of the full-resolution image
+            tile_size: Tile side in pixels (defaults to config.TILE_SIZE)
+        """
+        self.tile_size = tile_size or config.TILE_SIZE
+        self.levels = {0: image}
+        self.height, self.width = image.shape[:2]
+        longest = max(self.width, self.height)
+        self.max_level = max(0, math.ceil(math.log2(longest / self.tile_size)))
+
+    @classmethod
+    def open(cls, image_path, tile_size=None):
+        """Load an image file into a pyramid"""
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not load image from {image_path}")
+        return cls(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), tile_size)
+
+    def level(self, index):
+        """Image at 1 / 2**index scale, downscaled from the nearest finer level"""
+        image = self.levels.get(index)
+        if image is None:
+            finer = max(i for i in self.levels if i < index)
+            source = self.levels[finer]
+            factor = 2 ** (index - finer)
+            size = (max(1, source.shape[1] // factor), max(1, source.shape[0] // factor))
+            image = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+            self.levels[index] = image
+        return image
+
+    def level_for_zoom(self, zoom):
+        """Coarsest level that still has at least one pixel per screen pixel"""
+        if zoom >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1 / zoom))))
+
+    def tile(self, index, tx, ty):
+        """RGB array of one tile (edge tiles are smaller)"""
+        image = self.level(index)
+        size = self.tile_size
+        return image[ty * size:(ty + 1) * size, tx * size:(tx + 1) * size]
+
+    def tile_counts(self, index):
+        """(columns, rows) of tiles at a level"""
+        height, width = self.level(index).shape[:2]
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+
+class TileViewer(tk.Toplevel):
+    """Window showing an image pyramid with panel overlays"""
+
+    MIN_ZOOM_FACTOR = 0.5  # Relative to fit-to-window
+    MAX_ZOOM = 8.0
+    ZOOM_STEP = 2 ** 0.25
+
+    def __init__(self, master, image_path, panels=None, title=None):
+        """
+        Open the viewer
+
+        Args:
+            master: Parent Tk widget
+            image_path: Image to show (e.g. the annotated report PNG)
+            panels: Panel geometry from results['panels'], in image coordinates
+            title: Window title
+        """
+        super().__init__(master)
+        self.title(title or f"Viewer - {image_path}")
+        self.geometry('1000x750')
+
+        self.pyramid = TilePyramid.open(image_path)
+        self.panels = panels or []
+        self.cache = OrderedDict()
+        self.cache_size = config.TILE_CACHE_SIZE
+        self.zoom = 1.0
+        self.origin = [0, 0]  # Canvas position of the image's top-left corner
+        self._drag = None
+        self._render_pending = False
+
+        self.canvas = tk.Canvas(self, bg='#202020', highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.status = tk.Label(self, anchor='w', bg='#303030', fg='white')
+        self.status.pack(fill=tk.X)
+
+        self.canvas.bind('<Configure>', lambda event: self.schedule_render())
+        self.canvas.bind('<ButtonPress-1>', self._start_drag)
+        self.canvas.bind('<B1-Motion>', self._drag_to)
+        self.canvas.bind('<MouseWheel>', self._wheel)
+        self.canvas.bind('<Button-4>', lambda event: self.zoom_at(self.ZOOM_STEP, event.x, event.y))
+        self.canvas.bind('<Button-5>', lambda event: self.zoom_at(1 / self.ZOOM_STEP, event.x, event.y))
+        self.bind('f', lambda event: self.fit())
+        self.bind('1', lambda event: self.zoom_at(1 / self.zoom, self.canvas.winfo_width() / 2,
+                                                  self.canvas.winfo_height() / 2))
+        self.after_idle(self.fit)
+
+    def fit_zoom(self):
+        """Zoom at which the whole image fits the window"""
+        width = max(1, self.canvas.winfo_width())
+        height = max(1, self.canvas.winfo_height())
+        return min(width / self.pyramid.width, height / self.pyramid.height)
+
+    def fit(self):
+        """Fit and centre the image"""
+        # Snap to a zoom step so tiles are reused across fits
+        steps = math.floor(math.log(self.fit_zoom(), self.ZOOM_STEP))
+        self.zoom = self.ZOOM_STEP ** steps
+        self.origin = [
+            int((self.canvas.winfo_width() - self.pyramid.width * self.zoom) / 2),
+            int((self.canvas.winfo_height() - self.pyramid.height * self.zoom) / 2),
+        ]
+        self.schedule_render()
+
+    def zoom_at(self, factor, x, y):
+        """Zoom by a factor keeping canvas point (x, y) fixed"""
+        zoom = min(self.MAX_ZOOM, max(self.fit_zoom() * self.MIN_ZOOM_FACTOR, self.zoom * factor))
+        if zoom == self.zoom:
+            return
+        # Image point under the cursor stays under the cursor
+        image_x = (x - self.origin[0]) / self.zoom
+        image_y = (y - self.origin[1]) / self.zoom
+        self.zoom = zoom
+        self.origin = [int(round(x - image_x * zoom)), int(round(y - image_y * zoom))]
+        self.schedule_render()
+
+    def _wheel(self, event):
+        self.zoom_at(self.ZOOM_STEP if event.delta > 0 else 1 / self.ZOOM_STEP, event.x, event.y)
+
+    def _start_drag(self, event):
+        self._drag = (event.x, event.y)
+
+    def _drag_to(self, event):
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        self.origin[0] += dx
+        self.origin[1] += dy
+        # Move what is on screen now and fill in new tiles when idle
+        self.canvas.move('all', dx, dy)
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Coalesce render requests into one per idle cycle"""
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.render)
+
+    def _photo(self, level, tx, ty, size):
+        """PhotoImage of a tile scaled to its on-screen size, via the LRU cache"""
+        key = (level, tx, ty, size)
+        photo = self.cache.get(key)
+        if photo is not None:
+            self.cache.move_to_end(key)
+            return photo
+
+        tile = Image.fromarray(np.ascontiguousarray(self.pyramid.tile(level, tx, ty)))
+        if tile.size != size:
+            tile = tile.resize(size, Image.BILINEAR)
+        photo = ImageTk.PhotoImage(tile)
+        self.cache[key] = photo
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return photo
+
+    def render(self):
+        """Draw the visible tiles and the panel overlays"""
+        self._render_pending = False
+        self.canvas.delete('all')
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        ox, oy = self.origin
+
+        level = self.pyramid.level_for_zoom(self.zoom)
+        # Screen pixels per level pixel
+        scale = self.zoom * 2 ** level
+        span = self.pyramid.tile_size * scale
+        columns, rows = self.pyramid.tile_counts(level)
+        level_height, level_width = self.pyramid.level(level).shape[:2]
+
+        first_x, last_x = max(0, int(-ox // span)), min(columns - 1, int((width - ox) // span))
+        first_y, last_y = max(0, int(-oy // span)), min(rows - 1, int((height - oy) // span))
+        for ty in range(first_y, last_y + 1):
+            for tx in range(first_x, last_x + 1):
+                # Edges come from rounded cumulative positions, so tiles meet without seams
+                x0 = int(round(tx * span))
+                y0 = int(round(ty * span))
+                x1 = int(round(min((tx + 1) * self.pyramid.tile_size, level_width) * scale))
+                y1 = int(round(min((ty + 1) * self.pyramid.tile_size, level_height) * scale))
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                photo = self._photo(level, tx, ty, (x1 - x0, y1 - y0))
+                self.canvas.create_image(ox + x0, oy + y0, image=photo, anchor='nw', tags='tile')
+
+        for panel in self.panels:
+            points = [coordinate for x, y in panel['polygon']
+                      for coordinate in (ox + x * self.zoom, oy + y * self.zoom)]
+            if len(points) >= 6:
+                self.canvas.create_polygon(points, outline='#00ff00', fill='', width=2, tags='panel')
+
+        self.status.config(text=f"{self.pyramid.width}x{self.pyramid.height}  zoom {self.zoom:.0%}  "
+                                f"level {level}  panels {len(self.panels)}  cached tiles {len(self.cache)}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='View a large image with panel overlays')
+    parser.add_argument('image', help='Image to view')
+    parser.add_argument('--results', default=None, help='Verification results JSON with panels')
+
+    args = parser.parse_args()
+    panels = []
+    if args.results:
+        with open(args.results) as f:
+            panels = json.load(f).get('panels', [])
+
+    root = tk.Tk()
+    root.withdraw()
+    viewer = TileViewer(root, args.image, panels)
+    viewer.protocol('WM_DELETE_WINDOW', root.destroy)
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,66 @@ Main verification module for solar panel installation
 """
 
 import os
+import time
+import sqlite3
 import cv2
 import numpy as np
 from datetime import datetime
-from image_processor import ImageProcessor
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from image_processor import ImageProcessor, DetectionBuffers, DEFAULT_MAX_DIM
+from profiling import MemoryProfiler
+from deadline import Deadline, StageCosts
+from hash_index import PerceptualHashIndex
+from satellite_cache import SatelliteCache
+from image_cache import DecodedImageCache
+from prescreen import load_thumbnail, thumbnail_of, prescreen, REASON_MESSAGES
+from feature_store import FeatureStore
+from mask_codec import save_mask
 import config
 
 
 class SolarPanelVerifier:
     """Main verifier class for solar panel installations"""
 
-    def __init__(self):
-        """Initialize the verifier"""
+    def __init__(self, low_memory=None, profile_memory=None, hash_index=None, image_cache=None,
+                 feature_store=None):
+        """
+        Initialize the verifier
+
+        Args:
+            low_memory: Reuse preallocated buffers and release intermediates
+                early (defaults to config.LOW_MEMORY_MODE)
+            profile_memory: Attach a per-stage memory report to the results
+                (defaults to config.MEMORY_PROFILING)
+            hash_index: PerceptualHashIndex of past submissions (defaults to
+                one opened lazily at config.PHASH_INDEX_PATH, if set)
+            image_cache: DecodedImageCache for decoded and preprocessed images
+                (defaults to one at config.IMAGE_CACHE_DIR, if set)
+            feature_store: FeatureStore recording the features of completed
+                verifications (defaults to one at config.FEATURE_STORE_DIR, if set)
+        """
         self.processor = ImageProcessor()
+        self.low_memory = config.LOW_MEMORY_MODE if low_memory is None else low_memory
+        self.profile_memory = config.MEMORY_PROFILING if profile_memory is None else profile_memory
+        self.buffers = DetectionBuffers() if self.low_memory else None
+        self.hash_index = hash_index
+        if image_cache is None and config.IMAGE_CACHE_DIR:
+            image_cache = DecodedImageCache()
+        self.image_cache = image_cache
+        if feature_store is None and config.FEATURE_STORE_DIR:
+            feature_store = FeatureStore()
+        self.feature_store = feature_store
+        # Low-memory mode prepares satellites per request without keeping them
+        self.satellite_cache = SatelliteCache(0 if self.low_memory else None, loader=self._load)
+        # Low-memory mode also keeps the two branches' intermediates from
+        # overlapping, and memory profiling would charge the comparison's
+        # allocations to whichever stage runs alongside it
+        self.concurrent_satellite = (config.CONCURRENT_SATELLITE and not self.low_memory
+                                     and not self.profile_memory)
+        self._satellite_executor = None
+        # Overdue comparisons left running on abandoned threads
+        self._abandoned = []
+        self.stage_costs = StageCosts()
         self.create_output_dirs()
 
     def create_output_dirs(self):
@@ -23,44 +70,122 @@ class SolarPanelVerifier:
         os.makedirs(config.OUTPUT_DIR, exist_ok=True)
         os.makedirs(config.TEMP_DIR, exist_ok=True)
 
-    def verify_installation(self, user_image_path, satellite_image_path=None):
+    def verify_installation(self, user_image_path, satellite_image_path=None, render=None,
+                            user_image=None, ground_sample_distance=None, deadline=None):
         """
         Main verification method
         
         Args:
             user_image_path: Path to user-uploaded home image
             satellite_image_path: Path to satellite image (optional)
+            render: Rasterize the annotated report PNG (defaults to
+                config.RENDER_OUTPUT_IMAGE); panel geometry is always returned
+                and render_report() can draw an approximate PNG later
+            user_image: Already decoded user image; skips loading it from
+                user_image_path
+            ground_sample_distance: Metres per pixel of the user image, if
+                known; sizes processing when adaptive resolution is enabled
+            deadline: Time budget in seconds. Stages are then sized to fit
+                what is left: lower processing resolution, approximate or
+                skipped satellite comparison and no report rendering, in
+                results['degradations'] with the reasons, plus per-stage
+                timings in results['deadline']. A skipped comparison is left
+                out of the confidence rather than scored as a mismatch.
+                Without a deadline neither key is added
         
         Returns:
             Dictionary with verification results
         """
-        results = {
-            'timestamp': datetime.now().isoformat(),
-            'status': 'PROCESSING',
-            'user_image_path': user_image_path,
-            'satellite_image_path': satellite_image_path,
-            'solar_detected': False,
-            'solar_coverage': 0,
-            'similarity_score': 0,
-            'verification_status': 'REJECTED',
-            'confidence': 0,
-            'output_image_path': None,
-            'message': ''
-        }
+        results = self._new_results(user_image_path, satellite_image_path)
+
+        if render is None:
+            render = config.RENDER_OUTPUT_IMAGE
+        profiler = MemoryProfiler(enabled=self.profile_memory)
+        budget = Deadline(deadline)
+        has_satellite = bool(satellite_image_path) and os.path.exists(satellite_image_path)
+        similarity_future = None
+        # Unrounded features: decisions and the feature store use these, the
+        # rounded copies in results are for display
+        raw = {'coverage': 0.0, 'similarity': 0.0}
 
         try:
+            # Reject hopeless images from a thumbnail before decoding them fully
+            if config.PRESCREEN_ENABLED:
+                with profiler.stage('prescreen'), budget.stage('prescreen'):
+                    if user_image is None:
+                        thumbnail, original_size = load_thumbnail(user_image_path)
+                    else:
+                        thumbnail, original_size = thumbnail_of(user_image)
+                    if thumbnail is not None:
+                        results['prescreen'] = prescreen(thumbnail, original_size)
+                if 'prescreen' in results and not results['prescreen']['passed']:
+                    results['verification_status'] = 'REJECTED'
+                    results['message'] = REASON_MESSAGES[results['prescreen']['reason']]
+                    results['status'] = 'COMPLETED'
+                    return results
+
             # Load user image
-            user_image = self.processor.load_image(user_image_path)
+            if user_image is None:
+                with profiler.stage('load'), budget.stage('load'):
+                    user_image = self._load(user_image_path)
             if user_image is None:
                 results['status'] = 'ERROR'
                 results['message'] = 'Failed to load user image'
                 return results
 
+            max_dim, compare_mode = None, 'full'
+            if budget.enabled:
+                max_dim, compare_mode = self._plan_budget(budget, user_image.shape, has_satellite)
+                if has_satellite and compare_mode != 'skip' and self._comparison_abandoned():
+                    # The last comparison overran its deadline and its cost is
+                    # not known yet; skip rather than start another
+                    compare_mode = 'skip'
+                    budget.degrade('compare', 'skipped_comparison',
+                                   'an earlier overdue comparison is still running')
+            compare_side = config.DEADLINE_APPROX_COMPARE_SIZE if compare_mode == 'approximate' else None
+
+            # Look for earlier submissions of the same photo
+            with profiler.stage('hash'), budget.stage('hash'):
+                self._check_duplicates(user_image, user_image_path, results)
+
             # Preprocess image
-            processed_image = self.processor.preprocess_image(user_image)
+            with profiler.stage('preprocess'), budget.stage('preprocess'):
+                processed_image = self._preprocess(user_image_path, user_image,
+                                                   ground_sample_distance, max_dim)
 
             # Detect solar panels
-            solar_panels, mask = self.processor.detect_solar_panels(processed_image)
+            with profiler.stage('detect'), budget.stage('detect'):
+                solar_panels, mask = self.processor.detect_solar_panels(
+                    processed_image, self.buffers,
+                    self.processor.scaled_kernel_size(processed_image.shape, user_image.shape)
+                )
+            self.stage_costs.update('detect', processed_image.shape[0] * processed_image.shape[1],
+                                    budget.timings['preprocess'] + budget.timings['detect'])
+
+            # Images without panels are rejected without a comparison. Otherwise
+            # the comparison runs on a background thread while coverage, the
+            # mask and the report image are prepared here, unless an abandoned
+            # one is still running (it then runs inline below)
+            if (len(solar_panels) > 0 and has_satellite and compare_mode != 'skip'
+                    and self.concurrent_satellite and not self._comparison_abandoned()):
+                similarity_future = self._satellite_thread().submit(
+                    self._compare_satellite, satellite_image_path, user_image, compare_side
+                )
+
+            # Report geometry in original image coordinates
+            height, width = user_image.shape[:2]
+            results['image_size'] = [width, height]
+            solar_panels = self.processor.scale_contours(
+                solar_panels,
+                width / processed_image.shape[1],
+                height / processed_image.shape[0]
+            )
+            results['panels'] = self.processor.panel_geometry(solar_panels)
+            if self.low_memory:
+                # The preprocessed image is not needed past detection
+                processed_image = None
+            if config.SAVE_DETECTION_MASKS:
+                results['mask_path'] = self._save_mask(mask)
             
             if len(solar_panels) == 0:
                 results['solar_detected'] = False
@@ -73,39 +198,93 @@ class SolarPanelVerifier:
             results['solar_detected'] = True
 
             # Calculate solar coverage
-            coverage = self.processor.calculate_solar_coverage(mask)
-            results['solar_coverage'] = round(coverage, 2)
+            with profiler.stage('coverage'), budget.stage('coverage'):
+                coverage = self.processor.calculate_solar_coverage(mask)
+            # Python's round on a float, as verify_batch does; round() on a
+            # NumPy scalar rounds some halves the other way
+            raw['coverage'] = float(coverage)
+            results['solar_coverage'] = round(raw['coverage'], 2)
+            if self.low_memory:
+                mask = None
+
+            # All of the report image but its text is known already, so draw
+            # it while the comparison runs (if rendering still fits the budget)
+            canvas = None
+            if (render and similarity_future is not None and
+                    self.stage_costs.estimate('render', height * (width + 300)) <= budget.available()):
+                with profiler.stage('render'), budget.stage('render'):
+                    canvas = self._annotated_canvas(user_image, solar_panels)
 
             # If satellite image provided, compare
-            if satellite_image_path and os.path.exists(satellite_image_path):
-                satellite_image = self.processor.load_image(satellite_image_path)
-                if satellite_image is not None:
-                    similarity = self.processor.compare_images(user_image, satellite_image)
-                    results['similarity_score'] = round(similarity, 3)
-                else:
-                    results['similarity_score'] = 0
+            if has_satellite:
+                with profiler.stage('compare'), budget.stage('compare'):
+                    similarity = None
+                    skipped = compare_mode == 'skip'
+                    if similarity_future is not None:
+                        try:
+                            similarity = similarity_future.result(
+                                timeout=max(0, budget.available()) if budget.enabled else None
+                            )
+                        except FutureTimeoutError:
+                            skipped = True
+                            budget.degrade('compare', 'skipped_comparison',
+                                           'comparison not finished when the deadline was reached')
+                            self._abandon_satellite_thread(similarity_future)
+                    elif not skipped:
+                        # Behind schedule: fall back to the approximate comparison, or none
+                        approximate_side = config.DEADLINE_APPROX_COMPARE_SIZE
+                        if (compare_side is None and budget.available()
+                                < self._compare_cost(user_image.shape, None)):
+                            compare_side = approximate_side
+                            budget.degrade('compare', 'approximate_comparison',
+                                           'behind schedule at the comparison', max_side=approximate_side)
+                        if budget.available() < self._compare_cost(user_image.shape, compare_side):
+                            skipped = True
+                            budget.degrade('compare', 'skipped_comparison',
+                                           'behind schedule at the comparison')
+                        else:
+                            similarity = self._compare_satellite(satellite_image_path, user_image,
+                                                                 compare_side)
+                    if similarity is not None:
+                        raw['similarity'] = float(similarity)
+                        results['similarity_score'] = round(raw['similarity'], 3)
+                    elif skipped:
+                        # Not measured for lack of time rather than a mismatch:
+                        # confidence is scored on the other features
+                        raw['similarity'] = float('nan')
+                        results['similarity_score'] = None
 
             # Determine verification status
-            confidence = self._calculate_confidence(
-                results['solar_coverage'],
-                results['similarity_score'],
+            confidence, status = self.decide(
+                raw['coverage'],
+                raw['similarity'],
                 len(solar_panels)
             )
 
-            results['confidence'] = round(confidence, 3)
+            raw['confidence'] = float(confidence)
+            results['confidence'] = round(raw['confidence'], 3)
+            results['verification_status'] = status
 
-            if confidence >= config.MIN_CONFIDENCE_THRESHOLD:
-                results['verification_status'] = 'APPROVED'
+            if status == 'APPROVED':
                 results['message'] = f'Solar installation verified successfully (Confidence: {confidence:.1%})'
             else:
-                results['verification_status'] = 'REJECTED'
                 results['message'] = f'Solar installation verification failed (Confidence: {confidence:.1%})'
 
             # Generate output image
-            output_image_path = self._generate_output_image(
-                user_image, processed_image, solar_panels, mask, results
-            )
-            results['output_image_path'] = output_image_path
+            if render and budget.enabled:
+                estimate = self.stage_costs.estimate('render', height * (width + 300))
+                if estimate > budget.available():
+                    render = False
+                    budget.degrade('render', 'skipped_render',
+                                   f"rendering estimated at {estimate:.2f}s, "
+                                   f"{max(0, budget.available()):.2f}s left")
+            if render:
+                with profiler.stage('render'), budget.stage('render'):
+                    output_image_path = self._generate_output_image(
+                        user_image, processed_image, solar_panels, mask, results, canvas
+                    )
+                results['output_image_path'] = output_image_path
+                self.stage_costs.update('render', height * (width + 300), budget.timings['render'])
 
             results['status'] = 'COMPLETED'
 
@@ -113,30 +292,484 @@ class SolarPanelVerifier:
             results['status'] = 'ERROR'
             results['message'] = str(e)
 
+        finally:
+            if similarity_future is not None:
+                # Not needed after an early return; drop it if it has not started
+                similarity_future.cancel()
+            if budget.enabled:
+                results['degradations'] = budget.degradations
+                results['deadline'] = budget.report()
+            if self.profile_memory:
+                results['memory_report'] = profiler.report()
+            if self.feature_store is not None:
+                self.feature_store.append(results, raw=raw)
+
         return results
 
-    def _calculate_confidence(self, coverage, similarity, panel_count):
+    @staticmethod
+    def _new_results(user_image_path, satellite_image_path):
+        """Results dictionary of a verification that has not run yet"""
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'status': 'PROCESSING',
+            'user_image_path': user_image_path,
+            'satellite_image_path': satellite_image_path,
+            'solar_detected': False,
+            'solar_coverage': 0,
+            'similarity_score': 0,
+            'verification_status': 'REJECTED',
+            'confidence': 0,
+            'output_image_path': None,
+            'image_size': None,
+            'panels': [],
+            'perceptual_hash': None,
+            'duplicate_matches': [],
+            'duplicate_check': 'disabled',
+            'message': ''
+        }
+
+    def verify_batch(self, user_image_paths, satellite_image_paths=None):
+        """
+        Verify many images, vectorizing detection across same-sized images
+
+        Meant for large numbers of small images, where per-image call and
+        allocation overhead dominates. Decisions match verify_installation;
+        report PNGs are not rendered (see render_report), and images are
+        processed at the default size.
+
+        Args:
+            user_image_paths: List of user image paths
+            satellite_image_paths: Optional list of satellite paths (or None
+                entries), parallel to user_image_paths; a list of another
+                length raises ValueError
+
+        Returns:
+            List of results dictionaries, in input order
+        """
+        satellite_image_paths = satellite_image_paths or [None] * len(user_image_paths)
+        if len(satellite_image_paths) != len(user_image_paths):
+            raise ValueError(f"{len(user_image_paths)} user image(s) but "
+                             f"{len(satellite_image_paths)} satellite image(s)")
+        batch = [self._new_results(user, satellite)
+                 for user, satellite in zip(user_image_paths, satellite_image_paths)]
+
+        # Load, pre-screen and hash per image; collect the rest for detection
+        pending = []
+        images = []
+        raw = [{'coverage': 0.0, 'similarity': 0.0} for _ in batch]
+        pending_raw = []
+        for results, features in zip(batch, raw):
+            try:
+                image = self._load(results['user_image_path'])
+                if image is None:
+                    results['status'] = 'ERROR'
+                    results['message'] = 'Failed to load user image'
+                    continue
+                if config.PRESCREEN_ENABLED:
+                    results['prescreen'] = prescreen(*thumbnail_of(image))
+                    if not results['prescreen']['passed']:
+                        results['message'] = REASON_MESSAGES[results['prescreen']['reason']]
+                        results['status'] = 'COMPLETED'
+                        continue
+                self._check_duplicates(image, results['user_image_path'], results)
+                pending.append(results)
+                images.append(image)
+                pending_raw.append(features)
+            except Exception as e:
+                results['status'] = 'ERROR'
+                results['message'] = str(e)
+
+        if pending:
+            self._score_batch(pending, images, pending_raw)
+
+        if self.feature_store is not None:
+            for results, features in zip(batch, raw):
+                self.feature_store.append(results, raw=features)
+        return batch
+
+    def _score_batch(self, pending, images, raw):
+        """
+        Detect panels in loaded images as one batch and score each
+
+        An image whose detection or comparison fails gets an ERROR result,
+        as in verify_installation; the other images are still scored.
+
+        Args:
+            pending: Results dictionaries of the images, filled in place
+            images: Decoded user images, parallel to pending
+            raw: Dictionaries receiving each image's unrounded coverage,
+                similarity and confidence, parallel to pending
+        """
+        try:
+            processed = self.processor.preprocess_batch(images)
+            detections = self.processor.detect_solar_panels_batch(processed)
+        except Exception:
+            # Some image broke the stacked pass; detect image by image so the
+            # error is reported against that image only
+            processed, detections = [], []
+            for image in images:
+                try:
+                    small = self.processor.preprocess_batch([image])
+                    detections.append(self.processor.detect_solar_panels_batch(small)[0])
+                    processed.append(small[0])
+                except Exception as e:
+                    detections.append(e)
+                    processed.append(None)
+
+        failed = [isinstance(detection, Exception) for detection in detections]
+        coverage = np.zeros(len(pending))
+        detected = [i for i, error in enumerate(failed) if not error]
+        coverage[detected] = self.processor.calculate_solar_coverage_batch(
+            [detections[i][1] for i in detected])
+
+        panel_counts = np.zeros(len(pending))
+        for i, (results, image, small, detection) in enumerate(
+                zip(pending, images, processed, detections)):
+            try:
+                if failed[i]:
+                    raise detection
+                solar_panels = detection[0]
+                height, width = image.shape[:2]
+                results['image_size'] = [width, height]
+                solar_panels = self.processor.scale_contours(
+                    solar_panels, width / small.shape[1], height / small.shape[0]
+                )
+                results['panels'] = self.processor.panel_geometry(solar_panels)
+                panel_counts[i] = len(solar_panels)
+                if not solar_panels:
+                    continue
+
+                results['solar_detected'] = True
+                raw[i]['coverage'] = float(coverage[i])
+                results['solar_coverage'] = round(raw[i]['coverage'], 2)
+                satellite_image_path = results['satellite_image_path']
+                if satellite_image_path and os.path.exists(satellite_image_path):
+                    similarity = self.satellite_cache.compare(satellite_image_path, image)
+                    if similarity is not None:
+                        raw[i]['similarity'] = float(similarity)
+                    results['similarity_score'] = round(raw[i]['similarity'], 3)
+            except Exception as e:
+                failed[i] = True
+                panel_counts[i] = 0
+                results['status'] = 'ERROR'
+                results['message'] = str(e)
+
+        confidences, statuses = self.decide_batch(
+            np.array([features['coverage'] for features in raw]),
+            np.array([features['similarity'] for features in raw]),
+            panel_counts
+        )
+        for results, features, confidence, status, error in zip(
+                pending, raw, confidences, statuses, failed):
+            if error:
+                continue
+            results['status'] = 'COMPLETED'
+            if not results['solar_detected']:
+                results['message'] = 'No solar panels detected in the image'
+                continue
+            features['confidence'] = float(confidence)
+            results['confidence'] = round(features['confidence'], 3)
+            results['verification_status'] = str(status)
+            if status == 'APPROVED':
+                results['message'] = f'Solar installation verified successfully (Confidence: {confidence:.1%})'
+            else:
+                results['message'] = f'Solar installation verification failed (Confidence: {confidence:.1%})'
+
+    def _plan_budget(self, budget, image_shape, has_satellite):
+        """
+        Choose the processing size and comparison mode that fit the time left
+
+        The satellite comparison is approximated before the resolution is
+        lowered, and skipped only when detection at the smallest allowed
+        size leaves no time for it. Applied degradations are recorded on
+        the budget.
+
+        Args:
+            budget: Deadline of the verification
+            image_shape: Shape of the decoded user image
+            has_satellite: Whether a satellite comparison was requested
+
+        Returns:
+            Tuple of (max_dim for preprocessing or None, comparison mode:
+            'full', 'approximate' or 'skip')
+        """
+        height, width = image_shape[:2]
+        longest = max(height, width)
+        full_side = min(DEFAULT_MAX_DIM, longest)
+        min_side = min(config.DEADLINE_MIN_SIZE, full_side)
+        available = budget.available()
+
+        def detect_cost(side):
+            return self.stage_costs.estimate('detect', height * width * (side / longest) ** 2)
+
+        def fitting_side(seconds):
+            # Detection cost grows with the square of the processing side
+            side = full_side * (max(0.0, seconds) / max(detect_cost(full_side), 1e-9)) ** 0.5
+            return int(max(min_side, min(full_side, side)))
+
+        compare_cost = {'full': 0.0, 'approximate': 0.0}
+        if has_satellite:
+            compare_cost['full'] = self._compare_cost(image_shape, None)
+            compare_cost['approximate'] = self._compare_cost(image_shape, config.DEADLINE_APPROX_COMPARE_SIZE)
+
+        for mode in ('full', 'approximate'):
+            if detect_cost(full_side) + compare_cost[mode] <= available:
+                if mode == 'approximate':
+                    budget.degrade('compare', 'approximate_comparison',
+                                   f"full comparison estimated at {compare_cost['full']:.2f}s, "
+                                   f"{available - detect_cost(full_side):.2f}s left after detection",
+                                   max_side=config.DEADLINE_APPROX_COMPARE_SIZE)
+                return None, mode
+
+        mode = 'approximate' if has_satellite else 'full'
+        if has_satellite and detect_cost(min_side) + compare_cost['approximate'] > available:
+            mode = 'skip'
+            budget.degrade('compare', 'skipped_comparison',
+                           f"{max(0, available):.2f}s left is not enough for detection at "
+                           f"{min_side}px and an approximate comparison")
+        elif has_satellite:
+            budget.degrade('compare', 'approximate_comparison',
+                           f"full comparison estimated at {compare_cost['full']:.2f}s, "
+                           f"{max(0, available):.2f}s left", max_side=config.DEADLINE_APPROX_COMPARE_SIZE)
+
+        side = fitting_side(available - compare_cost.get(mode, 0.0))
+        if side < full_side:
+            budget.degrade('preprocess', 'reduced_resolution',
+                           f"detection at {full_side}px estimated at {detect_cost(full_side):.2f}s, "
+                           f"{max(0, available):.2f}s left", max_dim=side)
+            return side, mode
+        return None, mode
+
+    @staticmethod
+    def _compare_pixels(image_shape, max_side):
+        """User-side pixels of a comparison (an upper bound; the satellite may be smaller)"""
+        height, width = image_shape[:2]
+        scale = min(1.0, max_side / max(height, width)) if max_side else 1.0
+        return height * width * scale ** 2
+
+    def _compare_cost(self, image_shape, max_side):
+        """Estimated seconds of a satellite comparison"""
+        return self.stage_costs.estimate('compare', self._compare_pixels(image_shape, max_side))
+
+    def _compare_satellite(self, satellite_image_path, image, max_side=None):
+        """Compare with the satellite image and refine the comparison cost estimate"""
+        start = time.perf_counter()
+        similarity = self.satellite_cache.compare(satellite_image_path, image, max_side)
+        # Satellite decoding dominates approximate comparisons, which would
+        # inflate the per-pixel cost, so only full comparisons refine it
+        if max_side is None:
+            self.stage_costs.update('compare', self._compare_pixels(image.shape, None),
+                                    time.perf_counter() - start)
+        return similarity
+
+    def _satellite_thread(self):
+        """Single background thread for satellite comparisons, started on first use"""
+        if self._satellite_executor is None:
+            self._satellite_executor = ThreadPoolExecutor(1, thread_name_prefix='satellite')
+        return self._satellite_executor
+
+    def _abandon_satellite_thread(self, future):
+        """
+        Leave an overdue comparison to finish on its own
+
+        A started comparison cannot be interrupted. Its thread is shut down
+        once the work ends, and later verifications get a fresh thread
+        instead of queueing behind it. While it is still running they skip
+        the comparison, or run it inline without a deadline (see
+        _comparison_abandoned), so at most one abandoned thread exists per
+        verifier.
+
+        Args:
+            future: Future of the overdue comparison
+        """
+        executor, self._satellite_executor = self._satellite_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        self._abandoned.append(future)
+
+    def _comparison_abandoned(self):
+        """Whether an abandoned comparison is still running"""
+        self._abandoned = [future for future in self._abandoned if not future.done()]
+        return bool(self._abandoned)
+
+    def _get_hash_index(self):
+        """Return the perceptual-hash index, opening the configured one on first use"""
+        if self.hash_index is None and config.PHASH_INDEX_PATH:
+            self.hash_index = PerceptualHashIndex(config.PHASH_INDEX_PATH)
+        return self.hash_index
+
+    def _check_duplicates(self, image, image_path, results):
+        """
+        Hash the user image, record matches of earlier submissions and index it
+
+        results['duplicate_check'] is 'checked' when the index was consulted
+        and 'unavailable' when it could not be (e.g. locked for longer than
+        config.PHASH_INDEX_TIMEOUT); it stays 'disabled' without an index.
+        """
+        value = self.processor.perceptual_hash(image)
+        results['perceptual_hash'] = f"{value:016x}"
+
+        if self.hash_index is None and not config.PHASH_INDEX_PATH:
+            return
+
+        record = os.path.abspath(image_path)
+        try:
+            index = self._get_hash_index()
+            matches = index.query(value)
+            index.add(value, record)
+        except sqlite3.Error as e:
+            print(f"Error accessing hash index: {e}")
+            results['duplicate_check'] = 'unavailable'
+            return
+
+        results['duplicate_check'] = 'checked'
+        # Re-verifying the same file is not a reuse
+        results['duplicate_matches'] = [m for m in matches if m['record'] != record]
+
+    def _load(self, image_path):
+        """Decode an image, through the image cache if one is configured"""
+        if self.image_cache is not None:
+            return self.image_cache.load_image(image_path)
+        return self.processor.load_image(image_path)
+
+    def _preprocess(self, image_path, image, ground_sample_distance=None, max_dim=None):
+        """
+        Preprocess a decoded image, through the image cache if one is configured
+
+        With config.ADAPTIVE_RESOLUTION the processing size is estimated per
+        image instead of using the default cap. max_dim caps the size further.
+        """
+        if config.ADAPTIVE_RESOLUTION:
+            adaptive = self.processor.estimate_processing_size(image, ground_sample_distance)
+            max_dim = min(max_dim or adaptive, adaptive)
+        if self.image_cache is not None and image_path and os.path.exists(image_path):
+            return self.image_cache.load_preprocessed(image_path, image, max_dim)
+        return self.processor.preprocess_image(image, self.buffers, max_dim)
+
+    def extract_features(self, user_image_path, satellite_image_path=None,
+                         ground_sample_distance=None):
+        """
+        Run detection and comparison without scoring or rendering
+        
+        Args:
+            user_image_path: Path to user-uploaded home image
+            satellite_image_path: Path to satellite image (optional)
+            ground_sample_distance: Metres per pixel of the user image, if known
+        
+        Returns:
+            Dictionary of unrounded features, as verify_installation decides
+            from, or None if the user image cannot be loaded
+        """
+        user_image = self._load(user_image_path)
+        if user_image is None:
+            return None
+
+        processed_image = self._preprocess(user_image_path, user_image, ground_sample_distance)
+        solar_panels, mask = self.processor.detect_solar_panels(
+            processed_image, self.buffers,
+            self.processor.scaled_kernel_size(processed_image.shape, user_image.shape)
+        )
+
+        features = {
+            'image_size': [user_image.shape[1], user_image.shape[0]],
+            'panel_count': len(solar_panels),
+            'solar_coverage': 0,
+            'similarity_score': 0,
+        }
+        if len(solar_panels) == 0:
+            return features
+
+        features['solar_coverage'] = float(self.processor.calculate_solar_coverage(mask))
+
+        if satellite_image_path and os.path.exists(satellite_image_path):
+            similarity = self.satellite_cache.compare(satellite_image_path, user_image)
+            if similarity is not None:
+                features['similarity_score'] = float(similarity)
+
+        return features
+
+    @staticmethod
+    def decide(coverage, similarity, panel_count):
+        """
+        Score features and apply the approval threshold
+        
+        Args:
+            coverage: Solar panel coverage percentage
+            similarity: Image similarity score (0-1), or NaN if not measured
+            panel_count: Number of panels detected
+        
+        Returns:
+            Tuple of (confidence, verification_status)
+        """
+        if panel_count == 0:
+            return 0, 'REJECTED'
+
+        confidence = SolarPanelVerifier._calculate_confidence(coverage, similarity, panel_count)
+        if confidence >= config.MIN_CONFIDENCE_THRESHOLD:
+            return confidence, 'APPROVED'
+        return confidence, 'REJECTED'
+
+    @staticmethod
+    def decide_batch(coverage, similarity, panel_count, weights=None, threshold=None):
+        """
+        Vectorized decide() over arrays of features
+
+        Args:
+            coverage, similarity, panel_count: Feature arrays
+            weights: Confidence weights (defaults to config.CONFIDENCE_WEIGHTS)
+            threshold: Approval threshold (defaults to config.MIN_CONFIDENCE_THRESHOLD)
+
+        Returns:
+            Tuple of (confidence array, status array)
+        """
+        panel_count = np.asarray(panel_count)
+        confidence = np.where(
+            panel_count > 0,
+            SolarPanelVerifier._calculate_confidence(np.asarray(coverage, dtype=np.float64),
+                                                     np.asarray(similarity, dtype=np.float64),
+                                                     panel_count, weights),
+            0.0
+        )
+        if threshold is None:
+            threshold = config.MIN_CONFIDENCE_THRESHOLD
+        approved = (panel_count > 0) & (confidence >= threshold)
+        return confidence, np.where(approved, 'APPROVED', 'REJECTED')
+
+    def release_buffers(self):
+        """Free the low-memory mode buffers until the next verification"""
+        if self.buffers is not None:
+            self.buffers.release()
+
+    @staticmethod
+    def _calculate_confidence(coverage, similarity, panel_count, weights=None):
         """
         Calculate confidence score for verification
         
         Args:
             coverage: Solar panel coverage percentage
-            similarity: Image similarity score (0-1)
+            similarity: Image similarity score (0-1), or NaN if the comparison
+                was skipped to meet a deadline
             panel_count: Number of panels detected
+            weights: Dictionary of 'coverage', 'similarity' and 'panels'
+                weights (defaults to config.CONFIDENCE_WEIGHTS)
         
+        Scalars or NumPy arrays are accepted, so calibration and re-scoring
+        tools can score many cases at once.
+
         Returns:
             Confidence score between 0 and 1
         """
         # Weight factors
-        coverage_weight = 0.4
-        similarity_weight = 0.3
-        panel_weight = 0.3
+        weights = weights or config.CONFIDENCE_WEIGHTS
+        coverage_weight = weights['coverage']
+        similarity_weight = weights['similarity']
+        panel_weight = weights['panels']
 
         # Normalize coverage (0-10% gives 0, >5% gives higher score)
-        coverage_score = min(1.0, coverage / 10.0)
+        coverage_score = np.minimum(1.0, coverage / 10.0)
 
         # Panel detection score
-        panel_score = min(1.0, panel_count / 5.0)
+        panel_score = np.minimum(1.0, panel_count / 5.0)
 
         # Calculate weighted confidence
         confidence = (
@@ -145,22 +778,88 @@ class SolarPanelVerifier:
             panel_score * panel_weight
         )
 
+        # A NaN similarity marks a comparison skipped for time; those are
+        # scored on coverage and panels alone, with their weights rescaled
+        missing = np.isnan(similarity)
+        if np.any(missing):
+            partial = (coverage_score * coverage_weight + panel_score * panel_weight) / (
+                coverage_weight + panel_weight)
+            if np.ndim(missing) == 0:
+                return partial
+            confidence = np.where(missing, partial, confidence)
+
         return confidence
 
-    def _generate_output_image(self, original, processed, panels, mask, results):
+    def render_report(self, results, image=None):
+        """
+        Rasterize an annotated report PNG for earlier verification results
+
+        The panels are drawn from the geometry in the results, so
+        verification can skip rendering entirely. Results keep only the
+        simplified panel polygons, not the detected contours, so outlines
+        and bounding rectangles can differ by a few pixels from the PNG
+        rendered during verification; the report text is the same.
+
+        Args:
+            results: Dictionary returned by verify_installation
+            image: Decoded user image (reloaded from the results' path if omitted)
+
+        Returns:
+            Path to output image, or None if the user image cannot be loaded
+        """
+        if image is None:
+            image = self._load(results['user_image_path'])
+        if image is None:
+            return None
+
+        panels = [np.array(panel['polygon'], dtype=np.int32).reshape(-1, 1, 2)
+                  for panel in results.get('panels', [])]
+        output_image_path = self._generate_output_image(image, None, panels, None, results)
+        results['output_image_path'] = output_image_path
+        return output_image_path
+
+    @staticmethod
+    def _save_mask(mask):
+        """
+        Store a detection mask for audit
+
+        Returns:
+            Path to the mask file (at processing resolution)
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        mask_path = os.path.join(config.OUTPUT_DIR, f"mask_{timestamp}.npz")
+        save_mask(mask_path, mask)
+        return mask_path
+
+    def _annotated_canvas(self, original, panels):
+        """Report composite with the panels drawn and the info panel not yet filled"""
+        height, width = original.shape[:2]
+        if self.low_memory:
+            # Draw straight into the composite; the info panel is filled later
+            output = np.empty((height, width + 300, 3), dtype=np.uint8)
+            output[:, :width] = original
+            self.processor.draw_solar_panels(output, panels, in_place=True)
+        else:
+            # Draw solar panels
+            annotated = self.processor.draw_solar_panels(original, panels)
+
+            # Create composite image
+            output = np.zeros((height, width + 300, 3), dtype=np.uint8)
+            output[:, :width] = annotated
+        return output
+
+    def _generate_output_image(self, original, processed, panels, mask, results, canvas=None):
         """
         Generate output image with annotations
+
+        Args:
+            canvas: Composite from _annotated_canvas, if already drawn
         
         Returns:
             Path to output image
         """
-        # Draw solar panels
-        annotated = self.processor.draw_solar_panels(original, panels)
-
-        # Create composite image
-        height, width = annotated.shape[:2]
-        output = np.zeros((height, width + 300, 3), dtype=np.uint8)
-        output[:, :width] = annotated
+        height, width = original.shape[:2]
+        output = canvas if canvas is not None else self._annotated_canvas(original, panels)
 
         # Add text information
         info_x = width + 10
@@ -190,7 +889,8 @@ class SolarPanelVerifier:
         cv2.putText(output, f"Panels: {len(panels)}", (info_x, info_y), font, font_scale, font_color, 1)
 
         # Save output image
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microseconds keep reports rendered within the same second apart
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         output_path = os.path.join(
             config.OUTPUT_DIR,
             f"verification_{timestamp}.png"
@@ -0,0 +1,275 @@
+"""
+Streaming verification of rooftop videos and drone footage
+
+Frames are decoded lazily by a generator, near-duplicate frames are skipped
+with a difference hash, and the remaining keyframes flow through a bounded
+queue to detection threads (OpenCV releases the GIL). Only running totals and
+the single best keyframe are kept, so memory stays flat however long the
+video is. Evidence from all keyframes is combined into one verification
+result shaped like SolarPanelVerifier.verify_installation's.
+
+Usage:
+    python video_ingest.py VIDEO [--satellite-image PATH]
+"""
+
+import os
+import json
+import queue
+import argparse
+import threading
+import cv2
+import numpy as np
+from hash_index import hamming_distance
+from image_processor import ImageProcessor
+from verifier import SolarPanelVerifier
+import config
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm')
+
+
+def is_video_file(path):
+    """Whether a path looks like a video file"""
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def iter_frames(video_path, stride=None):
+    """
+    Lazily decode frames from a video
+
+    Skipped frames are grabbed without being converted to images.
+
+    Args:
+        video_path: Video file path
+        stride: Decode every n-th frame (defaults to config.VIDEO_FRAME_STRIDE)
+
+    Yields:
+        Tuples of (frame index, BGR frame)
+    """
+    stride = stride or config.VIDEO_FRAME_STRIDE
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+
+    try:
+        index = 0
+        while capture.grab():
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield index, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def select_keyframes(frames, min_distance=None, max_keyframes=None):
+    """
+    Drop frames that look like the last kept frame
+
+    Args:
+        frames: Iterable of (index, frame)
+        min_distance: dHash Hamming distance a frame needs from the last
+            keyframe to be kept (defaults to config.VIDEO_MIN_HASH_DISTANCE)
+        max_keyframes: Stop after this many keyframes (defaults to
+            config.VIDEO_MAX_KEYFRAMES; None for no limit)
+
+    Yields:
+        Tuples of (frame index, BGR frame)
+    """
+    min_distance = config.VIDEO_MIN_HASH_DISTANCE if min_distance is None else min_distance
+    max_keyframes = config.VIDEO_MAX_KEYFRAMES if max_keyframes is None else max_keyframes
+    last_hash = None
+    kept = 0
+
+    for index, frame in frames:
+        frame_hash = ImageProcessor.difference_hash(frame)
+        if last_hash is not None and hamming_distance(frame_hash, last_hash) < min_distance:
+            continue
+        last_hash = frame_hash
+        yield index, frame
+        kept += 1
+        if max_keyframes and kept >= max_keyframes:
+            return
+
+
+class _EvidenceAggregator:
+    """Running summary of per-keyframe detections"""
+
+    def __init__(self):
+        self.frames = 0
+        self.frames_with_panels = 0
+        self.coverages = []
+        self.max_panels = 0
+        self.best = None
+
+    def add(self, index, frame, panels, coverage):
+        """Fold one keyframe's detection into the summary"""
+        self.frames += 1
+        if not panels:
+            return
+
+        self.frames_with_panels += 1
+        self.coverages.append(coverage)
+        self.max_panels = max(self.max_panels, len(panels))
+
+        score = (len(panels), coverage)
+        if self.best is None or score > self.best[0]:
+            self.best = (score, index, frame, panels)
+
+
+def _detection_worker(frames_queue, results_queue):
+    """Detect panels in keyframes until the end-of-stream marker arrives"""
+    processor = ImageProcessor()
+    while True:
+        item = frames_queue.get()
+        if item is None:
+            results_queue.put(None)
+            return
+
+        index, frame = item
+        try:
+            processed = processor.preprocess_image(frame)
+            panels, mask = processor.detect_solar_panels(processed)
+            coverage = processor.calculate_solar_coverage(mask)
+            # Keep the overlay aligned with contours found at processing size
+            if processed.shape[:2] != frame.shape[:2]:
+                frame = cv2.resize(frame, (processed.shape[1], processed.shape[0]))
+            results_queue.put((index, frame, panels, coverage, None))
+        except Exception as e:
+            results_queue.put((index, None, [], 0, str(e)))
+
+
+def verify_video(video_path, satellite_image_path=None, verifier=None, workers=None, render=None):
+    """
+    Verify a solar installation from a video
+
+    Args:
+        video_path: Path to the rooftop video or drone footage
+        satellite_image_path: Path to satellite image (optional)
+        verifier: SolarPanelVerifier used for scoring and rendering
+        workers: Detection threads (defaults to config.VIDEO_DETECT_WORKERS)
+        render: Rasterize the annotated report PNG of the best frame
+            (defaults to config.RENDER_OUTPUT_IMAGE)
+
+    Returns:
+        Dictionary with verification results and a 'video' evidence summary;
+        its 'keyframes_truncated' is set when frames after the last of
+        config.VIDEO_MAX_KEYFRAMES keyframes were not examined
+    """
+    verifier = verifier or SolarPanelVerifier()
+    workers = workers or config.VIDEO_DETECT_WORKERS
+    if render is None:
+        render = config.RENDER_OUTPUT_IMAGE
+    results = SolarPanelVerifier._new_results(video_path, satellite_image_path)
+
+    frames_queue = queue.Queue(maxsize=config.VIDEO_QUEUE_SIZE)
+    results_queue = queue.Queue(maxsize=config.VIDEO_QUEUE_SIZE)
+    decode_error = []
+    truncated = []
+
+    def decode():
+        frames = iter_frames(video_path)
+        try:
+            for item in select_keyframes(frames):
+                frames_queue.put(item)
+            # select_keyframes stops at the keyframe limit; any frame left
+            # means the rest of the video was not examined
+            if next(frames, None) is not None:
+                truncated.append(True)
+        except Exception as e:
+            decode_error.append(str(e))
+        finally:
+            frames.close()
+            for _ in range(workers):
+                frames_queue.put(None)
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=_detection_worker, args=(frames_queue, results_queue), daemon=True)
+                for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    evidence = _EvidenceAggregator()
+    errors = []
+    finished = 0
+    while finished < workers:
+        item = results_queue.get()
+        if item is None:
+            finished += 1
+            continue
+        index, frame, panels, coverage, error = item
+        if error:
+            errors.append(error)
+        else:
+            evidence.add(index, frame, panels, coverage)
+
+    for thread in threads:
+        thread.join()
+
+    fraction = evidence.frames_with_panels / evidence.frames if evidence.frames else 0
+    results['video'] = {
+        'keyframes_analyzed': evidence.frames,
+        'keyframes_truncated': bool(truncated),
+        'keyframes_with_panels': evidence.frames_with_panels,
+        'panel_frame_fraction': round(fraction, 3),
+        'max_panels_in_frame': evidence.max_panels,
+        'best_frame_index': evidence.best[1] if evidence.best else None,
+        'frame_errors': len(errors),
+    }
+
+    if decode_error or evidence.frames == 0:
+        results['status'] = 'ERROR'
+        results['message'] = decode_error[0] if decode_error else 'No frames could be decoded'
+        return results
+
+    if evidence.best is None or fraction < config.VIDEO_MIN_PANEL_FRAME_FRACTION:
+        results['status'] = 'COMPLETED'
+        results['message'] = 'No consistent solar panel evidence across video frames'
+        return results
+
+    results['solar_detected'] = True
+    # Decide on unrounded values, as verify_installation does
+    coverage = float(np.median(evidence.coverages))
+    similarity = 0.0
+    results['solar_coverage'] = round(coverage, 2)
+
+    _, best_index, best_frame, best_panels = evidence.best
+    results['image_size'] = [best_frame.shape[1], best_frame.shape[0]]
+    results['panels'] = ImageProcessor.panel_geometry(best_panels)
+    if satellite_image_path and os.path.exists(satellite_image_path):
+        compared = verifier.satellite_cache.compare(satellite_image_path, best_frame)
+        if compared is not None:
+            similarity = float(compared)
+        results['similarity_score'] = round(similarity, 3)
+
+    confidence, status = verifier.decide(coverage, similarity, evidence.max_panels)
+    results['confidence'] = round(float(confidence), 3)
+    results['verification_status'] = status
+    if status == 'APPROVED':
+        results['message'] = f'Solar installation verified successfully from video (Confidence: {confidence:.1%})'
+    else:
+        results['message'] = f'Solar installation verification failed (Confidence: {confidence:.1%})'
+
+    if render:
+        results['output_image_path'] = verifier._generate_output_image(
+            best_frame, None, best_panels, None, results
+        )
+    results['status'] = 'COMPLETED'
+    return results
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Verify a solar installation from a video')
+    parser.add_argument('video', help='Path to a rooftop video or drone footage')
+    parser.add_argument('--satellite-image', default=None, help='Path to satellite image (optional)')
+    parser.add_argument('--no-render', action='store_true', help='Skip the annotated report PNG')
+
+    args = parser.parse_args()
+    results = verify_video(args.video, args.satellite_image, render=False if args.no_render else None)
+    print(json.dumps(results, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
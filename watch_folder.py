@@ -0,0 +1,391 @@
+"""
+Watch-folder ingestion daemon
+
+Watches inbox directories for new photos (and videos), waits until each
+file has stopped changing, verifies it in a pool of worker processes and
+moves the input together with its results into a dated archive folder.
+
+File events come from watchdog (inotify, FSEvents, ...) when it is
+installed. Without it the inboxes are polled, and only directories whose
+modification time changed are listed again, so an idle or archived tree
+costs a few stat calls per poll. Processed files are recorded in a
+checkpoint so a restart does not verify files left in the inbox again.
+
+Usage:
+    python watch_folder.py INBOX [INBOX ...] [--archive DIR] [--workers N] [--once]
+"""
+
+import os
+import json
+import time
+import queue
+import shutil
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from autotune import apply_saved_profile, default_workers
+from video_ingest import is_video_file, verify_video, VIDEO_EXTENSIONS
+from verifier import SolarPanelVerifier
+import config
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp')
+
+
+def is_candidate(path):
+    """Whether a file looks like a finished upload worth verifying"""
+    name = os.path.basename(path)
+    if name.startswith('.') or name.endswith(('.tmp', '.part', '.partial', '.crdownload')):
+        return False
+    return name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)
+
+
+class Checkpoint:
+    """Append-only record of processed files keyed by path, size and mtime"""
+
+    def __init__(self, path):
+        """
+        Load the checkpoint
+
+        Args:
+            path: Checkpoint file (created if missing)
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.keys = set()
+        # Lines for files that may have left the inbox; loaded lines are
+        # unchecked, so a long file is compacted soon after a restart
+        self._gone = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    size, mtime, file_path = line.rstrip('\n').split('\t', 2)
+                    self.keys.add((file_path, int(size), int(mtime)))
+                    self._gone += 1
+        self._file = open(path, 'a')
+
+    @staticmethod
+    def key(path, stat):
+        """Checkpoint key of a file"""
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, key, gone=False):
+        """
+        Record a processed file
+
+        Args:
+            key: Checkpoint key of the file
+            gone: The file has already left the inbox (e.g. was archived), so
+                its line only matters until the next compaction
+        """
+        file_path, size, mtime = key
+        self._file.write(f"{size}\t{mtime}\t{file_path}\n")
+        self._file.flush()
+        if gone:
+            self._gone += 1
+        else:
+            self.keys.add(key)
+
+    def compact(self):
+        """Rewrite the checkpoint without files that have left the inbox"""
+        self.keys = {key for key in self.keys if os.path.exists(key[0])}
+        self._file.close()
+        with open(self.path + '.tmp', 'w') as f:
+            for file_path, size, mtime in sorted(self.keys):
+                f.write(f"{size}\t{mtime}\t{file_path}\n")
+        os.replace(self.path + '.tmp', self.path)
+        self._gone = 0
+        self._file = open(self.path, 'a')
+
+    @property
+    def stale(self):
+        """Whether enough lines are for files gone from the inbox to rewrite the file"""
+        return self._gone >= config.WATCH_CHECKPOINT_COMPACT_LINES
+
+    def close(self):
+        self._file.close()
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog file events to the daemon's queue"""
+
+    def __init__(self, events):
+        self.events = events
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.events.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.events.put(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.events.put(event.dest_path)
+
+
+# Per-process verifier, set up by _init_worker
+_verifier = None
+
+
+def _init_worker():
+    """Create the verifier used by a worker process"""
+    global _verifier
+    apply_saved_profile()
+    _verifier = SolarPanelVerifier()
+
+
+def verify_file(path):
+    """Verify one inbox file on the current worker"""
+    if is_video_file(path):
+        return verify_video(path, None, _verifier)
+    return _verifier.verify_installation(path)
+
+
+class WatchFolderDaemon:
+    """Verifies files arriving in inbox directories and archives them"""
+
+    def __init__(self, inboxes, archive_dir=None, state_dir=None, workers=None,
+                 settle_seconds=None, poll_seconds=None):
+        """
+        Initialize the daemon
+
+        Args:
+            inboxes: Directories to watch (recursively)
+            archive_dir: Where inputs and results are moved (defaults to
+                config.WATCH_ARCHIVE_DIR; None leaves files in place)
+            state_dir: Checkpoint directory (defaults to config.WATCH_STATE_DIR)
+            workers: Worker processes (defaults to the autotuned count)
+            settle_seconds: Time a file's size and mtime must stay unchanged
+                before it is processed (defaults to config.WATCH_SETTLE_SECONDS)
+            poll_seconds: Loop interval (defaults to config.WATCH_POLL_SECONDS)
+        """
+        self.inboxes = [os.path.abspath(inbox) for inbox in inboxes]
+        self.archive_dir = archive_dir if archive_dir is not None else config.WATCH_ARCHIVE_DIR
+        self.workers = workers or default_workers()
+        self.settle_seconds = config.WATCH_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self.poll_seconds = poll_seconds or config.WATCH_POLL_SECONDS
+        state_dir = state_dir or config.WATCH_STATE_DIR
+        self.checkpoint = Checkpoint(os.path.join(state_dir, 'processed.tsv'))
+
+        self._events = queue.Queue()
+        # directory -> (mtime when last listed, its subdirectories)
+        self._dirs = {}
+        # path -> (size, mtime, time the file was last seen changing)
+        self._pending = {}
+        self._in_flight = {}
+        self._observer = None
+        self.processed = 0
+
+    def _scan(self):
+        """Queue files from directories that changed since the last scan"""
+        stack = list(self.inboxes)
+        seen = set()
+        # A file created in the same timestamp tick as the last listing leaves
+        # a coarse mtime unchanged, so only older mtimes can be trusted
+        recent = time.time_ns() - int(max(self.settle_seconds,
+                                          config.WATCH_MTIME_RESOLUTION_SECONDS) * 1e9)
+        while stack:
+            directory = stack.pop()
+            seen.add(directory)
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+                known = self._dirs.get(directory)
+                if known is not None and known[0] == mtime and mtime < recent:
+                    # Unchanged: recurse from the cached listing
+                    stack.extend(known[1])
+                    continue
+
+                subdirectories = []
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        else:
+                            self._events.put(entry.path)
+                self._dirs[directory] = (mtime, subdirectories)
+                stack.extend(subdirectories)
+            except OSError:
+                self._dirs.pop(directory, None)
+
+        # Forget directories that were removed or moved away
+        for directory in self._dirs.keys() - seen:
+            del self._dirs[directory]
+
+    def _start_observer(self):
+        """Start watchdog observers, if available"""
+        if Observer is None:
+            return False
+        self._observer = Observer()
+        handler = _EventHandler(self._events)
+        for inbox in self.inboxes:
+            self._observer.schedule(handler, inbox, recursive=True)
+        self._observer.start()
+        return True
+
+    def _collect_events(self):
+        """Move queued file events into the pending set"""
+        now = time.monotonic()
+        while True:
+            try:
+                path = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if path not in self._pending and path not in self._in_flight and is_candidate(path):
+                self._pending[path] = (None, None, now)
+
+    def _ready_files(self):
+        """Pending files whose size and mtime have settled"""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or moved away before it settled
+                del self._pending[path]
+                continue
+
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif stat.st_size > 0 and now - since >= self.settle_seconds:
+                del self._pending[path]
+                key = Checkpoint.key(path, stat)
+                if key not in self.checkpoint:
+                    ready.append((path, key))
+        return ready
+
+    def _archive(self, path, results):
+        """Move an input, its results, report image and mask into the archive"""
+        if not self.archive_dir:
+            return path
+        day_dir = os.path.join(self.archive_dir, datetime.now().strftime('%Y-%m-%d'))
+        os.makedirs(day_dir, exist_ok=True)
+
+        stem, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(day_dir, stem + ext)
+        counter = 1
+        while os.path.exists(target):
+            target = os.path.join(day_dir, f"{stem}_{counter}{ext}")
+            counter += 1
+        shutil.move(path, target)
+
+        base = os.path.splitext(target)[0]
+        report = results.get('output_image_path')
+        if report and os.path.exists(report):
+            archived_report = base + '_report' + os.path.splitext(report)[1]
+            shutil.move(report, archived_report)
+            results['output_image_path'] = archived_report
+        mask = results.get('mask_path')
+        if mask and os.path.exists(mask):
+            archived_mask = base + '_mask.npz'
+            shutil.move(mask, archived_mask)
+            results['mask_path'] = archived_mask
+        results['archived_path'] = target
+        with open(base + '.json', 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        return target
+
+    def _finish(self, future):
+        """Record and archive one completed verification"""
+        path, key = self._in_flight.pop(future)
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Error verifying {path}: {e}")
+            results = {'status': 'ERROR', 'user_image_path': path, 'message': str(e)}
+
+        try:
+            target = self._archive(path, results)
+        except OSError as e:
+            print(f"Error archiving {path}: {e}")
+            target = path
+        self.checkpoint.add(key, gone=target != path)
+        self.processed += 1
+        print(f"{results.get('verification_status', results['status'])}: {path} -> {target}")
+
+    def run(self, once=False):
+        """
+        Process files until interrupted
+
+        Args:
+            once: Process the files currently in the inboxes, then return
+        """
+        watching = False if once else self._start_observer()
+        self._scan()
+        ready = []
+        max_in_flight = self.workers * 2
+
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker) as pool:
+                while True:
+                    if not watching:
+                        self._scan()
+                    self._collect_events()
+                    ready.extend(self._ready_files())
+
+                    # Keep bursts of arrivals from flooding the pool
+                    while ready and len(self._in_flight) < max_in_flight:
+                        path, key = ready.pop(0)
+                        self._in_flight[pool.submit(verify_file, path)] = (path, key)
+
+                    if self._in_flight:
+                        done, _ = wait(list(self._in_flight), timeout=self.poll_seconds,
+                                       return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._finish(future)
+                    elif once and not ready and not self._pending:
+                        return
+                    else:
+                        time.sleep(self.poll_seconds)
+
+                    if self.checkpoint.stale:
+                        self.checkpoint.compact()
+        finally:
+            if self._observer is not None:
+                self._observer.stop()
+                self._observer.join()
+            self.checkpoint.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Verify photos dropped into inbox folders')
+    parser.add_argument('inboxes', nargs='*', default=config.WATCH_INBOXES, help='Directories to watch')
+    parser.add_argument('--archive', default=config.WATCH_ARCHIVE_DIR,
+                        help="Archive directory ('' leaves files in place)")
+    parser.add_argument('--state-dir', default=config.WATCH_STATE_DIR, help='Checkpoint directory')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--once', action='store_true', help='Process current files and exit')
+
+    args = parser.parse_args()
+    if not args.inboxes:
+        parser.error('no inbox directories given')
+
+    apply_saved_profile()
+    daemon = WatchFolderDaemon(args.inboxes, args.archive, args.state_dir, args.workers)
+    mode = 'watchdog' if Observer is not None and not args.once else 'polling'
+    print(f"Watching {len(daemon.inboxes)} inbox(es) with {daemon.workers} worker(s) ({mode})")
+    try:
+        daemon.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    print(f"Processed {daemon.processed} file(s)")
+
+
+if __name__ == '__main__':
+    main()